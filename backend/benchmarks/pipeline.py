@@ -0,0 +1,483 @@
+"""
+End-to-end pipeline benchmark.
+
+Drives orchestrator.run_build, run_conversational_build (create + modify),
+the storage layer and the main routers against scripted LLM responses served
+by the replay provider at a controlled latency. Reports wall time per stage,
+DB writes/bytes per job, DB lock wait time, peak RSS and API p50/p99 under
+polling load, and stores everything as JSON so runs can be compared:
+
+    python -m backend.benchmarks.pipeline --latency-ms 50 --out before.json
+    python -m backend.benchmarks.pipeline --latency-ms 50 --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# Isolate the run before anything reads backend.config
+_DATA_DIR = tempfile.mkdtemp(prefix="forge-bench-")
+os.environ["FORGE_DATA_DIR"] = _DATA_DIR
+os.environ["LLM_PROVIDER"] = "REPLAY"
+os.environ["REPLAY_MODE"] = "replay"
+
+from backend.config import settings  # noqa: E402
+from backend.storage import db  # noqa: E402
+from backend.services import orchestrator, conversational_orchestrator, evaluator, architect, precheck, repo_scaffold  # noqa: E402
+from backend.services import fenced, pipeline, workspace_index, workspace_manifest  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+# ============== Scripted LLM ==============
+
+def _fence(path: str, body: str) -> str:
+    return f"```{path}\n{body}```\n"
+
+
+def _module(i: int, lines: int) -> str:
+    funcs = [f"def f{i}_{k}(x):\n    return x * {k} + {i}\n" for k in range(max(lines // 3, 1))]
+    return f'"""Generated module {i}"""\n\n' + "\n\n".join(funcs)
+
+
+CALC_BUGGY = "def add(a, b):\n    return a + b\n\n\ndef mul(a, b):\n    return a + b\n"
+CALC_FIXED = "def add(a, b):\n    return a + b\n\n\ndef mul(a, b):\n    return a * b\n"
+CALC_MODIFIED = CALC_FIXED + "\n\ndef sub(a, b):\n    return a - b\n"
+CALC_FIX_DIFF = "```diff\n--- a/calc.py\n+++ b/calc.py\n@@ -5,2 +5,2 @@\n def mul(a, b):\n-    return a + b\n+    return a * b\n```\n"
+TESTS = "from calc import add, mul\n\n\ndef test_add():\n    assert add(2, 3) == 5\n\n\ndef test_mul():\n    assert mul(2, 3) == 6\n"
+TESTS_MODIFIED = TESTS.replace("import add, mul", "import add, mul, sub") + "\n\ndef test_sub():\n    assert sub(5, 3) == 2\n"
+
+APPROVE = json.dumps({"has_issues": False, "severity": "none", "issues": [], "summary": "Looks good"})
+ISSUES = json.dumps({
+    "has_issues": True,
+    "severity": "major",
+    "issues": [{"file": "calc.py", "line": 6, "type": "bug", "severity": "major",
+                "description": "mul adds instead of multiplying", "fix": "return a * b"}],
+    "summary": "mul is wrong",
+})
+
+
+def build_script(modules: int, module_lines: int) -> list[dict]:
+    """Replay rules producing a project whose first build needs one fix iteration"""
+    extra = "".join(_fence(f"pkg/mod_{i}.py", _module(i, module_lines)) for i in range(modules))
+    plan = json.dumps({
+        "files": ["calc.py", "tests/test_calc.py"] + [f"pkg/mod_{i}.py" for i in range(modules)],
+        "tests": ["tests/test_calc.py"],
+        "steps": ["implement calc", "write tests"],
+    })
+    return [
+        {"match": ["code reviewer", "return a * b"], "response": APPROVE},
+        {"match": "code reviewer", "response": ISSUES},
+        {"match": "senior software architect. Plan", "response": plan},
+        {"match": "iterative improvements", "response": _fence("calc.py", CALC_MODIFIED) + _fence("tests/test_calc.py", TESTS_MODIFIED)},
+        {"match": "senior maintainer", "response": CALC_FIX_DIFF},
+        {"match": "senior developer. Implement", "response": _fence("calc.py", CALC_BUGGY) + _fence("tests/test_calc.py", TESTS) + extra},
+    ]
+
+
+# ============== Instrumentation ==============
+
+class TimedLock:
+    """Drop-in for db._db_lock that accounts time spent waiting to acquire it"""
+
+    def __init__(self, lock):
+        self._lock = lock
+        self._stats_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.acquisitions = 0
+        self.wait_s = 0.0
+        self.max_wait_s = 0.0
+
+    def __enter__(self):
+        t0 = time.perf_counter()
+        self._lock.acquire()
+        waited = time.perf_counter() - t0
+        with self._stats_lock:
+            self.acquisitions += 1
+            self.wait_s += waited
+            self.max_wait_s = max(self.max_wait_s, waited)
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+        return False
+
+    def snapshot(self) -> dict:
+        return {
+            "acquisitions": self.acquisitions,
+            "wait_ms": round(self.wait_s * 1000, 3),
+            "max_wait_ms": round(self.max_wait_s * 1000, 3),
+        }
+
+
+class Recorder:
+    """Collects per-stage timings and DB write volume for one scenario"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.stages = defaultdict(lambda: {"calls": 0, "total_s": 0.0})
+        self.db_writes = 0
+        self.db_bytes = 0
+
+    def add_stage(self, stage: str, elapsed: float):
+        with self._lock:
+            self.stages[stage]["calls"] += 1
+            self.stages[stage]["total_s"] += elapsed
+
+    def on_sql(self, statement: str):
+        head = statement.lstrip()[:6].upper()
+        if head in ("INSERT", "UPDATE", "DELETE"):
+            with self._lock:
+                self.db_writes += 1
+                self.db_bytes += len(statement.encode("utf-8"))
+
+    def snapshot(self) -> dict:
+        return {
+            "stages": {k: {"calls": v["calls"], "total_ms": round(v["total_s"] * 1000, 3)}
+                       for k, v in sorted(self.stages.items())},
+            "db": {"writes": self.db_writes, "bytes": self.db_bytes},
+        }
+
+
+RECORDER = Recorder()
+
+
+def _timed(fn, stage):
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            RECORDER.add_stage(stage, time.perf_counter() - t0)
+    return wrapper
+
+
+def instrument() -> TimedLock:
+    from backend.providers.replay import ReplayProvider
+
+    llm_stages = {
+        orchestrator.SYSTEM_PLANNER: "llm:plan",
+        orchestrator.SYSTEM_CODER: "llm:code",
+        orchestrator.SYSTEM_FIXER: "llm:fix",
+        conversational_orchestrator.SYSTEM_FIXER: "llm:fix",
+        conversational_orchestrator.SYSTEM_MODIFIER: "llm:modify",
+        architect.SYSTEM_ARCHITECT: "llm:review",
+    }
+    complete = ReplayProvider.complete
+
+    def timed_complete(self, *, system, user, max_tokens):
+        t0 = time.perf_counter()
+        try:
+            return complete(self, system=system, user=user, max_tokens=max_tokens)
+        finally:
+            RECORDER.add_stage(llm_stages.get(system, "llm:other"), time.perf_counter() - t0)
+
+    ReplayProvider.complete = timed_complete
+    stream = ReplayProvider.stream
+
+    def timed_stream(self, *, system, user, max_tokens):
+        # Only time spent producing fragments: applying them overlaps the stream
+        fragments = stream(self, system=system, user=user, max_tokens=max_tokens)
+        elapsed = 0.0
+        try:
+            while True:
+                t0 = time.perf_counter()
+                try:
+                    fragment = next(fragments)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - t0
+                yield fragment
+        finally:
+            RECORDER.add_stage(llm_stages.get(system, "llm:other"), elapsed)
+
+    ReplayProvider.stream = timed_stream
+
+    for module, name, stage in [
+        (repo_scaffold, "create_workspace", "workspace"),
+        (precheck, "check", "precheck"),
+        (architect, "review_code", "review"),
+        (evaluator, "run", "test"),
+        # Parsing/patching and writing, not the streamed generation they overlap
+        (fenced, "_block_edits", "apply"),
+        (workspace_manifest, "apply", "apply"),
+        (workspace_index, "update_files", "apply"),
+        (conversational_orchestrator, "get_workspace_context", "context"),
+        (conversational_orchestrator, "build_conversation_context", "context"),
+    ]:
+        if hasattr(module, name):
+            setattr(module, name, _timed(getattr(module, name), stage))
+
+    # Wall time of each pipeline stage, overlaps included
+    pipeline.observers.append(
+        lambda record: RECORDER.add_stage(f"stage:{record['stage']}", record["ms"] / 1000)
+    )
+
+    db._conn.set_trace_callback(RECORDER.on_sql)
+    lock = TimedLock(db._db_lock)
+    db._db_lock = lock
+    return lock
+
+
+def peak_rss_bytes() -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(samples: list[float], pct: float) -> float | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+# ============== Polling load ==============
+
+class Poller:
+    """Simulates UI clients polling the API while a job runs"""
+
+    def __init__(self, clients: int, interval_s: float):
+        self.clients = clients
+        self.interval_s = interval_s
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self, job_id: str):
+        from fastapi.testclient import TestClient
+        from backend.app import app
+
+        paths = {
+            "GET /jobs": "/jobs",
+            "GET /jobs/{id}": f"/jobs/{job_id}",
+            "GET /workspace/{id}/files": f"/workspace/{job_id}/files",
+        }
+
+        def loop():
+            client = TestClient(app)
+            while not self._stop.is_set():
+                for name, path in paths.items():
+                    t0 = time.perf_counter()
+                    client.get(path)
+                    elapsed = time.perf_counter() - t0
+                    with self._lock:
+                        self.samples[name].append(elapsed)
+                self._stop.wait(self.interval_s)
+
+        for _ in range(self.clients):
+            t = threading.Thread(target=loop, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> dict:
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        return {
+            name: {
+                "requests": len(s),
+                "p50_ms": round(percentile(s, 50) * 1000, 3),
+                "p99_ms": round(percentile(s, 99) * 1000, 3),
+            }
+            for name, s in sorted(self.samples.items())
+        }
+
+
+# ============== Scenarios ==============
+
+def _run_job(lock: TimedLock, args, job: dict, target) -> dict:
+    RECORDER.reset()
+    lock.reset()
+    poller = Poller(args.pollers, args.poll_interval_ms / 1000)
+    if args.pollers:
+        poller.start(job["id"])
+    t0 = time.perf_counter()
+    ok, _ = target(job)
+    wall = time.perf_counter() - t0
+    api = poller.stop() if args.pollers else {}
+    result = RECORDER.snapshot()
+    stored = db.get_job(job["id"])
+    result.update({
+        "succeeded": ok,
+        "wall_ms": round(wall * 1000, 3),
+        "lock": lock.snapshot(),
+        "api": api,
+        "log_entries": len(stored.get("logs", [])),
+        "job_bytes": len(json.dumps(stored)),
+        "peak_rss_bytes": peak_rss_bytes(),
+    })
+    return result
+
+
+def scenario_build(lock: TimedLock, args) -> dict:
+    job = db.create_job({"project_name": "bench build", "spec": "Build a calculator module with tests."})
+    return _run_job(lock, args, job, orchestrator.run_build)
+
+
+def scenario_conversational(lock: TimedLock, args) -> dict:
+    project = db.create_project("bench project")
+    results = {}
+    for mode, spec in [("create", "Build a calculator module with tests."),
+                       ("modify", "Add a sub(a, b) function with a test.")]:
+        job = db.create_job({"project_name": "bench project", "spec": spec,
+                             "project_id": project["id"], "mode": mode})
+        results[mode] = _run_job(
+            lock, args, job,
+            lambda j, m=mode: conversational_orchestrator.run_conversational_build(j, project_id=project["id"], mode=m),
+        )
+    return results
+
+
+def scenario_storage(lock: TimedLock, args) -> dict:
+    RECORDER.reset()
+    lock.reset()
+    job = db.create_job({"project_name": "bench storage", "spec": "storage"})
+    append_s, get_s, delta_s, version_s = [], [], [], []
+    payload = {"path": "pkg/module.py", "content": "x = 1\n" * 50}
+    for i in range(args.log_entries):
+        t0 = time.perf_counter()
+        db.append_job_log(job["id"], "file" if i % 5 == 0 else "status", payload if i % 5 == 0 else f"step {i}")
+        append_s.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        db.get_job(job["id"])
+        get_s.append(time.perf_counter() - t0)
+        # What a delta poller (?since_seq=) and an If-None-Match check cost
+        t0 = time.perf_counter()
+        db.get_job(job["id"], since_seq=i)
+        delta_s.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        db.get_job_version(job["id"])
+        version_s.append(time.perf_counter() - t0)
+
+    def stats(samples):
+        return {"p50_ms": round(percentile(samples, 50) * 1000, 3),
+                "p99_ms": round(percentile(samples, 99) * 1000, 3),
+                "total_ms": round(sum(samples) * 1000, 3)}
+
+    result = RECORDER.snapshot()
+    result.update({
+        "log_entries": args.log_entries,
+        "append_job_log": stats(append_s),
+        "get_job": stats(get_s),
+        "get_job_since_seq": stats(delta_s),
+        "get_job_version": stats(version_s),
+        "lock": lock.snapshot(),
+        "peak_rss_bytes": peak_rss_bytes(),
+    })
+    return result
+
+
+SCENARIOS = {
+    "build": scenario_build,
+    "conversational": scenario_conversational,
+    "storage": scenario_storage,
+}
+
+
+# ============== Reporting ==============
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=Path(__file__).parent, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def flatten(d: dict, prefix: str = "") -> dict:
+    flat = {}
+    for k, v in d.items():
+        key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            flat.update(flatten(v, key))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            flat[key] = v
+    return flat
+
+
+def compare(old: dict, new: dict):
+    before, after = flatten(old["scenarios"]), flatten(new["scenarios"])
+    print(f"{'metric':<60} {'before':>12} {'after':>12} {'change':>9}")
+    for key in sorted(set(before) & set(after)):
+        b, a = before[key], after[key]
+        change = f"{(a - b) / b * 100:+.1f}%" if b else "n/a"
+        print(f"{key:<60} {b:>12} {a:>12} {change:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="fixed synthetic latency per LLM call")
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="synthetic latency per generated token")
+    parser.add_argument("--modules", type=int, default=10, help="extra generated modules per project")
+    parser.add_argument("--module-lines", type=int, default=60, help="approximate lines per generated module")
+    parser.add_argument("--pollers", type=int, default=4, help="concurrent polling clients during jobs")
+    parser.add_argument("--poll-interval-ms", type=float, default=50.0)
+    parser.add_argument("--log-entries", type=int, default=300, help="log appends in the storage scenario")
+    parser.add_argument("--out", help="result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="previous result file to diff against")
+    args = parser.parse_args(argv)
+
+    script_path = os.path.join(_DATA_DIR, "bench_script.jsonl")
+    with open(script_path, "w", encoding="utf-8") as f:
+        for entry in build_script(args.modules, args.module_lines):
+            f.write(json.dumps(entry) + "\n")
+    settings.REPLAY_TRANSCRIPT = script_path
+    settings.REPLAY_LATENCY_MS = args.latency_ms
+    settings.REPLAY_MS_PER_TOKEN = args.ms_per_token
+
+    lock = instrument()
+    scenarios = {}
+    for name in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+        print(f"running {name}...", file=sys.stderr)
+        scenarios[name] = SCENARIOS[name](lock, args)
+
+    commit = git_commit()
+    result = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "scenarios": scenarios,
+    }
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{commit or int(time.time())}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2))
+    print(json.dumps(result, indent=2))
+    print(f"results written to {out}", file=sys.stderr)
+
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), result)
+
+
+if __name__ == "__main__":
+    main()
@@ -35,6 +35,78 @@ class Settings(BaseSettings):
     MAX_INPUT_CHARS: int = 120_000
     MAX_REPLY_TOKENS: int = 2048
 
+    # Workspace test runs: per-process timeout, and parallel shards (0 workers
+    # = one per core) once recorded test durations exceed the threshold
+    TEST_TIMEOUT: int = 180
+    TEST_SHARD_WORKERS: int = 0
+    TEST_SHARD_MIN_SECONDS: float = 10.0
+
+    # Workspace file listings are cached; without a filesystem watcher
+    # (watchfiles) a listing is trusted for this many seconds
+    FILE_TREE_TTL: float = 2.0
+    # Largest file the JSON file endpoint returns; bigger ones are read raw
+    FILE_VIEW_MAX_BYTES: int = 1_048_576
+    # Most files one batch read may return
+    BATCH_MAX_FILES: int = 500
+    # Snapshots kept per workspace (oldest go first, with content no
+    # remaining snapshot uses); 0 keeps all
+    SNAPSHOT_KEEP: int = 50
+
+    # Build stage graphs: stages whose inputs are ready run concurrently on
+    # up to PIPELINE_WORKERS threads; LLM stages are retried on errors
+    PIPELINE_WORKERS: int = 4
+    PIPELINE_RETRIES: int = 1
+
+    # Resource limits for each test process (POSIX rlimits; 0 = unlimited).
+    # CPU is per process; the process limit is per user, so only set it
+    # when the backend runs as a dedicated user. Memory is address space
+    # (RLIMIT_AS), not memory in use: multithreaded and numpy/BLAS suites
+    # reserve gigabytes they never touch (per-thread malloc arenas, thread
+    # stacks), so a tight value fails healthy tests with MemoryError and
+    # sends them to the Fixer. Off by default; size it well above the
+    # suites' virtual size when the host needs the protection.
+    TEST_CPU_SECONDS: int = 120
+    TEST_MEMORY_MB: int = 0
+    TEST_MAX_PROCESSES: int = 0
+
+    # Warm pytest servers (POSIX): each run forks from a pre-imported
+    # process; servers are recycled after TEST_POOL_MAX_RUNS. 0 disables.
+    TEST_POOL_SIZE: int = os.cpu_count() or 1
+    TEST_POOL_MAX_RUNS: int = 20
+
+    # Per-workspace virtualenvs for projects with requirements.txt /
+    # pyproject.toml, cached by dependency manifest. Installs come from the
+    # local wheel directory (default <data dir>/wheels), which is filled on
+    # a miss unless VENV_OFFLINE.
+    VENV_ENABLED: bool = True
+    VENV_WHEEL_DIR: str | None = None
+    VENV_OFFLINE: bool = False
+    VENV_INSTALL_TIMEOUT: int = 600
+
+    # Modify-prompt conversation history: the most recent messages are kept
+    # verbatim, older ones are folded into a rolling summary in batches
+    CONVERSATION_RECENT_MESSAGES: int = 6
+    CONVERSATION_SUMMARY_BATCH: int = 4
+    CONVERSATION_MESSAGE_MAX_CHARS: int = 4_000
+    CONVERSATION_SUMMARY_MAX_CHARS: int = 4_000
+
+    # Modify-prompt workspace context: top-k BM25 chunks within a token budget
+    MODIFY_CONTEXT_TOKENS: int = 8_000
+    MODIFY_CONTEXT_TOP_K: int = 12
+
+    # Per-stage model routing, keyed by stage (planner, coder, architect,
+    # fixer, modifier, summarizer, help). Each rule may set provider, model, max_tokens,
+    # temperature and an "escalate" rule applied after "escalate_after"
+    # failed attempts. Set as JSON in the environment.
+    LLM_ROUTES: dict[str, dict] = {}
+
+    # Offline record/replay provider (LLM_PROVIDER=REPLAY)
+    REPLAY_MODE: str = "replay"  # 'replay' or 'record'
+    REPLAY_TRANSCRIPT: str = str(get_data_dir() / "replay" / "transcript.jsonl")
+    REPLAY_RECORD_PROVIDER: str = "LMSTUDIO"
+    REPLAY_LATENCY_MS: float = 0.0
+    REPLAY_MS_PER_TOKEN: float = 0.0
+
     model_config = SettingsConfigDict(env_file=".env")
 
 settings = Settings()
@@ -15,6 +15,12 @@ datas += collect_data_files('certifi')
 datas += collect_data_files('pydantic')
 datas += collect_data_files('pydantic_settings')
 datas += collect_data_files('pydantic_core')
+# pytest plugin and warm runner loaded into workspace test runs by path, not imported
+datas += [
+    ('services/pytest_plugins/forge_results.py', 'backend/services/pytest_plugins'),
+    ('services/pytest_plugins/forge_sandbox.py', 'backend/services/pytest_plugins'),
+    ('services/pytest_plugins/forge_pytest_server.py', 'backend/services/pytest_plugins'),
+]
 
 a = Analysis(
     ['app.py'],
@@ -1,6 +1,22 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
 
 class LLM(ABC):
+    def __init__(self, *, model: str | None = None, temperature: float | None = None, max_tokens: int | None = None):
+        # Per-stage overrides from the router; None falls back to provider defaults
+        self.model = model
+        self.temperature = 0.2 if temperature is None else temperature
+        self.max_tokens = max_tokens
+        self.stage: str | None = None
+
+    def reply_tokens(self, requested: int) -> int:
+        """Reply budget for a call: the stage's max_tokens wins over the caller's"""
+        return self.max_tokens or requested
+
     @abstractmethod
     def complete(self, *, system: str, user: str, max_tokens: int) -> str:
         ...
+
+    def stream(self, *, system: str, user: str, max_tokens: int) -> Iterator[str]:
+        """Reply as text fragments in arrival order; providers without streaming yield it whole"""
+        yield self.complete(system=system, user=user, max_tokens=max_tokens)
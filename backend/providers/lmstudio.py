@@ -1,21 +1,44 @@
+import json
 import requests
+from collections.abc import Iterator
 from backend.config import settings
 from backend.services.settings_service import settings_service
 from .base import LLM
 
 class LMStudioProvider(LLM):
-    def complete(self, *, system: str, user: str, max_tokens: int) -> str:
-        base_url = settings_service.get_lmstudio_url()
-        url = f"{base_url}/chat/completions"
-        payload = {
-            "model": settings.LMSTUDIO_MODEL,
+    def _payload(self, system: str, user: str, max_tokens: int) -> dict:
+        return {
+            "model": self.model or settings.LMSTUDIO_MODEL,
             "messages": [
                 {"role": "system", "content": system},
                 {"role": "user", "content": user},
             ],
-            "max_tokens": max_tokens,
-            "temperature": 0.2,
+            "max_tokens": self.reply_tokens(max_tokens),
+            "temperature": self.temperature,
         }
+
+    def complete(self, *, system: str, user: str, max_tokens: int) -> str:
+        base_url = settings_service.get_lmstudio_url()
+        url = f"{base_url}/chat/completions"
+        payload = self._payload(system, user, max_tokens)
         r = requests.post(url, json=payload, timeout=120)
         r.raise_for_status()
         return r.json()["choices"][0]["message"]["content"].strip()
+
+    def stream(self, *, system: str, user: str, max_tokens: int) -> Iterator[str]:
+        base_url = settings_service.get_lmstudio_url()
+        url = f"{base_url}/chat/completions"
+        payload = {**self._payload(system, user, max_tokens), "stream": True}
+        with requests.post(url, json=payload, timeout=120, stream=True) as r:
+            r.raise_for_status()
+            # OpenAI-compatible server-sent events: "data: {...}" lines, then "data: [DONE]"
+            for line in r.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
@@ -1,23 +1,40 @@
 import os
+from collections.abc import Iterator
 from openai import OpenAI
 from backend.config import settings
 from backend.services.settings_service import settings_service
 from .base import LLM
 
 class OpenAIProvider(LLM):
-    def __init__(self):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
         api_key = settings_service.get_openai_api_key()
         self.client = OpenAI(api_key=api_key)
     
     def complete(self, *, system: str, user: str, max_tokens: int) -> str:
         response = self.client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
+            model=self.model or settings.OPENAI_MODEL,
             messages=[
                 {"role": "system", "content": system},
                 {"role": "user", "content": user},
             ],
-            max_tokens=max_tokens,
-            temperature=0.2,
+            max_tokens=self.reply_tokens(max_tokens),
+            temperature=self.temperature,
         )
         content = response.choices[0].message.content or ""
         return content.strip()
+
+    def stream(self, *, system: str, user: str, max_tokens: int) -> Iterator[str]:
+        response = self.client.chat.completions.create(
+            model=self.model or settings.OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            max_tokens=self.reply_tokens(max_tokens),
+            temperature=self.temperature,
+            stream=True,
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from backend.config import settings
+from .base import LLM
+from .lmstudio import LMStudioProvider
+from .openai_cloud import OpenAIProvider
+
+
+def request_key(system: str, user: str, max_tokens: int) -> str:
+    """Stable hash identifying a completion request in a transcript"""
+    h = hashlib.sha256()
+    for part in (system, user, str(max_tokens)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def read_transcript(path: str) -> list[dict]:
+    """Load transcript entries from a JSONL file (missing file = empty transcript)"""
+    if not path or not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    return entries
+
+
+class _Queues:
+    """Recorded and scripted responses still to be served, consumed in order"""
+
+    def __init__(self, entries: list[dict], source: str = "entries"):
+        self.lock = threading.Lock()
+        self.by_key: dict[str, deque] = {}
+        self.rules: list[tuple[str | None, str | list[str] | None, deque]] = []
+        for n, entry in enumerate(entries, 1):
+            responses = entry.get("responses")
+            if responses is None:
+                responses = [entry.get("response", "")]
+            elif not responses:
+                name = entry.get("key") or entry.get("match") or "catch-all"
+                raise ValueError(f"Replay entry {n} ({name}) in {source} has an empty \"responses\" list")
+            if entry.get("key"):
+                self.by_key.setdefault(entry["key"], deque()).extend(responses)
+            else:
+                self.rules.append((entry.get("stage"), entry.get("match"), deque(responses)))
+
+
+# Transcript path -> (file signature, queues), shared by every provider
+# replaying that transcript so a run's calls consume it in order
+_shared: dict[str, tuple[tuple | None, _Queues]] = {}
+_shared_lock = threading.Lock()
+
+
+def _shared_queues(path: str) -> _Queues:
+    """Queues for a transcript, reloaded when the file changes"""
+    key = os.path.abspath(path)
+    try:
+        st = os.stat(key)
+        signature = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        signature = None
+    with _shared_lock:
+        cached = _shared.get(key)
+        if cached is None or cached[0] != signature:
+            cached = _shared[key] = (signature, _Queues(read_transcript(key), key))
+        return cached[1]
+
+
+def reset(path: str | None = None):
+    """Rewind replay of one transcript (or all), e.g. before replaying a run again"""
+    with _shared_lock:
+        if path is None:
+            _shared.clear()
+        else:
+            _shared.pop(os.path.abspath(path), None)
+
+
+def _live_provider(name: str, **kwargs) -> LLM:
+    if name.upper() == "OPENAI":
+        return OpenAIProvider(**kwargs)
+    return LMStudioProvider(**kwargs)
+
+
+class ReplayProvider(LLM):
+    """
+    Deterministic provider for offline runs.
+
+    In 'record' mode every request is forwarded to a live provider and the
+    request/response pair is appended to the transcript. In 'replay' mode
+    responses are served from the transcript, which may hold:
+
+    - recorded entries: {"key": ..., "response": ...}, matched exactly
+    - scripted rules:   {"match": "substring", "response": ...} or
+                        {"match": ..., "responses": [...]}, matched against
+                        the system and user prompt in file order; a list of
+                        substrings matches only if all of them occur;
+                        an optional "stage" restricts a rule to one stage
+    - a catch-all:      {"response": ...} with neither key nor match
+
+    Repeated matches walk through the queued responses and then keep
+    returning the last one. Providers replaying the same transcript share
+    its queues, so a run that creates one provider per call (see
+    llm_router.get_llm) still advances through them. Synthetic latency is a fixed delay plus a
+    per-token delay estimated from the response length.
+    """
+
+    def __init__(
+        self,
+        *,
+        transcript: str | None = None,
+        mode: str | None = None,
+        entries: list[dict] | None = None,
+        latency_ms: float | None = None,
+        ms_per_token: float | None = None,
+        inner: LLM | None = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.mode = (mode or settings.REPLAY_MODE).lower()
+        self.transcript = transcript or settings.REPLAY_TRANSCRIPT
+        self.latency_ms = settings.REPLAY_LATENCY_MS if latency_ms is None else latency_ms
+        self.ms_per_token = settings.REPLAY_MS_PER_TOKEN if ms_per_token is None else ms_per_token
+        self._lock = threading.Lock()
+
+        if self.mode == "record":
+            self.inner = inner or _live_provider(settings.REPLAY_RECORD_PROVIDER, **kwargs)
+        elif self.mode == "replay":
+            self.inner = None
+            self._queues = _shared_queues(self.transcript) if entries is None else _Queues(entries)
+        else:
+            raise ValueError(f"Unknown replay mode: {self.mode}")
+
+    @staticmethod
+    def _matches(match, system: str, user: str) -> bool:
+        if match is None:
+            return True
+        needles = [match] if isinstance(match, str) else match
+        return all(n in system or n in user for n in needles)
+
+    @staticmethod
+    def _take(queue: deque) -> str:
+        # Consume queued responses in order, then keep serving the last one
+        return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def _lookup(self, system: str, user: str, max_tokens: int) -> str:
+        key = request_key(system, user, max_tokens)
+        queues = self._queues
+        with queues.lock:
+            if key in queues.by_key:
+                return self._take(queues.by_key[key])
+            for stage, match, queue in queues.rules:
+                if stage not in (None, self.stage):
+                    continue
+                if self._matches(match, system, user):
+                    return self._take(queue)
+        raise LookupError(f"No replay entry for request {key[:12]} in {self.transcript}")
+
+    def _record(self, system: str, user: str, max_tokens: int, response: str):
+        entry = {
+            "key": request_key(system, user, max_tokens),
+            "stage": self.stage,
+            "system": system,
+            "user": user,
+            "max_tokens": max_tokens,
+            "response": response,
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(self.transcript) or ".", exist_ok=True)
+            with open(self.transcript, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def _simulate_latency(self, response: str):
+        delay_ms = self.latency_ms + self.ms_per_token * (len(response) / 4)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def stream(self, *, system: str, user: str, max_tokens: int) -> Iterator[str]:
+        """Replays line by line, spreading the per-token latency over the lines"""
+        if self.mode == "record":
+            self.inner.stage = self.stage
+            parts = []
+            for fragment in self.inner.stream(system=system, user=user, max_tokens=max_tokens):
+                parts.append(fragment)
+                yield fragment
+            self._record(system, user, max_tokens, "".join(parts))
+            return
+        response = self._lookup(system, user, max_tokens)
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+        for line in response.splitlines(keepends=True):
+            delay_ms = self.ms_per_token * (len(line) / 4)
+            if delay_ms > 0:
+                time.sleep(delay_ms / 1000)
+            yield line
+
+    def complete(self, *, system: str, user: str, max_tokens: int) -> str:
+        if self.mode == "record":
+            self.inner.stage = self.stage
+            response = self.inner.complete(system=system, user=user, max_tokens=max_tokens)
+            self._record(system, user, max_tokens, response)
+            return response
+        response = self._lookup(system, user, max_tokens)
+        self._simulate_latency(response)
+        return response
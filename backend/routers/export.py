@@ -1,80 +1,73 @@
 import shutil
-import zipfile
 from pathlib import Path
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from backend.config import settings
-import tempfile
-import os
+from backend.services import archive, workspace_sync
+from backend.services.repo_scaffold import find_workspace
 
 router = APIRouter()
 
-@router.get("/{job_id}/zip")
-async def export_workspace_zip(job_id: str):
-    """
-    Export a workspace as a downloadable ZIP file.
-    This allows users to download their generated code for deployment elsewhere.
-    """
-    # Find workspace directory
-    workspace_root = Path(settings.WORKSPACE_ROOT)
-    workspace_dirs = list(workspace_root.glob(f"*_{job_id[:8]}"))
-    
-    if not workspace_dirs:
+def _workspace_or_404(job_id: str) -> Path:
+    workspace_path = find_workspace(job_id)
+    if workspace_path is None:
         raise HTTPException(
             status_code=404,
             detail=f"Workspace not found for job {job_id}"
         )
-    
-    workspace_path = workspace_dirs[0]
+    return workspace_path
+
+def _export(job_id: str, fmt: str):
+    workspace_path = _workspace_or_404(job_id)
     project_name = workspace_path.name.rsplit('_', 1)[0]
-    
-    # Create temporary ZIP file
-    temp_dir = tempfile.gettempdir()
-    zip_filename = f"{project_name}.zip"
-    zip_path = os.path.join(temp_dir, zip_filename)
-    
-    # Create ZIP archive
-    try:
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(workspace_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, workspace_path)
-                    zipf.write(file_path, arcname)
-        
-        return FileResponse(
-            path=zip_path,
-            media_type='application/zip',
-            filename=zip_filename,
-            headers={
-                "Content-Disposition": f"attachment; filename={zip_filename}"
-            }
-        )
-    
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to create ZIP archive: {str(e)}"
-        )
+    filename = f"{project_name}.{fmt}"
+    repo = str(workspace_path)
+
+    files = archive.members(repo)
+    key = archive.cache_key(repo, files, fmt)
+    cached = archive.cached(repo, key, fmt)
+    if cached:
+        return FileResponse(path=cached, media_type=archive.FORMATS[fmt], filename=filename)
+    return StreamingResponse(
+        archive.stream(repo, files, fmt, key),
+        media_type=archive.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/{job_id}/zip")
+def export_workspace_zip(job_id: str):
+    """
+    Export a workspace as a downloadable ZIP file.
+    This allows users to download their generated code for deployment elsewhere.
+    """
+    return _export(job_id, "zip")
+
+@router.get("/{job_id}/archive")
+def export_workspace_archive(job_id: str, format: str = "zip"):
+    """
+    Export a workspace as zip, tar.gz (fast compression) or tar (none): the
+    quicker options for large workspaces. Archives stream as they are built;
+    an unchanged workspace's archive is served from the export cache.
+    """
+    if format not in archive.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format; use one of {', '.join(archive.FORMATS)}")
+    return _export(job_id, format)
 
 @router.post("/{job_id}/copy")
-async def copy_workspace(job_id: str, destination: str):
+def copy_workspace(job_id: str, destination: str, mode: str = "sync", hardlink: bool = False):
     """
     Copy workspace to a user-specified directory on the local filesystem.
     Note: This works for desktop app, not web deployment.
+
+    mode "sync" (default) updates the destination incrementally, copying
+    only changed files and removing deleted ones; "full" replaces it.
+    `hardlink` lets sync share unchanged inodes with the workspace (editing
+    them in place then edits the workspace too).
     """
-    # Find workspace directory
-    workspace_root = Path(settings.WORKSPACE_ROOT)
-    workspace_dirs = list(workspace_root.glob(f"*_{job_id[:8]}"))
-    
-    if not workspace_dirs:
-        raise HTTPException(
-            status_code=404,
-            detail=f"Workspace not found for job {job_id}"
-        )
-    
-    workspace_path = workspace_dirs[0]
+    workspace_path = _workspace_or_404(job_id)
     dest_path = Path(destination)
+    if mode not in ("sync", "full"):
+        raise HTTPException(status_code=400, detail="mode must be 'sync' or 'full'")
     
     try:
         # Validate destination
@@ -83,20 +76,35 @@ async def copy_workspace(job_id: str, destination: str):
                 status_code=400,
                 detail=f"Destination parent directory does not exist: {dest_path.parent}"
             )
+        source, target = workspace_path.resolve(), dest_path.resolve()
+        if target.is_relative_to(source) or source.is_relative_to(target):
+            raise HTTPException(
+                status_code=400,
+                detail="Destination must not contain or be inside the workspace"
+            )
         
-        # Copy workspace
-        if dest_path.exists():
-            shutil.rmtree(dest_path)
-        
-        shutil.copytree(workspace_path, dest_path)
+        if mode == "sync":
+            stats = workspace_sync.sync(str(workspace_path), str(dest_path), hardlink=hardlink)
+        else:
+            # Copy workspace
+            if dest_path.exists():
+                shutil.rmtree(dest_path)
+            shutil.copytree(workspace_path, dest_path, ignore=shutil.ignore_patterns('.forge'))
+            files = archive.members(str(dest_path))
+            stats = {"copied": len(files), "bytes_transferred": sum(st.st_size for _, _, st in files)}
         
         return {
             "status": "success",
             "source": str(workspace_path),
             "destination": str(dest_path),
-            "message": f"Workspace copied to {dest_path}"
+            "mode": mode,
+            "stats": stats,
+            "bytes_transferred": stats["bytes_transferred"],
+            "message": f"Workspace copied to {dest_path} ({stats['bytes_transferred']} bytes transferred)"
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -109,16 +117,8 @@ async def get_workspace_path(job_id: str):
     Get the filesystem path where a workspace is stored.
     Useful for users to locate their generated code on disk.
     """
+    workspace_path = _workspace_or_404(job_id)
     workspace_root = Path(settings.WORKSPACE_ROOT)
-    workspace_dirs = list(workspace_root.glob(f"*_{job_id[:8]}"))
-    
-    if not workspace_dirs:
-        raise HTTPException(
-            status_code=404,
-            detail=f"Workspace not found for job {job_id}"
-        )
-    
-    workspace_path = workspace_dirs[0]
     
     return {
         "job_id": job_id,
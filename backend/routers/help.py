@@ -57,7 +57,7 @@ Guidelines:
 Answer the user's question based on the manual above."""
 
     try:
-        llm = get_llm()
+        llm = get_llm("help")
         
         response = llm.complete(
             system=system_prompt,
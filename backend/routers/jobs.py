@@ -1,7 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
-from backend.storage.db import create_job, get_job, list_jobs, set_runtime_provider
+from backend.services import job_events
+from backend.services.file_tree import etag_matches
+from backend.storage.db import create_job, get_job, get_job_version, jobs_version, list_jobs, set_runtime_provider
 from backend.worker.queue_worker import enqueue
 
 router = APIRouter()
@@ -24,12 +27,46 @@ def submit_job(inp: JobIn):
     return {"job_id": job["id"], "status": job["status"]}
 
 @router.get("/{job_id}")
-def status(job_id: str):
-    return get_job(job_id)
+def status(job_id: str, request: Request, since_seq: int = 0):
+    """
+    A job with its log entries after `since_seq` (all by default). The ETag
+    is the job's version: If-None-Match on an unchanged job gets a 304
+    without the job being read.
+    """
+    version = get_job_version(job_id)
+    if version is None:
+        return None
+    if etag_matches(request.headers.get("if-none-match"), f'"{version}"'):
+        return Response(status_code=304, headers={"ETag": f'"{version}"', "Cache-Control": "no-cache"})
+    job = get_job(job_id, since_seq)
+    return JSONResponse(job, headers={"ETag": f'"{job["version"]}"', "Cache-Control": "no-cache"})
+
+@router.get("/{job_id}/events")
+def job_events_stream(job_id: str, request: Request, last_event_id: int | None = None):
+    """
+    Server-sent events: "job" (fields without logs) on connect and when
+    they change, "log" per new entry (event id = its sequence number),
+    "end" once the job finished. Resumes after the Last-Event-ID header
+    (or ?last_event_id=, for the first connection).
+    """
+    if get_job_version(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    header = request.headers.get("last-event-id", "")
+    last_seq = int(header) if header.isdigit() else (last_event_id or 0)
+    return StreamingResponse(
+        job_events.stream(job_id, last_seq),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("")
-def all_jobs():
-    return list_jobs()
+def all_jobs(request: Request, logs: bool = True):
+    """All jobs, newest first; `logs=false` leaves out their log entries. Supports If-None-Match."""
+    etag = f'"{jobs_version()}{"" if logs else "-nologs"}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(list_jobs(include_logs=logs), headers=headers)
 
 @router.post("/provider")
 def set_provider_route(inp: ProviderIn):
@@ -1,88 +1,69 @@
+import base64
+import fnmatch
+import json
 import os
 from pathlib import Path
-from fastapi import APIRouter, HTTPException
-from backend.storage.db import get_job
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from backend.storage.db import get_job, running_jobs_in_workspace
 from backend.config import settings
+from backend.services import file_tree, snapshots, workspace_manifest
+from backend.services.repo_scaffold import find_workspace
 
 router = APIRouter()
 
-def find_workspace_path(job):
-    """Find the workspace directory for a job by matching project name"""
-    ws_root = Path(settings.WORKSPACE_ROOT)
-    if not ws_root.exists():
-        return None
-    
-    # Find directories matching the pattern: {project_name}_{8_chars}
-    project_name = job['project_name'].replace(' ', '_')
-    pattern = f"{project_name}_*"
-    
-    # Get all matching directories sorted by modification time (most recent first)
-    matching_dirs = list(ws_root.glob(pattern))
-    if not matching_dirs:
-        return None
-    
-    # Return the most recently modified one (should be the workspace for this job)
-    matching_dirs.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-    return matching_dirs[0]
+def find_workspace_path(job_id: str):
+    """Workspace directory of a job, or None; 404 if the job does not exist"""
+    workspace_path = find_workspace(job_id)
+    if workspace_path is None and not get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return workspace_path
 
 @router.get("/{job_id}/files")
-def list_workspace_files(job_id: str):
-    """List all files in a job's workspace"""
-    job = get_job(job_id)
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    workspace_path = find_workspace_path(job)
+def list_workspace_files(job_id: str, request: Request):
+    """List all files in a job's workspace (cached; supports If-None-Match)"""
+    workspace_path = find_workspace_path(job_id)
     if not workspace_path or not workspace_path.exists():
         return {"files": []}
     
-    files = []
-    for root, dirs, filenames in os.walk(workspace_path):
-        # Skip hidden dirs and cache
-        dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__pycache__']
-        
-        for filename in filenames:
-            if filename.startswith('.'):
-                continue
-            
-            filepath = Path(root) / filename
-            rel_path = filepath.relative_to(workspace_path)
-            
-            try:
-                size = filepath.stat().st_size
-                files.append({
-                    "path": str(rel_path),
-                    "size": size,
-                    "type": "file"
-                })
-            except Exception:
-                continue
-    
-    return {"files": sorted(files, key=lambda x: x["path"])}
+    files, etag = file_tree.listing(str(workspace_path))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if file_tree.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse({"files": files}, headers=headers)
 
-@router.get("/{job_id}/files/{file_path:path}")
-def read_workspace_file(job_id: str, file_path: str):
-    """Read content of a specific file in the workspace"""
-    job = get_job(job_id)
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    workspace_path = find_workspace_path(job)
+def _inside(root: Path, file_path: str) -> Path | None:
+    """`file_path` resolved under the (resolved) workspace root, or None if it escapes it"""
+    try:
+        target_file = (root / file_path).resolve()
+    except Exception:
+        return None
+    return target_file if target_file.is_relative_to(root) else None
+
+def _workspace_file(job_id: str, file_path: str):
+    """Resolve a file inside a job's workspace, or raise 403/404"""
+    workspace_path = find_workspace_path(job_id)
     if not workspace_path:
         raise HTTPException(status_code=404, detail="Workspace not found")
-    target_file = workspace_path / file_path
     
     # Security check: ensure file is within workspace
-    try:
-        target_file = target_file.resolve()
-        workspace_path = workspace_path.resolve()
-        if not str(target_file).startswith(str(workspace_path)):
-            raise HTTPException(status_code=403, detail="Access denied")
-    except Exception:
-        raise HTTPException(status_code=403, detail="Invalid file path")
-    
-    if not target_file.exists() or not target_file.is_file():
+    target_file = _inside(workspace_path.resolve(), file_path)
+    if target_file is None:
+        raise HTTPException(status_code=403, detail="Access denied")
+    if not target_file.is_file():
         raise HTTPException(status_code=404, detail="File not found")
+    return target_file
+
+@router.get("/{job_id}/files/{file_path:path}")
+def read_workspace_file(job_id: str, file_path: str):
+    """Read content of a small text file in the workspace (larger or binary files: /raw)"""
+    target_file = _workspace_file(job_id, file_path)
+    if target_file.stat().st_size > settings.FILE_VIEW_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File is larger than {settings.FILE_VIEW_MAX_BYTES} bytes; read it from /workspace/{job_id}/raw/{file_path}"
+        )
     
     try:
         content = target_file.read_text()
@@ -96,14 +77,137 @@ def read_workspace_file(job_id: str, file_path: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading file: {str(e)}")
 
+@router.get("/{job_id}/raw/{file_path:path}")
+def read_workspace_file_raw(job_id: str, file_path: str, request: Request):
+    """
+    Stream a workspace file as-is: chunked from disk (zero-copy where the
+    server supports the ASGI pathsend extension), with Range requests,
+    ETag/Last-Modified and If-None-Match -> 304
+    """
+    target_file = _workspace_file(job_id, file_path)
+    response = FileResponse(target_file, stat_result=target_file.stat(), content_disposition_type="inline")
+    # Generated files are untrusted: never let them run as a page of this origin
+    response.headers["Content-Security-Policy"] = "sandbox"
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    response.headers["Cache-Control"] = "no-cache"
+    if file_tree.etag_matches(request.headers.get("if-none-match"), response.headers["etag"]):
+        headers = {k: response.headers[k] for k in ("etag", "last-modified", "cache-control")}
+        return Response(status_code=304, headers=headers)
+    return response
+
+class BatchIn(BaseModel):
+    paths: list[str] = []
+    glob: str | None = None                # matched against listed paths; '*' crosses directories
+    known: dict[str, str] = {}             # path -> content hash the client already holds
+
+def _batch_lines(root: Path, manifest: workspace_manifest.Manifest, paths: list[str], known: dict[str, str]):
+    for path in paths:
+        target_file = _inside(root, path)
+        try:
+            if target_file is None:
+                raise PermissionError("Access denied")
+            st = target_file.stat()
+            if not target_file.is_file():
+                raise FileNotFoundError("File not found")
+            digest = manifest.known_hash(os.path.relpath(target_file, root), st)
+            if digest is not None and known.get(path) == digest:
+                yield json.dumps({"path": path, "hash": digest, "size": st.st_size, "unchanged": True}) + "\n"
+                continue
+            if st.st_size > settings.FILE_VIEW_MAX_BYTES:
+                raise ValueError(f"File is larger than {settings.FILE_VIEW_MAX_BYTES} bytes; read it from /raw")
+            data = target_file.read_bytes()
+        except (OSError, ValueError) as e:
+            error = "File not found" if isinstance(e, FileNotFoundError) else str(e)
+            yield json.dumps({"path": path, "error": error}) + "\n"
+            continue
+        digest = digest or workspace_manifest.content_hash(data)
+        line = {"path": path, "hash": digest, "size": len(data)}
+        if known.get(path) == digest:
+            line["unchanged"] = True
+        else:
+            try:
+                line["content"] = data.decode("utf-8")
+            except UnicodeDecodeError:
+                line["content"], line["encoding"] = base64.b64encode(data).decode("ascii"), "base64"
+        yield json.dumps(line) + "\n"
+
+@router.post("/{job_id}/batch")
+def read_workspace_files(job_id: str, inp: BatchIn):
+    """
+    Read many workspace files in one request: the listed paths plus those
+    matching `glob`, streamed as NDJSON lines {"path", "hash", "size",
+    "content"[, "encoding": "base64"]}. Files whose hash matches `known`
+    come back as {"path", "hash", "size", "unchanged": true}; unreadable
+    ones as {"path", "error"}.
+    """
+    workspace_path = find_workspace_path(job_id)
+    if not workspace_path:
+        raise HTTPException(status_code=404, detail="Workspace not found")
+    root = workspace_path.resolve()
+    
+    paths = list(dict.fromkeys(inp.paths))
+    if inp.glob:
+        files, _ = file_tree.listing(str(root))
+        listed = set(paths)
+        paths += [f["path"] for f in files if f["path"] not in listed and fnmatch.fnmatchcase(f["path"], inp.glob)]
+    if len(paths) > settings.BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_FILES} files per batch")
+    # Keyed by the recorded path, like the write path's instance
+    manifest = workspace_manifest.get_manifest(str(workspace_path))
+    return StreamingResponse(_batch_lines(root, manifest, paths, inp.known), media_type="application/x-ndjson")
+
+def _workspace_or_404(job_id: str) -> str:
+    workspace_path = find_workspace_path(job_id)
+    if not workspace_path or not workspace_path.exists():
+        raise HTTPException(status_code=404, detail="Workspace not found")
+    return str(workspace_path)
+
+@router.get("/{job_id}/snapshots")
+def list_snapshots(job_id: str):
+    """Snapshots of a job's workspace, oldest first (the workspace may be shared by a project's jobs)"""
+    workspace_path = find_workspace_path(job_id)
+    if not workspace_path or not workspace_path.exists():
+        return {"snapshots": []}
+    return {"snapshots": snapshots.list_snapshots(str(workspace_path))}
+
+@router.post("/{job_id}/snapshots")
+def create_snapshot(job_id: str, label: str = "manual"):
+    """Snapshot the workspace now"""
+    return snapshots.create(_workspace_or_404(job_id), label, job_id)
+
+@router.get("/{job_id}/snapshots/{snapshot_id}/diff")
+def diff_snapshot(job_id: str, snapshot_id: str, base: int | None = None):
+    """
+    Files added, removed and modified between snapshot `base` (default:
+    the one before) and `snapshot_id` ("current": the workspace now), with
+    unified diffs of the text files
+    """
+    repo = _workspace_or_404(job_id)
+    if snapshot_id != "current" and not snapshot_id.isdigit():
+        raise HTTPException(status_code=400, detail="Snapshot id must be a number or 'current'")
+    try:
+        return snapshots.diff(repo, None if snapshot_id == "current" else int(snapshot_id), base)
+    except snapshots.SnapshotError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/{job_id}/snapshots/{snapshot_id}/restore")
+def restore_snapshot(job_id: str, snapshot_id: int):
+    """Put the workspace back to a snapshot (the current state is snapshotted first)"""
+    repo = _workspace_or_404(job_id)
+    # Any job building in this workspace, e.g. a newer modify job of the same project
+    running = running_jobs_in_workspace(repo)
+    if running:
+        raise HTTPException(status_code=409, detail=f"Cannot restore while job {running[0]} is running in this workspace")
+    try:
+        changed = snapshots.restore(repo, snapshot_id, job_id)
+    except snapshots.SnapshotError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"restored": snapshot_id, "changed": changed}
+
 @router.get("/{job_id}/preview")
 def get_preview(job_id: str):
     """Get preview information for a job's generated code"""
-    job = get_job(job_id)
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    workspace_path = find_workspace_path(job)
+    workspace_path = find_workspace_path(job_id)
     if not workspace_path or not workspace_path.exists():
         raise HTTPException(status_code=404, detail="Workspace not found")
     
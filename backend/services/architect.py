@@ -42,13 +42,13 @@ def review_code(repo_path: str) -> dict:
     Review all code in the repository using AI Architect
     Returns: dict with has_issues, severity, issues[], summary
     """
-    llm = get_llm()
+    llm = get_llm("architect")
     
     # Collect all code files
     code_files = []
     for root, dirs, files in os.walk(repo_path):
-        # Skip common ignore dirs
-        dirs[:] = [d for d in dirs if d not in {'.git', '__pycache__', 'node_modules', 'venv', '.venv'}]
+        # Skip common ignore dirs and dot-dirs (.git, .forge with its venv)
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in {'__pycache__', 'node_modules', 'venv'}]
         
         for file in files:
             if file.endswith(('.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.go', '.rs')):
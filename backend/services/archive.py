@@ -0,0 +1,187 @@
+"""
+Archive Service - Streams a workspace as a zip, tar.gz or tar archive while
+it is being built, and keeps each finished archive in .forge/exports keyed
+by a hash of the files it holds, so an unchanged workspace is served from
+disk instead of being compressed again
+"""
+import hashlib
+import os
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
+from backend.services import workspace_manifest
+
+# format -> media type
+FORMATS = {
+    "zip": "application/zip",
+    "tar.gz": "application/gzip",
+    "tar": "application/x-tar",
+}
+EXPORTS_DIR = os.path.join(".forge", "exports")
+CHUNK = 1 << 16
+# tar.gz is the fast option for large workspaces: favour speed over size
+GZIP_LEVEL = 1
+
+
+def members(repo: str) -> list[tuple[str, str, os.stat_result]]:
+    """(archive name, full path, stat) of every file to export: all but Forge's own state in .forge"""
+    result = []
+    for root, dirs, files in os.walk(repo):
+        dirs[:] = sorted(d for d in dirs if d != '.forge')
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            result.append((os.path.relpath(full, repo).replace(os.sep, "/"), full, st))
+    return result
+
+
+def cache_key(repo: str, files: list[tuple[str, str, os.stat_result]], fmt: str) -> str:
+    """
+    Hash of what an archive of `files` holds: the manifest's content hash
+    for files from the write path, size and mtime for the rest (no file is read)
+    """
+    manifest = workspace_manifest.get_manifest(repo)
+    key = hashlib.sha256(fmt.encode())
+    for name, _, st in files:
+        digest = manifest.known_hash(name.replace("/", os.sep), st) or f"{st.st_size}:{st.st_mtime_ns}"
+        key.update(f"{name}\0{digest}\0{st.st_mode & 0o777:o}\n".encode())
+    return key.hexdigest()[:32]
+
+
+def _cache_path(repo: str, key: str, fmt: str) -> str:
+    return os.path.join(repo, EXPORTS_DIR, f"{key}.{fmt}")
+
+
+def cached(repo: str, key: str, fmt: str) -> str | None:
+    """Path of the finished archive for `key`, if there is one"""
+    path = _cache_path(repo, key, fmt)
+    return path if os.path.isfile(path) else None
+
+
+class _Sink:
+    """
+    Write-only, unseekable file object for the archive writers (zipfile then
+    writes data descriptors instead of seeking back); optionally gzips
+    """
+
+    def __init__(self, gzip: bool = False):
+        self.parts: list[bytes] = []
+        self.total = 0      # bytes written, before compression
+        self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if gzip else None
+
+    def write(self, data) -> int:
+        size = len(data)
+        self.total += size
+        data = bytes(data)
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+        if data:
+            self.parts.append(data)
+        return size
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.compressor is not None:
+            self.parts.append(self.compressor.flush())
+            self.compressor = None
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def _zip(files, sink: _Sink):
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, full, st in files:
+            try:
+                src = open(full, "rb")
+            except OSError:
+                continue  # deleted meanwhile
+            with src:
+                info = zipfile.ZipInfo(name, date_time=_date_time(st))
+                info.external_attr = (st.st_mode & 0xFFFF) << 16
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.file_size = st.st_size     # lets zipfile pick zip64 up front
+                with zf.open(info, "w") as dst:
+                    while chunk := src.read(CHUNK):
+                        dst.write(chunk)
+                        yield
+    yield
+
+
+def _date_time(st: os.stat_result) -> tuple:
+    # Zip timestamps start in 1980
+    return max(time.localtime(st.st_mtime)[:6], (1980, 1, 1, 0, 0, 0))
+
+
+def _tar(files, sink: _Sink):
+    nul = tarfile.NUL
+    for name, full, st in files:
+        try:
+            src = open(full, "rb")
+        except OSError:
+            continue
+        with src:
+            info = tarfile.TarInfo(name)
+            info.size, info.mtime, info.mode = st.st_size, int(st.st_mtime), st.st_mode & 0o7777
+            sink.write(info.tobuf(tarfile.PAX_FORMAT))
+            written = 0
+            while written < info.size and (chunk := src.read(min(CHUNK, info.size - written))):
+                sink.write(chunk)
+                written += len(chunk)
+                yield
+            # Keep the header's size if the file shrank meanwhile
+            sink.write(nul * (info.size - written + -info.size % tarfile.BLOCKSIZE))
+    # End-of-archive marker, padded to a whole record
+    sink.write(nul * (2 * tarfile.BLOCKSIZE))
+    sink.write(nul * (-sink.total % tarfile.RECORDSIZE))
+    sink.close()
+    yield
+
+
+def stream(repo: str, files: list[tuple[str, str, os.stat_result]], fmt: str, key: str):
+    """
+    Yield the archive of `files` chunk by chunk as it is built. A copy is
+    written to the export cache, kept only if the whole archive was sent
+    and the workspace did not change meanwhile.
+    """
+    sink = _Sink(gzip=fmt == "tar.gz")
+    steps = _zip(files, sink) if fmt == "zip" else _tar(files, sink)
+    final = _cache_path(repo, key, fmt)
+    os.makedirs(os.path.dirname(final), exist_ok=True)
+    tmp = f"{final}.tmp-{os.getpid()}-{threading.get_ident()}"
+    complete = False
+    try:
+        with open(tmp, "wb") as cache:
+            for _ in steps:
+                data = sink.drain()
+                if data:
+                    cache.write(data)
+                    yield data
+        complete = True
+    finally:
+        if complete and cache_key(repo, members(repo), fmt) == key:
+            _keep(repo, tmp, final, fmt)
+        elif os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _keep(repo: str, tmp: str, final: str, fmt: str):
+    """Move a finished archive into the cache, dropping older ones of its format"""
+    os.replace(tmp, final)
+    directory = os.path.join(repo, EXPORTS_DIR)
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if path != final and name.split(".", 1)[1] == fmt:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,267 @@
+"""
+Build Stages - The stages both build modes share (plan, code chunks,
+precheck, review, test, fix) as pipeline graphs over one workspace
+"""
+import os
+from backend.services.llm_router import get_llm
+from backend.services.fenced import apply_stream
+from backend.services.pipeline import Pipeline, Stage
+from backend.services import evaluator, architect, precheck, patcher, snapshots, workspace_index, workspace_manifest
+from backend.storage.db import append_job_log
+from backend.config import settings
+
+SYSTEM_PLANNER = """You are a senior software architect. Plan tasks, files, and tests. Output JSON with keys: files[], tests[], steps[].
+IMPORTANT: All test files MUST be placed in a tests/ directory at the project root. Keep it compact."""
+
+SYSTEM_CODER = """You are a senior developer. Implement the files using proper project structure.
+
+CRITICAL RULES:
+1. ALL test files MUST go in the tests/ directory at project root
+2. Use proper file paths (e.g., 'src/main.py', 'tests/test_main.py')
+3. For Python projects: put source in root or src/, tests in tests/
+4. Reply with fenced code blocks in this format:
+
+```filename.py
+<content here>
+```
+
+```tests/test_filename.py
+<test content here>
+```
+
+Repeat for each file. Use REAL file paths, not placeholders."""
+
+
+class BuildRun:
+    """
+    One job's build over a workspace: runs stage graphs, keeps the state
+    carried between them (last tested manifest revision, unapplied diff
+    hunks) and collects every stage's timing record.
+    """
+
+    def __init__(self, job_id: str, repo: str, fixer_system: str, review: bool = False):
+        self.job_id = job_id
+        self.repo = repo
+        self.fixer_system = fixer_system
+        self.review = review            # run the AI Architect next to the tests
+        self.tested_rev = None          # manifest revision of the last test run (None: run the full suite)
+        self.conflicts = []             # diff hunks from the last edit that did not apply
+        self.records: list[dict] = []
+
+    def run(self, stages: list[Stage], state: dict | None = None) -> dict:
+        pipeline = Pipeline(stages, max_workers=settings.PIPELINE_WORKERS)
+        try:
+            return pipeline.run(state)
+        finally:
+            self.records.extend(pipeline.records)
+
+    def edit_stage(self, name: str, fn, inputs=(), outputs=()) -> Stage:
+        """
+        A Stage for `fn`, which streams edits into the workspace. A failed
+        attempt is retried (PIPELINE_RETRIES) only if it wrote nothing: a
+        retry on top of partly applied edits would apply its diffs twice.
+        """
+        started = {}
+
+        def attempt(**args):
+            started['rev'] = workspace_manifest.revision(self.repo)
+            return fn(**args)
+
+        def nothing_written(error):
+            return not workspace_manifest.changes_since(self.repo, started['rev'])
+
+        return Stage(name, attempt, inputs=inputs, outputs=outputs,
+                     retries=settings.PIPELINE_RETRIES, retry_if=nothing_written)
+
+    def log_files(self, paths: list[str]):
+        """Log the content of written files (deleted ones are skipped)"""
+        for fname in paths:
+            if not os.path.exists(os.path.join(self.repo, fname)):
+                continue
+            with open(os.path.join(self.repo, fname), 'r') as f:
+                content = f.read()
+            append_job_log(self.job_id, 'file', {'path': fname, 'content': content})
+
+    def log_timings(self):
+        append_job_log(self.job_id, 'stages', self.records)
+
+    def snapshot(self, label: str) -> int | None:
+        """Snapshot the workspace (see services/snapshots.py); a failure only costs the snapshot"""
+        try:
+            return snapshots.create(self.repo, label, self.job_id)["id"]
+        except (OSError, snapshots.SnapshotError) as e:
+            append_job_log(self.job_id, 'status', f'   ⚠️  Could not snapshot the workspace: {e}')
+            return None
+
+    # ---- plan + code ----
+
+    def generate(self, spec_chunks: list[str]):
+        """
+        Plan from the first spec chunk, then code every chunk. Later chunks
+        are generated concurrently with the first and applied in order; the
+        first streams straight into the workspace.
+        """
+        job_id, repo = self.job_id, self.repo
+        retries = settings.PIPELINE_RETRIES
+
+        def plan_stage():
+            append_job_log(job_id, 'status', '🧠 Planning project structure...')
+            plan = get_llm("planner").complete(system=SYSTEM_PLANNER, user=spec_chunks[0], max_tokens=settings.MAX_REPLY_TOKENS)
+            append_job_log(job_id, 'plan', plan)
+            append_job_log(job_id, 'status', '💻 Generating code files...')
+            return {'plan': plan}
+
+        def code_fragments(i, chunk, plan):
+            append_job_log(job_id, 'status', f'   Processing spec chunk {i}/{len(spec_chunks)}...')
+            return get_llm("coder").stream(
+                system=SYSTEM_CODER,
+                user=f"SPEC CHUNK:\n{chunk}\n\nPLAN:\n{plan}",
+                max_tokens=settings.MAX_REPLY_TOKENS
+            )
+
+        def apply(i, fragments):
+            # Each file is written (and shown) as soon as its block is complete
+            apply_stream(repo, fragments, label=f"code {i}", on_files=self.log_files)
+
+        stages = [Stage('plan', plan_stage, outputs=('plan',), retries=retries)]
+        for i, chunk in enumerate(spec_chunks, 1):
+            if i == 1:
+                stages.append(self.edit_stage(
+                    'code 1', lambda plan, chunk=chunk: {'applied_1': apply(1, code_fragments(1, chunk, plan))},
+                    inputs=('plan',), outputs=('applied_1',)
+                ))
+                continue
+            stages.append(Stage(
+                f'code {i}', lambda plan, i=i, chunk=chunk: {f'reply_{i}': list(code_fragments(i, chunk, plan))},
+                inputs=('plan',), outputs=(f'reply_{i}',), retries=retries
+            ))
+            stages.append(Stage(
+                f'apply {i}', lambda i=i, **state: {f'applied_{i}': apply(i, state[f'reply_{i}'])},
+                inputs=(f'reply_{i}', f'applied_{i - 1}'), outputs=(f'applied_{i}',)
+            ))
+        self.run(stages)
+
+    # ---- precheck -> review || test -> fix ----
+
+    def verify(self) -> tuple[bool, dict | None]:
+        """
+        Pre-check, review (if enabled) and test the workspace, fixing and
+        repeating up to MAX_ITERS times. The workspace is snapshotted as
+        each iteration starts and, if the last fix was never checked, at
+        the end. Returns (passed, last report).
+        """
+        report = None
+        for iteration in range(settings.MAX_ITERS):
+            append_job_log(self.job_id, 'status', f'🔄 Iteration {iteration + 1}/{settings.MAX_ITERS}')
+            state = self.run(self._verify_stages(iteration))
+            report = {'precheck': state['issues']} if state['issues'] else state['test_report']
+            if state['passed']:
+                return True, report
+        self.snapshot('after last fix')
+        return False, report
+
+    def _verify_stages(self, iteration: int) -> list[Stage]:
+        job_id, repo = self.job_id, self.repo
+        clean = lambda issues: not issues  # noqa: E731
+
+        def snapshot_stage():
+            return {'snapshot': self.snapshot(f'iteration {iteration + 1}')}
+
+        def precheck_stage(snapshot):
+            # Local static pre-check; broken code goes straight to the Fixer
+            issues = precheck.check(repo)
+            if issues:
+                append_job_log(job_id, 'status', f'   🧹 Pre-check found {len(issues)} problem(s); skipping review and tests')
+                append_job_log(job_id, 'precheck', {'iteration': iteration + 1, 'issues': issues})
+            return {'issues': issues}
+
+        def review_stage(issues):
+            append_job_log(job_id, 'status', '   🏗️  AI Architect reviewing code...')
+            review = architect.review_code(repo)
+            append_job_log(job_id, 'architect', {
+                'iteration': iteration + 1,
+                'has_issues': review.get('has_issues', False),
+                'severity': review.get('severity', 'none'),
+                'summary': review.get('summary', ''),
+                'issues': review.get('issues', [])
+            })
+            return {'review': review}
+
+        def test_stage(issues):
+            append_job_log(job_id, 'status', '   🧪 Running tests...')
+            changed_files = None if self.tested_rev is None else workspace_manifest.changes_since(repo, self.tested_rev)
+            self.tested_rev = workspace_manifest.revision(repo)
+            tests_ok, test_report = evaluator.run(repo, changed_files)
+            append_job_log(job_id, 'test', {
+                'iteration': iteration + 1,
+                'passed': tests_ok,
+                'output': test_report
+            })
+            return {'tests_ok': tests_ok, 'test_report': test_report}
+
+        def verdict_stage(issues, tests_ok, review=None):
+            review_ok = not (review and review.get('has_issues', False))
+            return {'passed': bool(not issues and tests_ok and review_ok)}
+
+        def fix_stage(issues, passed, tests_ok, test_report, review=None):
+            if issues:
+                self.fix(precheck.format_for_fixer(issues, repo), iteration)
+                return {'fixed': True}
+            # Prepare fix context
+            fix_context = ""
+            if review and review.get('has_issues', False):
+                append_job_log(job_id, 'status', f'   ⚠️  AI Architect found {len(review.get("issues", []))} issue(s) (severity: {review.get("severity", "unknown")})')
+                fix_context += architect.format_review_for_fixer(review) + "\n\n"
+            if not tests_ok:
+                append_job_log(job_id, 'status', '   ⚠️  Tests failed')
+                fix_context += evaluator.format_failures_for_fixer(test_report, repo) + "\n\n"
+            self.fix(fix_context, iteration)
+            return {'fixed': True}
+
+        reviewed = ('review',) if self.review else ()
+        stages = [
+            Stage('snapshot', snapshot_stage, outputs=('snapshot',)),
+            Stage('precheck', precheck_stage, inputs=('snapshot',), outputs=('issues',)),
+            Stage('test', test_stage, inputs=('issues',), outputs=('tests_ok', 'test_report'), when=clean),
+            Stage('verdict', verdict_stage, inputs=('issues', 'tests_ok') + reviewed, outputs=('passed',)),
+            Stage(
+                'fix', fix_stage, inputs=('issues', 'passed', 'tests_ok', 'test_report') + reviewed,
+                outputs=('fixed',), when=lambda passed, **_: not passed
+            ),
+        ]
+        if self.review:
+            # Independent of the tests: the two run concurrently
+            stages.insert(1, Stage(
+                'review', review_stage, inputs=('issues',), outputs=('review',),
+                when=clean, retries=settings.PIPELINE_RETRIES
+            ))
+        return stages
+
+    def fix(self, fix_context: str, iteration: int) -> list[str]:
+        """
+        Ask the Fixer to address `fix_context` and write its files; returns
+        the paths written. Unapplied diff hunks from the previous edit are
+        reported back to it, and this fix's replace them.
+        """
+        job_id, repo, conflicts = self.job_id, self.repo, self.conflicts
+        append_job_log(job_id, 'status', '   🔧 Applying fixes...')
+        if conflicts:
+            fix_context = patcher.format_conflicts(conflicts) + "\n" + fix_context
+            conflicts.clear()
+        # The code the issues point at, so the Fixer can write exact diffs
+        code_context = workspace_index.build_context(repo, fix_context)
+        fragments = get_llm("fixer", attempt=iteration).stream(
+            system=self.fixer_system,
+            user=(fix_context + "\n" + code_context)[:settings.MAX_INPUT_CHARS],
+            max_tokens=settings.MAX_REPLY_TOKENS
+        )
+        files_fixed = apply_stream(repo, fragments, conflicts, label=f"fix {iteration + 1}")
+        for c in conflicts:
+            append_job_log(job_id, 'status', f'      ⚠️  Patch conflict in {c["path"]} {c["hunk"]}: {c["reason"]}')
+
+        if files_fixed:
+            for fname in files_fixed:
+                append_job_log(job_id, 'status', f'      ✏️  Fixed: {fname}')
+        else:
+            append_job_log(job_id, 'status', '      ⚠️  No files were modified by the fixer')
+        return files_fixed
@@ -0,0 +1,94 @@
+"""
+Conversation Summary Service - Keeps modify prompts bounded by folding older
+conversation turns into a persisted rolling summary per project
+"""
+from backend.services.llm_router import get_llm
+from backend.storage.db import get_messages, get_project_summary, save_project_summary
+from backend.config import settings
+
+SYSTEM_SUMMARIZER = """You maintain the running summary of a conversation between a user and a code generation assistant about one software project.
+
+You are given the CURRENT SUMMARY (possibly empty) and NEW MESSAGES that happened after it.
+Reply with the UPDATED SUMMARY only: merge the new messages into the current summary.
+
+Keep: requirements, features built, design decisions, file and function names, constraints, unresolved problems.
+Drop: pleasantries, repetition, and details superseded by later messages.
+Be terse; use short bullet points."""
+
+
+def _role_label(msg: dict) -> str:
+    return "USER" if msg['role'] == 'user' else "ASSISTANT"
+
+
+def _clip(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit] + "\n... (truncated)"
+
+
+def _fallback_summary(summary: str, messages: list[dict]) -> str:
+    """Extractive summary used when the summarizer model is unavailable"""
+    lines = [summary] if summary else []
+    for msg in messages:
+        first_line = msg['content'].strip().splitlines()[0] if msg['content'].strip() else ""
+        lines.append(f"- {_role_label(msg)}: {_clip(first_line, 200)}")
+    # Keep the newest information when over budget
+    return "\n".join(lines)[-settings.CONVERSATION_SUMMARY_MAX_CHARS:]
+
+
+def fold_messages(summary: str, messages: list[dict]) -> str:
+    """Merge `messages` into `summary` with the summarizer model"""
+    new_turns = "\n\n".join(
+        f"{_role_label(m)}: {_clip(m['content'], settings.CONVERSATION_MESSAGE_MAX_CHARS)}" for m in messages
+    )
+    prompt = f"CURRENT SUMMARY:\n{summary or '(empty)'}\n\nNEW MESSAGES:\n{new_turns}"
+    try:
+        updated = get_llm("summarizer").complete(
+            system=SYSTEM_SUMMARIZER,
+            user=prompt[:settings.MAX_INPUT_CHARS],
+            max_tokens=settings.CONVERSATION_SUMMARY_MAX_CHARS // 4
+        )
+    except Exception as e:
+        print(f"Conversation summarizer failed, using extractive summary: {e}")
+        return _fallback_summary(summary, messages)
+    return _clip(updated.strip(), settings.CONVERSATION_SUMMARY_MAX_CHARS)
+
+
+def build_conversation_context(project_id: str | None) -> str:
+    """
+    Build conversation history for context.
+    Older messages are represented by the project's rolling summary, which is
+    brought up to date in batches; the most recent messages stay verbatim.
+    """
+    if not project_id:
+        return ""
+    messages = get_messages(project_id)
+    if not messages:
+        return ""
+
+    keep = settings.CONVERSATION_RECENT_MESSAGES
+    older = messages[:-keep] if keep else messages
+
+    stored = get_project_summary(project_id)
+    summary = stored['summary'] if stored else ""
+    covered = min(stored['covered_count'], len(older)) if stored else 0
+
+    pending = older[covered:]
+    if len(pending) >= settings.CONVERSATION_SUMMARY_BATCH:
+        summary = fold_messages(summary, pending)
+        covered = len(older)
+        save_project_summary(project_id, summary, covered)
+
+    # Anything not yet folded into the summary is shown verbatim
+    verbatim = messages[covered:]
+
+    lines = ["CONVERSATION HISTORY:", ""]
+    if summary:
+        lines.append("SUMMARY OF EARLIER CONVERSATION:")
+        lines.append(summary)
+        lines.append("")
+    for msg in verbatim:
+        lines.append(f"{_role_label(msg)}: {_clip(msg['content'], settings.CONVERSATION_MESSAGE_MAX_CHARS)}")
+        lines.append("")
+
+    return "\n".join(lines)
@@ -1,38 +1,18 @@
 import os
-import json
-import re
-from pathlib import Path
-from backend.services.llm_router import get_llm
 from backend.services.chunker import chunk_text
-from backend.services import repo_scaffold, evaluator
+from backend.services.fenced import EDIT_FORMAT, apply_stream
+from backend.services.llm_router import get_llm
+from backend.services.pipeline import Stage
+from backend.services import repo_scaffold, workspace_index, workspace_manifest
+from backend.services.build_stages import BuildRun, SYSTEM_PLANNER, SYSTEM_CODER  # noqa: F401
+from backend.services.conversation_summary import build_conversation_context
 from backend.storage.db import (
     update_job_status, append_job_log, 
-    get_project, update_project_workspace, get_messages, add_message
+    get_project, update_project_workspace, add_message, set_job_workspace
 )
 from backend.config import settings
 
-SYSTEM_PLANNER = """You are a senior software architect. Plan tasks, files, and tests. Output JSON with keys: files[], tests[], steps[]. 
-IMPORTANT: All test files MUST be placed in a tests/ directory at the project root. Keep it compact."""
-
-SYSTEM_CODER = """You are a senior developer. Implement the files using proper project structure.
-
-CRITICAL RULES:
-1. ALL test files MUST go in the tests/ directory at project root
-2. Use proper file paths (e.g., 'src/main.py', 'tests/test_main.py')
-3. For Python projects: put source in root or src/, tests in tests/
-4. Reply with fenced code blocks in this format:
-
-```filename.py
-<content here>
-```
-
-```tests/test_filename.py
-<test content here>
-```
-
-Repeat for each file. Use REAL file paths, not placeholders."""
-
-SYSTEM_MODIFIER = """You are a senior developer making iterative improvements to an existing codebase.
+SYSTEM_MODIFIER = f"""You are a senior developer making iterative improvements to an existing codebase.
 
 CONTEXT:
 The user has an existing project with specific files and wants you to make targeted changes.
@@ -40,88 +20,23 @@ The user has an existing project with specific files and wants you to make targe
 TASK:
 1. Review the current codebase structure and files shown below
 2. Make ONLY the changes requested by the user
-3. Reply with fenced code blocks for ONLY the files you're modifying/adding
-
-Format for code blocks:
-```filename.py
-<complete updated file content>
-```
+3. Reply with fenced blocks for ONLY the files you're modifying/adding
 
-DO NOT regenerate files that don't need changes. Only output what needs to be modified or added."""
+{EDIT_FORMAT}
 
-SYSTEM_FIXER = "You are a senior maintainer. Given failing output, reply ONLY with fenced code blocks as above. Put test fixes in tests/ directory."
+DO NOT regenerate files that don't need changes. Prefer diffs for edits to existing files.
+Large files may be shown only as EXCERPTS; change them with diffs against the lines shown, never replace an excerpted file with just the lines you were shown."""
 
+SYSTEM_FIXER = f"""You are a senior maintainer. Given failing output and the current code, reply ONLY with fenced blocks. Prefer small diffs over rewriting whole files. Put test fixes in tests/ directory.
 
-def apply_fenced(repo: str, text: str):
-    """Apply fenced code blocks to files and return list of created/modified files"""
-    files_created = []
-    for header, body in re.findall(r"```(.*?)\n([\s\S]*?)```", text):
-        header_parts = header.strip().split()
-        if not header_parts:
-            continue
-        fname = header_parts[0]
-        full = os.path.join(repo, fname)
-        os.makedirs(os.path.dirname(full), exist_ok=True)
-        with open(full, "w", encoding="utf-8") as f:
-            f.write(body)
-        files_created.append(fname)
-    return files_created
+{EDIT_FORMAT}"""
 
 
-def get_workspace_context(workspace_path: str) -> str:
-    """Get a summary of the current workspace for context-aware modifications"""
+def get_workspace_context(workspace_path: str, request: str) -> str:
+    """Get the workspace files relevant to a request for context-aware modifications"""
     if not workspace_path or not os.path.exists(workspace_path):
         return ""
-    
-    context_lines = ["CURRENT WORKSPACE STRUCTURE:", ""]
-    
-    # List all files in workspace
-    for root, dirs, files in os.walk(workspace_path):
-        # Skip hidden directories and __pycache__
-        dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__pycache__']
-        
-        level = root.replace(workspace_path, '').count(os.sep)
-        indent = '  ' * level
-        folder_name = os.path.basename(root) or 'root'
-        context_lines.append(f"{indent}{folder_name}/")
-        
-        sub_indent = '  ' * (level + 1)
-        for file in sorted(files):
-            if not file.startswith('.'):
-                file_path = os.path.join(root, file)
-                rel_path = os.path.relpath(file_path, workspace_path)
-                
-                # Include file content for small files
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    if len(content) < 2000:  # Only include small files
-                        context_lines.append(f"\n--- FILE: {rel_path} ---")
-                        context_lines.append(content)
-                        context_lines.append("--- END FILE ---\n")
-                    else:
-                        context_lines.append(f"{sub_indent}{file} ({len(content)} bytes)")
-                except:
-                    context_lines.append(f"{sub_indent}{file}")
-    
-    return "\n".join(context_lines)
-
-
-def build_conversation_context(project_id: str | None) -> str:
-    """Build conversation history for context"""
-    if not project_id:
-        return ""
-    messages = get_messages(project_id)
-    if not messages:
-        return ""
-    
-    lines = ["CONVERSATION HISTORY:", ""]
-    for msg in messages:
-        role_label = "USER" if msg['role'] == 'user' else "ASSISTANT"
-        lines.append(f"{role_label}: {msg['content']}")
-        lines.append("")
-    
-    return "\n".join(lines)
+    return workspace_index.build_context(workspace_path, request)
 
 
 def run_conversational_build(job: dict, project_id: str | None = None, mode: str = "create"):
@@ -134,7 +49,6 @@ def run_conversational_build(job: dict, project_id: str | None = None, mode: str
         mode: 'create' for initial generation, 'modify' for iterative edits
     """
     job_id = job['id']
-    llm = get_llm()
     
     # Create or resume workspace
     if mode == "create" or not project_id:
@@ -153,37 +67,61 @@ def run_conversational_build(job: dict, project_id: str | None = None, mode: str
             raise ValueError(f"Project {project_id} has no workspace")
         
         repo = project['workspace_path']
+        set_job_workspace(job_id, repo)
         append_job_log(job_id, 'status', f'📂 Resuming workspace: {os.path.basename(repo)}')
         add_message(project_id, 'user', job['spec'], job_id)
     
-    spec_chunks = chunk_text(job["spec"])
-    
-    if mode == "create":
-        # Initial creation - plan and generate
-        append_job_log(job_id, 'status', '🧠 Planning project structure...')
-        plan = llm.complete(system=SYSTEM_PLANNER, user=spec_chunks[0], max_tokens=settings.MAX_REPLY_TOKENS)
-        append_job_log(job_id, 'plan', plan)
+    build = BuildRun(job_id, repo, SYSTEM_FIXER)
+    try:
+        if mode == "create":
+            # Initial creation - plan and generate
+            build.generate(chunk_text(job["spec"]))
+        else:  # mode == "modify"
+            _modify(build, job, project_id)
+
+        # Run tests and fix if needed
+        append_job_log(job_id, 'status', '🧪 Running tests...')
+        ok, report = build.verify()
+    finally:
+        build.log_timings()
+
+    if ok:
+        append_job_log(job_id, 'status', '✅ Build succeeded! All tests passed.')
+        update_job_status(job_id, 'succeeded', report)
         
-        append_job_log(job_id, 'status', '💻 Generating code files...')
-        for i, ch in enumerate(spec_chunks, 1):
-            append_job_log(job_id, 'status', f'   Processing spec chunk {i}/{len(spec_chunks)}...')
-            patch = llm.complete(
-                system=SYSTEM_CODER, 
-                user=f"SPEC CHUNK:\n{ch}\n\nPLAN:\n{plan}", 
-                max_tokens=settings.MAX_REPLY_TOKENS
-            )
-            files_created = apply_fenced(repo, patch)
-            for fname in files_created:
-                with open(os.path.join(repo, fname), 'r') as f:
-                    content = f.read()
-                append_job_log(job_id, 'file', {'path': fname, 'content': content})
+        # Add assistant message to conversation
+        if project_id:
+            success_msg = f"Successfully {'created' if mode == 'create' else 'modified'} the project. All tests passed!"
+            add_message(project_id, 'assistant', success_msg, job_id)
+        
+        return True, repo
+    
+    append_job_log(job_id, 'status', '❌ Build failed after maximum fix attempts.')
+    update_job_status(job_id, 'failed', report)
+    
+    # Add failure message to conversation
+    if project_id:
+        failure_msg = f"Build failed after {settings.MAX_ITERS} attempts. Please review the errors and try again."
+        add_message(project_id, 'assistant', failure_msg, job_id)
     
-    else:  # mode == "modify"
-        # Iterative modification - read context and make targeted changes
+    return False, repo
+
+
+def _modify(build: BuildRun, job: dict, project_id: str):
+    """
+    Iterative modification: read the workspace and conversation context
+    (concurrently), then make targeted changes
+    """
+    job_id, repo = build.job_id, build.repo
+
+    def workspace_stage():
         append_job_log(job_id, 'status', '🔍 Reading current workspace...')
-        workspace_context = get_workspace_context(repo)
-        conversation_context = build_conversation_context(project_id)
-        
+        return {'workspace_context': get_workspace_context(repo, job['spec'])}
+
+    def conversation_stage():
+        return {'conversation_context': build_conversation_context(project_id)}
+
+    def modify_stage(workspace_context, conversation_context):
         append_job_log(job_id, 'status', '✏️  Making targeted modifications...')
         modification_prompt = f"""{conversation_context}
 
@@ -192,61 +130,31 @@ def run_conversational_build(job: dict, project_id: str | None = None, mode: str
 NEW USER REQUEST:
 {job['spec']}
 
-Make ONLY the changes needed to fulfill this request. Output fenced code blocks for modified/new files only."""
+Make ONLY the changes needed to fulfill this request. Output diffs or fenced code blocks for modified/new files only."""
         
-        patch = llm.complete(
+        fragments = get_llm("modifier").stream(
             system=SYSTEM_MODIFIER, 
             user=modification_prompt, 
             max_tokens=settings.MAX_REPLY_TOKENS
         )
         
-        files_modified = apply_fenced(repo, patch)
-        for fname in files_modified:
-            with open(os.path.join(repo, fname), 'r') as f:
-                content = f.read()
-            append_job_log(job_id, 'file', {'path': fname, 'content': content})
+        build.conflicts.clear()
+        files_modified = apply_stream(repo, fragments, build.conflicts, label="modify", on_files=build.log_files)
+        for c in build.conflicts:
+            append_job_log(job_id, 'status', f'⚠️  Patch conflict in {c["path"]} {c["hunk"]}: {c["reason"]}')
         
         append_job_log(job_id, 'status', f'✅ Modified {len(files_modified)} file(s)')
-    
-    # Run tests and fix if needed
-    append_job_log(job_id, 'status', '🧪 Running tests...')
-    report = None
-    for iteration in range(settings.MAX_ITERS):
-        ok, report = evaluator.run(repo)
-        
-        append_job_log(job_id, 'test', {
-            'iteration': iteration + 1,
-            'passed': ok,
-            'output': report
-        })
-        
-        if ok:
-            append_job_log(job_id, 'status', '✅ Build succeeded! All tests passed.')
-            update_job_status(job_id, 'succeeded', report)
-            
-            # Add assistant message to conversation
-            if project_id:
-                success_msg = f"Successfully {'created' if mode == 'create' else 'modified'} the project. All tests passed!"
-                add_message(project_id, 'assistant', success_msg, job_id)
-            
-            return True, repo
-        
-        append_job_log(job_id, 'status', f'⚠️  Tests failed (attempt {iteration + 1}/{settings.MAX_ITERS}). Applying fixes...')
-        fix = llm.complete(
-            system=SYSTEM_FIXER, 
-            user=json.dumps(report)[:settings.MAX_INPUT_CHARS], 
-            max_tokens=settings.MAX_REPLY_TOKENS
-        )
-        files_fixed = apply_fenced(repo, fix)
-        for fname in files_fixed:
-            append_job_log(job_id, 'status', f'   Fixed: {fname}')
-    
-    append_job_log(job_id, 'status', '❌ Build failed after maximum fix attempts.')
-    update_job_status(job_id, 'failed', report)
-    
-    # Add failure message to conversation
-    if project_id:
-        failure_msg = f"Build failed after {settings.MAX_ITERS} attempts. Please review the errors and try again."
-        add_message(project_id, 'assistant', failure_msg, job_id)
-    
-    return False, repo
+        return {'modified': files_modified}
+
+    # Only the modifier's changes need their tests run first
+    build.tested_rev = workspace_manifest.revision(repo)
+    # The state the modification can be rolled back to
+    build.snapshot('before modify')
+    build.run([
+        Stage('context', workspace_stage, outputs=('workspace_context',)),
+        Stage('conversation', conversation_stage, outputs=('conversation_context',)),
+        build.edit_stage(
+            'modify', modify_stage, inputs=('workspace_context', 'conversation_context'),
+            outputs=('modified',)
+        ),
+    ])
@@ -1,21 +1,437 @@
-import subprocess
+import errno
+import heapq
+import json
 import os
+import signal
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from backend.config import settings
+from backend.services import pytest_pool, test_selector, venv_cache
+from backend.services.pytest_plugins import forge_sandbox
+
+# pytest exit code when nothing was collected (e.g. every test deselected)
+NO_TESTS_COLLECTED = 5
+
+PLUGIN_DIR = pytest_pool.PLUGIN_DIR
+DURATIONS_PATH = os.path.join(".forge", "test_durations.json")
+DEFAULT_TEST_SECONDS = 0.05
+# Peak resident memory (share of TEST_MEMORY_MB) reported as the memory limit
+MEMORY_LIMIT_FRACTION = 0.9
+
+# Fixer prompt limits
+MAX_FAILURES_SHOWN = 10
+MAX_EXCERPTS_PER_FAILURE = 2
+SOURCE_CONTEXT_LINES = 4
+FALLBACK_OUTPUT_CHARS = 4000
+
+
+def _env(repo_path: str):
+    # Workspace root so tests can import modules, plus the forge_results plugin
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join([repo_path, PLUGIN_DIR])
+    return env
+
+
+def _kill_group(proc: subprocess.Popen):
+    try:
+        if os.name == 'nt':
+            proc.kill()
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _limits() -> dict:
+    return {
+        "cpu_seconds": settings.TEST_CPU_SECONDS,
+        "memory_mb": settings.TEST_MEMORY_MB,
+        "max_processes": settings.TEST_MAX_PROCESSES,
+    }
+
+
+def _launch(repo_path: str, args: list[str], python: str | None = None):
+    """
+    Run pytest with `args` in the workspace, in a warm pool worker when
+    available, else a fresh process. `python` is the workspace's own
+    interpreter, if it has one (see venv_cache). On POSIX the run gets the
+    TEST_* resource limits. Returns (exit code, stdout, stderr, timed out,
+    usage); on timeout the whole process group is killed.
+    """
+    env = _env(repo_path)
+    limits = _limits()
+    if pytest_pool.supported():
+        try:
+            r = pytest_pool.get_pool().run(repo_path, args, env, settings.TEST_TIMEOUT, python=python, limits=limits)
+            return r["exit_code"], r["stdout"], r["stderr"], r["timed_out"], r.get("usage", {})
+        except pytest_pool.WorkerDied as e:
+            print(f"Warm pytest worker failed, running a fresh process: {e}")
+
+    if forge_sandbox.supported() and not getattr(sys, "frozen", False):
+        # The sandbox script applies the limits, then runs pytest in-process
+        sandbox = os.path.join(PLUGIN_DIR, "forge_sandbox.py")
+        with tempfile.TemporaryFile("w+") as out, tempfile.TemporaryFile("w+") as err:
+            proc = subprocess.Popen(
+                [python or sys.executable, sandbox, json.dumps(limits), *args],
+                cwd=repo_path,
+                stdout=out,
+                stderr=err,
+                env=env,
+                start_new_session=True
+            )
+            status, usage, timed_out = forge_sandbox.wait(proc.pid, settings.TEST_TIMEOUT)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            out.seek(0)
+            err.seek(0)
+            return -1 if timed_out else proc.returncode, out.read(), err.read(), timed_out, usage
+
+    proc = subprocess.Popen(
+        [python, "-m", "pytest", *args] if python else ["pytest", *args],
+        cwd=repo_path,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env,
+        start_new_session=os.name != 'nt'
+    )
+    try:
+        stdout, stderr = proc.communicate(timeout=settings.TEST_TIMEOUT)
+        return proc.returncode, stdout, stderr, False, {}
+    except subprocess.TimeoutExpired:
+        _kill_group(proc)
+        stdout, stderr = proc.communicate()
+        return -1, stdout, stderr, True, {}
+
+
+def _limit_hit(usage: dict, tests: list[dict], timed_out: bool) -> str | None:
+    """
+    Which resource limit (if any) ended or broke the run, from how the
+    process ended, its peak memory and the exceptions the tests failed
+    with (never from their output)
+    """
+    if timed_out:
+        return "wall_clock"
+    # SIGXCPU at the soft CPU limit; SIGKILL at the hard one if it was ignored
+    if usage.get("signal") == "SIGXCPU" or (
+        usage.get("signal") == "SIGKILL" and settings.TEST_CPU_SECONDS
+        and usage.get("cpu_seconds", 0) >= settings.TEST_CPU_SECONDS
+    ):
+        return "cpu"
+    # The address-space limit refuses allocations (MemoryError) before the
+    # resident set can reach it, so a peak close to it means it was reached
+    if settings.TEST_MEMORY_MB and (
+        usage.get("max_rss_mb", 0) >= settings.TEST_MEMORY_MB * MEMORY_LIMIT_FRACTION
+        or any(t.get("exception") == "MemoryError" for t in tests)
+    ):
+        return "memory"
+    # A refused fork or thread under RLIMIT_NPROC fails with EAGAIN
+    if settings.TEST_MAX_PROCESSES and any(t.get("errno") == errno.EAGAIN for t in tests):
+        return "processes"
+    return None
+
+
+def _merge_usage(a: dict, b: dict) -> dict:
+    """Usage of two runs: CPU and wall time add up, memory is the peak"""
+    if not a or not b:
+        return a or b
+    merged = {
+        "cpu_seconds": round(a["cpu_seconds"] + b["cpu_seconds"], 3),
+        "max_rss_mb": max(a["max_rss_mb"], b["max_rss_mb"]),
+        "wall_seconds": round(a["wall_seconds"] + b["wall_seconds"], 3),
+    }
+    limit = a.get("limit_hit") or b.get("limit_hit")
+    if limit:
+        merged["limit_hit"] = limit
+    return merged
+
+
+def _pytest(repo_path: str, args: list[str], python: str | None = None):
+    """
+    Run one pytest session in the workspace.
+    Returns (exit code, {"stdout", "stderr"}, per-test results); the exit
+    code is -1 if the run was killed for exceeding TEST_TIMEOUT.
+    """
+    fd, results_path = tempfile.mkstemp(prefix="forge-results-", suffix=".json")
+    os.close(fd)
+    code, stdout, stderr, timed_out, usage = _launch(
+        repo_path, ["-q", "-p", "forge_results", f"--forge-results={results_path}", *args], python
+    )
+
+    try:
+        with open(results_path, "r", encoding="utf-8") as f:
+            tests = json.load(f)["tests"]
+    except (OSError, ValueError, KeyError):
+        tests = []
+    finally:
+        os.unlink(results_path)
+
+    report = {"stdout": stdout, "stderr": stderr, "usage": usage}
+    limit = _limit_hit(usage, tests, timed_out)
+    if limit:
+        usage["limit_hit"] = limit
+    if timed_out:
+        report["stderr"] += f"\nTest run killed after {settings.TEST_TIMEOUT}s timeout"
+        report["timed_out"] = True
+    elif limit == "cpu":
+        report["stderr"] += f"\nTest run killed after exceeding the {settings.TEST_CPU_SECONDS}s CPU limit"
+    return code, report, tests
+
+
+# ============== Duration history ==============
+
+def load_durations(repo_path: str) -> dict[str, float]:
+    try:
+        with open(os.path.join(repo_path, DURATIONS_PATH), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_durations(repo_path: str, history: dict[str, float], tests: list[dict]):
+    if not tests:
+        return
+    history.update({t["nodeid"]: round(t["duration"], 4) for t in tests if "::" in t["nodeid"]})
+    path = os.path.join(repo_path, DURATIONS_PATH)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(history, f)
+
+
+def _expected_seconds(history: dict[str, float], args: list[str]) -> float:
+    """Historical duration of the tests a pytest invocation with `args` would run"""
+    include, exclude = [], []
+    it = iter(args)
+    for arg in it:
+        if arg == "--deselect":
+            exclude.append(next(it, ""))
+        elif not arg.startswith("-"):
+            include.append(arg)
+    included, excluded = tuple(include), tuple(exclude)
+    return sum(
+        seconds for nodeid, seconds in history.items()
+        if (not included or nodeid.startswith(included)) and not (excluded and nodeid.startswith(excluded))
+    )
 
-def run(repo_path: str):
+
+# ============== Sharding ==============
+
+def _collect(repo_path: str, args: list[str], python: str | None = None) -> list[str] | None:
+    code, stdout, _, _, _ = _launch(repo_path, ["--collect-only", "-q", *args], python)
+    if code != 0:
+        return None
+    return [line.strip() for line in stdout.splitlines() if "::" in line]
+
+
+def balance_shards(nodeids: list[str], history: dict[str, float], shards: int) -> list[list[str]]:
+    """Longest-first greedy packing of tests into shards of similar expected duration"""
+    known = sorted(history[t] for t in nodeids if t in history)
+    default = known[len(known) // 2] if known else DEFAULT_TEST_SECONDS
+    heap = [(0.0, i, []) for i in range(shards)]
+    for nodeid in sorted(nodeids, key=lambda t: -history.get(t, default)):
+        total, i, shard = heapq.heappop(heap)
+        shard.append(nodeid)
+        heapq.heappush(heap, (total + history.get(nodeid, default), i, shard))
+    return [shard for _, _, shard in sorted(heap, key=lambda h: h[1]) if shard]
+
+
+def _run_shards(repo_path: str, shards: list[list[str]], python: str | None = None):
+    """Run shards concurrently, one pytest process each, and merge their reports"""
+    with tempfile.TemporaryDirectory(prefix="forge-shards-") as tmp:
+        def run_shard(i):
+            # Node ids go through an args file to stay clear of command-line limits
+            args_file = os.path.join(tmp, f"shard_{i}.txt")
+            with open(args_file, "w", encoding="utf-8") as f:
+                f.write("\n".join(shards[i]))
+            return _pytest(repo_path, [f"@{args_file}"], python)
+
+        with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+            results = list(pool.map(run_shard, range(len(shards))))
+
+    report = {"stdout": "", "stderr": "", "usage": {}, "shards": []}
+    tests = []
+    for i, (code, shard_report, shard_tests) in enumerate(results):
+        header = f"===== shard {i + 1}/{len(shards)} ({len(shards[i])} tests) =====\n"
+        report["stdout"] += header + shard_report["stdout"]
+        if shard_report["stderr"]:
+            report["stderr"] += header + shard_report["stderr"]
+        report["shards"].append({
+            "tests": len(shards[i]),
+            "exit_code": code,
+            "timed_out": shard_report.get("timed_out", False),
+            "usage": shard_report["usage"]
+        })
+        report["usage"] = _merge_usage(report["usage"], shard_report["usage"])
+        tests.extend(shard_tests)
+    code = next((c for c, _, _ in results if c != 0), 0)
+    return code, report, tests
+
+
+def _run_tests(repo_path: str, args: list[str], python: str | None = None):
+    """
+    Run pytest with `args`. Suites whose recorded durations exceed
+    TEST_SHARD_MIN_SECONDS are collected and split into balanced shards run
+    in parallel across cores; per-shard timeouts only kill the shard that hangs.
+    """
+    history = load_durations(repo_path)
+    workers = settings.TEST_SHARD_WORKERS or os.cpu_count() or 1
+    result = None
+    if workers > 1 and _expected_seconds(history, args) >= settings.TEST_SHARD_MIN_SECONDS:
+        nodeids = _collect(repo_path, args, python)
+        if nodeids and len(nodeids) > 1:
+            shards = balance_shards(nodeids, history, min(workers, len(nodeids)))
+            result = _run_shards(repo_path, shards, python)
+    if result is None:
+        result = _pytest(repo_path, args, python)
+    code, report, tests = result
+    _save_durations(repo_path, history, tests)
+    _attach_results(report, tests)
+    return code, report
+
+
+def run(repo_path: str, changed_files: list[str] | None = None):
+    """
+    Run the workspace's tests.
+
+    With `changed_files` (the files written since the last run), the tests
+    that import them are run first so a regression fails fast; if they pass,
+    the rest of the suite runs too, so success always means the full suite
+    passed.
+
+    Workspaces that declare dependencies run in their own virtualenv; if
+    the install fails, tests run with the backend's interpreter and the
+    pip output is added to the report.
+    """
     tests_dir = os.path.join(repo_path, "tests")
     if not os.path.exists(tests_dir):
         return True, {"tests": "no tests found; skipping"}
-    
-    # Set PYTHONPATH to include workspace root so tests can import modules
-    env = os.environ.copy()
-    env['PYTHONPATH'] = repo_path
-    
-    out = subprocess.run(
-        ["pytest", "-q"], 
-        cwd=repo_path, 
-        capture_output=True, 
-        text=True, 
-        timeout=180,
-        env=env
-    )
-    return out.returncode == 0, {"stdout": out.stdout, "stderr": out.stderr}
+
+    python, install_error = None, None
+    try:
+        python = venv_cache.prepare(repo_path)
+    except (venv_cache.VenvError, OSError) as e:
+        install_error = str(e)
+
+    selected = None
+    if changed_files:
+        selected = test_selector.select_tests(repo_path, changed_files)
+    if not selected:
+        code, report = _run_tests(repo_path, [], python)
+        return _with_install_error(code == 0, report, install_error)
+
+    code, report = _run_tests(repo_path, selected, python)
+    report["selected"] = selected
+    if code != 0:
+        return _with_install_error(False, report, install_error)
+
+    deselect = [arg for path in selected for arg in ("--deselect", path)]
+    code, rest = _run_tests(repo_path, deselect, python)
+    report["stdout"] += rest["stdout"]
+    report["stderr"] += rest["stderr"]
+    report["tests"] += rest["tests"]
+    report["usage"] = _merge_usage(report["usage"], rest["usage"])
+    for outcome, count in rest["summary"].items():
+        report["summary"][outcome] = report["summary"].get(outcome, 0) + count
+    if rest.get("timed_out"):
+        report["timed_out"] = True
+    return _with_install_error(code in (0, NO_TESTS_COLLECTED), report, install_error)
+
+
+def _with_install_error(ok: bool, report: dict, install_error: str | None):
+    # Only matters to the Fixer if tests fail: the backend's interpreter may
+    # already provide what they need (e.g. offline with an empty wheel dir)
+    if install_error is not None:
+        report["install_error"] = install_error
+    return ok, report
+
+
+# ============== Structured results ==============
+
+def _attach_results(report: dict, tests: list[dict]):
+    """Add outcome counts and the non-passing tests (with failure details) to a report"""
+    summary = {}
+    for t in tests:
+        summary[t["outcome"]] = summary.get(t["outcome"], 0) + 1
+    report["summary"] = summary
+    report["tests"] = [t for t in tests if t["outcome"] in ("failed", "error")]
+
+
+def _excerpt(repo_path: str, path: str, line: int, context: int = SOURCE_CONTEXT_LINES) -> str | None:
+    """Numbered source lines around `line`, for workspace files only"""
+    full = os.path.realpath(os.path.join(repo_path, path))
+    root = os.path.realpath(repo_path)
+    if not full.startswith(root + os.sep) or not os.path.isfile(full):
+        return None
+    if f"{os.sep}site-packages{os.sep}" in full or f"{os.sep}.forge{os.sep}" in full:
+        return None
+    try:
+        with open(full, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except (OSError, UnicodeDecodeError):
+        return None
+    start, end = max(line - context, 1), min(line + context, len(lines))
+    return "\n".join(f"{n:>4}{'>' if n == line else ' '} {lines[n - 1]}" for n in range(start, end + 1))
+
+
+def _tail(text: str, limit: int) -> str:
+    return text if len(text) <= limit else "... (truncated)\n" + text[-limit:]
+
+
+def format_failures_for_fixer(report: dict, repo_path: str) -> str:
+    """
+    Format a test report for the Fixer: only failing tests, each with its
+    error message, trimmed traceback and the workspace source around the
+    traceback's locations. Falls back to the tail of the raw output when
+    no structured results are available (e.g. the run crashed or timed out).
+    """
+    output = "# TEST FAILURES\n\n"
+    summary = report.get("summary") or {}
+    if summary:
+        output += "**Summary**: " + ", ".join(f"{n} {k}" for k, n in sorted(summary.items())) + "\n"
+    if report.get("timed_out") or any(s["timed_out"] for s in report.get("shards", [])):
+        output += f"**Note**: the test run was killed after {settings.TEST_TIMEOUT}s; look for hangs or infinite loops.\n"
+    limit = (report.get("usage") or {}).get("limit_hit")
+    if limit == "cpu":
+        output += f"**Note**: a test exceeded the {settings.TEST_CPU_SECONDS}s CPU limit; look for busy loops or runaway computation.\n"
+    elif limit == "memory":
+        output += f"**Note**: tests hit the {settings.TEST_MEMORY_MB} MB memory limit; avoid huge allocations.\n"
+    elif limit == "processes":
+        output += "**Note**: tests hit the process limit; avoid spawning unbounded processes or threads.\n"
+    output += "\n"
+
+    if report.get("install_error"):
+        output += "## Dependency install failed\n\n"
+        output += "Fix requirements.txt / pyproject.toml (package names, versions).\n\n"
+        output += f"```\n{_tail(report['install_error'], FALLBACK_OUTPUT_CHARS)}\n```\n\n"
+
+    failures = report.get("tests")
+    if not isinstance(failures, list):
+        failures = []
+    if not failures:
+        output += "## Raw test output (tail)\n\n"
+        output += f"```\n{_tail(report.get('stdout', ''), FALLBACK_OUTPUT_CHARS)}\n```\n"
+        if report.get("stderr", "").strip():
+            output += f"\n```\n{_tail(report['stderr'], FALLBACK_OUTPUT_CHARS)}\n```\n"
+        return output
+
+    shown = set()
+    for t in failures[:MAX_FAILURES_SHOWN]:
+        output += f"## {t['nodeid']} ({t['outcome']})\n\n"
+        output += f"**Error**: {t.get('message', 'unknown failure')}\n\n"
+        if t.get("traceback"):
+            output += f"```\n{t['traceback']}\n```\n\n"
+        excerpts = 0
+        # Innermost frames first: that is usually where the bug is
+        for frame in reversed(t.get("frames", [])):
+            key = (frame["path"], frame["line"])
+            if key in shown or excerpts >= MAX_EXCERPTS_PER_FAILURE:
+                continue
+            source = _excerpt(repo_path, frame["path"], frame["line"])
+            if source:
+                shown.add(key)
+                excerpts += 1
+                output += f"**Source** `{os.path.relpath(os.path.join(repo_path, frame['path']), repo_path)}`:\n```\n{source}\n```\n\n"
+    if len(failures) > MAX_FAILURES_SHOWN:
+        output += f"... and {len(failures) - MAX_FAILURES_SHOWN} more failing tests\n"
+    return output
@@ -0,0 +1,144 @@
+import re
+from backend.services import patcher, workspace_index, workspace_manifest
+
+# Fence languages that mark a unified diff instead of a whole file
+DIFF_FENCES = {"diff", "patch", "udiff"}
+
+EDIT_FORMAT = """To CHANGE an existing file, reply with a unified diff in a diff block:
+```diff
+--- a/path/to/file.py
++++ b/path/to/file.py
+@@ -12,7 +12,7 @@
+ three unchanged lines before
+-old line
++new line
+ three unchanged lines after
+```
+Copy context and removed lines exactly from the current file. One diff block may cover several files and hunks.
+
+To CREATE a file (or rewrite most of one), reply with the whole file:
+```path/to/file.py
+<complete file content>
+```"""
+
+
+class FencedStreamParser:
+    """
+    Incremental splitter for fenced blocks: feed it text fragments in
+    arrival order and it returns each (header, body) block as soon as its
+    closing fence arrives. Matches what a regex over the whole reply would.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._header: str | None = None   # set while inside a block
+        self._scan = 0                    # body offset already searched for a closing fence
+
+    def feed(self, fragment: str) -> list[tuple[str, str]]:
+        self._buf += fragment
+        blocks = []
+        while True:
+            if self._header is None:
+                start = self._buf.find("```")
+                if start < 0:
+                    # Keep a possible partial fence
+                    self._buf = self._buf[-2:]
+                    return blocks
+                newline = self._buf.find("\n", start + 3)
+                if newline < 0:
+                    self._buf = self._buf[start:]
+                    return blocks
+                self._header = self._buf[start + 3:newline]
+                self._buf = self._buf[newline + 1:]
+                self._scan = 0
+            else:
+                end = self._buf.find("```", self._scan)
+                if end < 0:
+                    self._scan = max(len(self._buf) - 2, 0)
+                    return blocks
+                blocks.append((self._header, self._buf[:end]))
+                self._buf = self._buf[end + 3:]
+                self._header = None
+
+    def close(self) -> tuple[str, str] | None:
+        """The unterminated block left at end of stream, if any"""
+        if self._header is None:
+            return None
+        block = (self._header, self._buf)
+        self._header, self._buf = None, ""
+        return block
+
+
+def _block_edits(repo: str, header: str, body: str, conflicts: list | None,
+                 pending: dict[str, str | None]) -> dict[str, str | None]:
+    header_parts = header.strip().split()
+    if (header_parts and header_parts[0].lower() in DIFF_FENCES) or (not header_parts and patcher.looks_like_diff(body)):
+        return patcher.apply_patch(repo, body, conflicts, pending=pending)
+    if not header_parts:
+        # Skip code blocks without a filename
+        return {}
+    path = workspace_manifest.safe_path(header_parts[0])
+    if path is None:
+        if conflicts is not None:
+            conflicts.append(workspace_manifest.rejected_path(header_parts[0]))
+        return {}
+    return {path: body}
+
+
+def _unterminated(header: str, conflicts: list | None):
+    # Most likely the reply hit its token limit: a partial file would do harm
+    if conflicts is not None:
+        conflicts.append({
+            "path": header.strip() or "(unnamed block)",
+            "hunk": "",
+            "reason": "block not closed (reply cut off?); it was not applied",
+            "expected": "",
+        })
+
+
+def apply_fenced(repo: str, text: str, conflicts: list | None = None, label: str = ""):
+    """
+    Apply fenced code blocks to files and return list of created/modified files.
+    A block is either a whole file (```path) or a unified diff (```diff);
+    diff hunks that cannot be applied are appended to `conflicts`.
+    Files whose content does not change are not rewritten or returned;
+    changes are recorded in the workspace manifest under `label`.
+    """
+    parser = FencedStreamParser()
+    edits: dict[str, str | None] = {}
+    for header, body in parser.feed(text):
+        edits.update(_block_edits(repo, header, body, conflicts, edits))
+    leftover = parser.close()
+    if leftover:
+        _unterminated(leftover[0], conflicts)
+    files_changed = workspace_manifest.apply(repo, edits, label, conflicts)
+    workspace_index.update_files(repo, files_changed)
+    return files_changed
+
+
+def apply_stream(repo: str, fragments, conflicts: list | None = None, label: str = "", on_files=None):
+    """
+    Streaming apply_fenced: consume an iterator of reply fragments and write
+    each block's files (atomically) as soon as its closing fence arrives, so
+    earlier files can be used while later ones are still being generated.
+    `on_files` is called with the paths changed by each block. An
+    unterminated final block is not applied and is reported in `conflicts`.
+    """
+    parser = FencedStreamParser()
+    files_changed = []
+
+    def apply(blocks):
+        for header, body in blocks:
+            changed = workspace_manifest.apply(repo, _block_edits(repo, header, body, conflicts, {}), label, conflicts)
+            if changed:
+                workspace_index.update_files(repo, changed)
+                files_changed.extend(p for p in changed if p not in files_changed)
+                if on_files:
+                    on_files(changed)
+
+    for fragment in fragments:
+        apply(parser.feed(fragment))
+    leftover = parser.close()
+    if leftover:
+        _unterminated(leftover[0], conflicts)
+    return files_changed
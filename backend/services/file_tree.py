@@ -0,0 +1,157 @@
+"""
+File Tree Service - Cached workspace file listings with an ETag,
+invalidated by the write path and by a filesystem watcher (watchfiles,
+when installed) or, without one, after a short TTL
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from backend.config import settings
+
+try:
+    import watchfiles
+except ImportError:  # optional: comes with uvicorn[standard]
+    watchfiles = None
+
+# Workspaces whose listing (and watcher) is kept
+MAX_CACHED = 32
+# Listings are re-walked this often even while watched, in case a change
+# landed before the watcher was ready
+WATCHED_MAX_AGE = 30.0
+
+
+def _hidden(rel_parts: list[str]) -> bool:
+    return any(part.startswith('.') or part == '__pycache__' for part in rel_parts)
+
+
+def walk(root: str) -> list[dict]:
+    """Every visible file under `root` as {"path", "size", "type"}, sorted by path"""
+    files = []
+    # Like os.walk (symlinked dirs are not entered), with paths built as we go
+    stack = [("", root)]
+    while stack:
+        prefix, directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                # Skip hidden files and dirs, and cache
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir():
+                        if entry.name != '__pycache__' and not entry.is_symlink():
+                            stack.append((prefix + entry.name + os.sep, entry.path))
+                        continue
+                    size = entry.stat().st_size
+                except OSError:
+                    continue
+                files.append({"path": prefix + entry.name, "size": size, "type": "file"})
+    return sorted(files, key=lambda x: x["path"])
+
+
+def etag_for(files: list[dict]) -> str:
+    """Strong ETag of a listing: changes whenever a path or size does"""
+    digest = hashlib.sha256(json.dumps(files, separators=(",", ":")).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+class _Tree:
+    def __init__(self, root: str):
+        self.root = root
+        self.lock = threading.Lock()
+        self.files: list[dict] | None = None
+        self.etag: str | None = None
+        self.built = 0.0
+        self.generation = 0      # bumped by every invalidation
+        self.stop: threading.Event | None = None   # set while a watcher runs
+
+    def invalidate(self):
+        self.generation += 1
+        self.files = None
+
+    def fresh(self) -> bool:
+        if self.files is None:
+            return False
+        # A running watcher reports every change; otherwise trust the listing briefly
+        max_age = WATCHED_MAX_AGE if self.stop is not None else settings.FILE_TREE_TTL
+        return time.monotonic() - self.built < max_age
+
+    def watch(self):
+        if watchfiles is None:
+            return
+        self.stop = threading.Event()
+        threading.Thread(target=self._watch, args=(self.stop,), daemon=True).start()
+
+    def _watch(self, stop: threading.Event):
+        root = self.root
+
+        def visible(change, path):
+            return not _hidden(os.path.relpath(path, root).split(os.sep))
+
+        try:
+            for _ in watchfiles.watch(root, watch_filter=visible, stop_event=stop, rust_timeout=1000, yield_on_timeout=False):
+                self.invalidate()
+        except Exception:
+            pass  # e.g. the workspace was deleted
+        if self.stop is stop:
+            # Fall back to the TTL
+            self.stop = None
+            self.invalidate()
+
+
+_trees: OrderedDict[str, _Tree] = OrderedDict()
+_trees_lock = threading.Lock()
+
+
+def _tree(repo: str) -> _Tree:
+    key = os.path.abspath(repo)
+    with _trees_lock:
+        tree = _trees.get(key)
+        if tree is None:
+            tree = _trees[key] = _Tree(key)
+            tree.watch()
+        _trees.move_to_end(key)
+        while len(_trees) > MAX_CACHED:
+            _, evicted = _trees.popitem(last=False)
+            if evicted.stop is not None:
+                evicted.stop.set()
+        return tree
+
+
+def invalidate(repo: str):
+    """Drop a workspace's cached listing (call after writing to it)"""
+    with _trees_lock:
+        tree = _trees.get(os.path.abspath(repo))
+    if tree is not None:
+        tree.invalidate()
+
+
+def listing(repo: str) -> tuple[list[dict], str]:
+    """A workspace's files and their ETag, walking the tree only when it changed"""
+    tree = _tree(repo)
+    with tree.lock:
+        if tree.fresh():
+            return tree.files, tree.etag
+        generation = tree.generation
+        files = walk(tree.root)
+        etag = etag_for(files)
+        # A change during the walk leaves the listing uncached
+        if tree.generation == generation:
+            tree.files, tree.etag, tree.built = files, etag, time.monotonic()
+        return files, etag
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag` (weak comparison, per RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag in tags
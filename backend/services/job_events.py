@@ -0,0 +1,90 @@
+"""
+Job Events Service - Server-sent event streams of a job's log entries and
+state. Writers (worker threads) wake the streams through the db's
+job_observers hook; each log entry's event id is its per-job sequence
+number, so a reconnecting client resumes from Last-Event-ID
+"""
+import asyncio
+import json
+import threading
+from starlette.concurrency import run_in_threadpool
+from backend.storage import db
+
+# Changes made by another process (e.g. a standalone worker) are noticed this often
+RECHECK_SECONDS = 2.0
+# Idle streams get a comment this often, so proxies keep them open
+KEEPALIVE_SECONDS = 15.0
+FINAL_STATUSES = ("succeeded", "failed")
+
+_waiters: dict[str, set] = {}   # job id -> {(event loop, asyncio.Event)}
+_waiters_lock = threading.Lock()
+
+
+def _notify(job_id: str):
+    with _waiters_lock:
+        waiters = list(_waiters.get(job_id, ()))
+    for loop, event in waiters:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass  # loop already closed
+
+
+db.job_observers.append(_notify)
+
+
+def format_event(event: str, data, event_id: int | None = None) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream(job_id: str, last_seq: int = 0):
+    """
+    SSE messages for a job: "job" (its fields without logs) now and after
+    every change to them, one "log" per entry after `last_seq`, and "end"
+    once the job has finished and everything was sent.
+    """
+    event = asyncio.Event()
+    waiter = (asyncio.get_running_loop(), event)
+    with _waiters_lock:
+        _waiters.setdefault(job_id, set()).add(waiter)
+    try:
+        sent, fields, idle = last_seq, None, 0.0
+        yield "retry: 1000\n\n"
+        while True:
+            event.clear()   # before reading, so no change is missed
+            job = await run_in_threadpool(db.get_job, job_id, sent)
+            if job is None:
+                yield format_event("error", {"detail": "Job not found"})
+                return
+            logs = job.pop("logs")
+            job.pop("version")   # bumped by every log entry too
+            if fields is None:
+                fields = job
+                yield format_event("job", job, sent)
+            for entry in logs:
+                sent = entry["seq"]
+                yield format_event("log", entry, sent)
+            # After the entries, as a status change follows what it logged
+            if job != fields:
+                fields = job
+                yield format_event("job", job, sent)
+            if job["status"] in FINAL_STATUSES:
+                yield format_event("end", {"status": job["status"]}, sent)
+                return
+            try:
+                await asyncio.wait_for(event.wait(), RECHECK_SECONDS)
+                idle = 0.0
+            except asyncio.TimeoutError:
+                idle += RECHECK_SECONDS
+                if idle >= KEEPALIVE_SECONDS:
+                    yield ": keepalive\n\n"
+                    idle = 0.0
+    finally:
+        with _waiters_lock:
+            waiters = _waiters.get(job_id)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del _waiters[job_id]
@@ -1,14 +1,42 @@
 from backend.config import settings
 from backend.providers.lmstudio import LMStudioProvider
 from backend.providers.openai_cloud import OpenAIProvider
+from backend.providers.replay import ReplayProvider
 from backend.storage.db import get_runtime_provider
 
-def get_llm():
-    selected = (get_runtime_provider() or settings.LLM_PROVIDER or "AUTO").upper()
+# Pipeline stages that can be routed independently via settings.LLM_ROUTES
+STAGES = ("planner", "coder", "architect", "fixer", "modifier", "summarizer", "help")
+
+
+def get_route(stage: str | None, attempt: int = 0) -> dict:
+    """
+    Resolve the routing rule for a stage.
+
+    A rule may set provider, model, max_tokens and temperature, plus an
+    "escalate" rule that is layered on top once `attempt` (the number of
+    earlier failed attempts at this stage) reaches "escalate_after".
+    """
+    route = dict(settings.LLM_ROUTES.get(stage or "", None) or {})
+    escalate = route.pop("escalate", None)
+    escalate_after = route.pop("escalate_after", 2)
+    if escalate and attempt >= escalate_after:
+        route.update(escalate)
+    return route
+
+
+def get_llm(stage: str | None = None, attempt: int = 0):
+    route = get_route(stage, attempt)
+    opts = {k: route.get(k) for k in ("model", "temperature", "max_tokens")}
+    selected = (route.get("provider") or get_runtime_provider() or settings.LLM_PROVIDER or "AUTO").upper()
     if selected == "LMSTUDIO":
-        return LMStudioProvider()
-    if selected == "OPENAI":
-        return OpenAIProvider()
-    if settings.MODE.upper() == "LOCAL":
-        return LMStudioProvider()
-    return OpenAIProvider()
+        llm = LMStudioProvider(**opts)
+    elif selected == "OPENAI":
+        llm = OpenAIProvider(**opts)
+    elif selected == "REPLAY":
+        llm = ReplayProvider(**opts)
+    elif settings.MODE.upper() == "LOCAL":
+        llm = LMStudioProvider(**opts)
+    else:
+        llm = OpenAIProvider(**opts)
+    llm.stage = stage
+    return llm
@@ -0,0 +1,232 @@
+"""
+Patcher Service - Applies unified diffs from LLM replies, tolerating the
+usual mistakes (wrong line numbers, missing @@ ranges, trimmed whitespace,
+drifted context) and reporting hunks that cannot be placed
+"""
+import os
+import re
+from backend.services import workspace_manifest
+
+# Context lines that may be dropped from each end of a hunk to find a match
+MAX_FUZZ = 2
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+def looks_like_diff(text: str) -> bool:
+    return bool(re.search(r"^(--- .*\n\+\+\+ |diff --git )", text, re.M))
+
+
+def _path(header: str) -> tuple[str | None, str | None]:
+    """(workspace-relative path, or None for /dev/null; the raw path if it is unsafe)"""
+    path = header.split("\t")[0].strip()
+    if path == "/dev/null":
+        return None, None
+    if path[:2] in ("a/", "b/"):
+        path = path[2:]
+    safe = workspace_manifest.safe_path(path)
+    return safe, (path if safe is None else None)
+
+
+def parse(text: str) -> list[dict]:
+    """
+    Split a unified diff into per-file patches:
+    {"old_path", "new_path", "hunks": [{"header", "old_start", "lines": [(op, text)]}]}
+    where op is " ", "-" or "+" and paths are None for /dev/null. A patch
+    naming a path outside the workspace (absolute, "..", or .forge) gets
+    both paths None and that path in "rejected".
+    """
+    patches = []
+    current = hunk = None
+    # Only newlines end lines: splitlines() would also split at \f, \v, \x1c...
+    lines = re.split(r"\r?\n", text)
+    if lines[-1] == "":
+        lines.pop()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            (old_path, old_bad), (new_path, new_bad) = _path(line[4:]), _path(lines[i + 1][4:])
+            rejected = old_bad or new_bad
+            if rejected:
+                old_path = new_path = None
+            current = {"old_path": old_path, "new_path": new_path, "rejected": rejected, "hunks": []}
+            patches.append(current)
+            hunk = None
+            i += 2
+            continue
+        i += 1
+        if current is None or line.startswith(("diff --git ", "index ", "\\ ")):
+            continue
+        if line.startswith("@@"):
+            m = _HUNK_RE.match(line)
+            hunk = {"header": line, "old_start": int(m.group(1)) if m else None, "lines": []}
+            current["hunks"].append(hunk)
+            continue
+        if hunk is None:
+            # Hunk body without an @@ line: locate it by content alone
+            hunk = {"header": "@@", "old_start": None, "lines": []}
+            current["hunks"].append(hunk)
+        if line[:1] in ("-", "+", " "):
+            hunk["lines"].append((line[0], line[1:]))
+        else:
+            # Blank (or unindented) context line whose leading space was lost
+            hunk["lines"].append((" ", line))
+    return patches
+
+
+def _trim(hunk_lines: list, lead: int, trail: int) -> list:
+    return hunk_lines[lead:len(hunk_lines) - trail]
+
+
+def _context_ends(hunk_lines: list) -> tuple[int, int]:
+    lead = next((i for i, (op, _) in enumerate(hunk_lines) if op != " "), len(hunk_lines))
+    trail = next((i for i, (op, _) in enumerate(reversed(hunk_lines)) if op != " "), len(hunk_lines))
+    return lead, trail
+
+
+_NORMALIZERS = (
+    lambda s: s,
+    lambda s: s.rstrip(),
+    lambda s: " ".join(s.split()),
+)
+
+
+def _find(lines: list[str], old: list[str], hint: int) -> int | None:
+    """Position of `old` in `lines` closest to `hint`, trying stricter matches first"""
+    if not old:
+        return min(max(hint, 0), len(lines))
+    last = len(lines) - len(old)
+    if last < 0:
+        return None
+    hint = min(max(hint, 0), last)
+    order = sorted(range(last + 1), key=lambda p: abs(p - hint))
+    for norm in _NORMALIZERS:
+        target = [norm(s) for s in old]
+        normalized = [norm(s) for s in lines]
+        for pos in order:
+            if normalized[pos:pos + len(old)] == target:
+                return pos
+    return None
+
+
+def apply_hunks(lines: list[str], hunks: list[dict], path: str = "") -> tuple[list[str], list[dict]]:
+    """Apply hunks to a file's lines; returns (new lines, conflicts for hunks that could not be placed)"""
+    result = list(lines)
+    offset = 0
+    conflicts = []
+    for hunk in hunks:
+        hint = hunk["old_start"] - 1 + offset if hunk["old_start"] else 0
+        lead, trail = _context_ends(hunk["lines"])
+        placed = None
+        for fuzz in range(MAX_FUZZ + 1):
+            body = _trim(hunk["lines"], min(fuzz, lead), min(fuzz, trail))
+            old = [t for op, t in body if op != "+"]
+            if not old and fuzz:
+                break  # never place a hunk with no anchoring lines left
+            pos = _find(result, old, hint)
+            if pos is not None:
+                placed = pos, body, len(old)
+                break
+            if fuzz >= max(lead, trail):
+                break
+        if placed is None:
+            old = [t for op, t in hunk["lines"] if op != "+"]
+            conflicts.append({
+                "path": path,
+                "hunk": hunk["header"],
+                "reason": "context not found",
+                "expected": "\n".join(old[:10]),
+            })
+            continue
+
+        pos, body, old_len = placed
+        # Keep the file's own text for context lines (it may differ in whitespace)
+        new, cursor = [], pos
+        for op, text in body:
+            if op == " ":
+                new.append(result[cursor])
+                cursor += 1
+            elif op == "-":
+                cursor += 1
+            else:
+                new.append(text)
+        result[pos:pos + old_len] = new
+        offset += len(new) - old_len
+    return result, conflicts
+
+
+def _split(text: str) -> tuple[list[str], str, bool]:
+    """A file's lines, its line ending ("\r\n" or "\n") and whether it ends with one"""
+    if not text:
+        return [], "\n", True
+    first = text.find("\n")
+    newline = "\r\n" if first > 0 and text[first - 1] == "\r" else "\n"
+    trailing = text.endswith("\n")
+    lines = re.split(r"\r?\n", text[:-len(newline)] if text.endswith(newline) else text)
+    return lines, newline, trailing
+
+
+def apply_patch(repo: str, text: str, conflicts: list | None = None,
+                pending: dict[str, str | None] | None = None) -> dict[str, str | None]:
+    """
+    Apply a unified diff to the workspace's files. Returns the resulting
+    edits (path -> new content, or None to delete) without writing them;
+    `pending` holds edits from earlier in the same reply, which are patched
+    instead of the files on disk. Hunks that cannot be placed are appended
+    to `conflicts` (the rest of the file's hunks still apply).
+    """
+    pending = pending or {}
+
+    def read(path):
+        if path in pending:
+            return pending[path]
+        full = os.path.join(repo, path)
+        if not os.path.exists(full):
+            return None
+        # newline="": keep the file's own line endings
+        with open(full, "r", encoding="utf-8", newline="") as f:
+            return f.read()
+
+    edits = {}
+    for patch in parse(text):
+        if patch["rejected"]:
+            if conflicts is not None:
+                conflicts.append(workspace_manifest.rejected_path(patch["rejected"]))
+            continue
+        path = patch["new_path"] or patch["old_path"]
+        if path is None:
+            continue
+        if patch["new_path"] is None:
+            edits[path] = None
+            continue
+
+        original = ""
+        if patch["old_path"] is not None:
+            original = edits[patch["old_path"]] if patch["old_path"] in edits else read(patch["old_path"])
+            if original is None:
+                if conflicts is not None:
+                    conflicts.append({"path": path, "hunk": "", "reason": "file does not exist", "expected": ""})
+                continue
+
+        original_lines, newline, trailing = _split(original)
+        lines, file_conflicts = apply_hunks(original_lines, patch["hunks"], path)
+        if conflicts is not None:
+            conflicts.extend(file_conflicts)
+        if len(file_conflicts) == len(patch["hunks"]) and patch["hunks"]:
+            continue
+        # Written back with the file's line endings and final newline (or lack of one)
+        edits[path] = newline.join(lines) + (newline if lines and trailing else "")
+        if patch["old_path"] and patch["old_path"] != path:
+            edits[patch["old_path"]] = None
+    return edits
+
+
+def format_conflicts(conflicts: list[dict]) -> str:
+    """Tell the model which of its hunks did not apply"""
+    output = "# PATCH CONFLICTS\n\nThese diff hunks from your previous reply could NOT be applied (their context lines do not match the file). Resend them against the current file, or send the whole file.\n\n"
+    for c in conflicts:
+        output += f"- `{c['path']}` {c['hunk']}: {c['reason']}\n"
+        if c["expected"]:
+            output += f"```\n{c['expected']}\n```\n"
+    return output
@@ -0,0 +1,135 @@
+"""
+Pipeline Service - A small stage-graph executor: stages declare the state
+keys they read and write, independent stages run concurrently, and every
+run records the same per-stage timing, retries and cancellation
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Called with each stage record as it finishes (e.g. the benchmark recorder)
+observers: list = []
+
+
+class Cancelled(Exception):
+    """The pipeline was cancelled (or a stage failed) before all stages ran"""
+
+
+class Stage:
+    """
+    A unit of pipeline work. `fn` is called with its `inputs` as keyword
+    arguments once they are all in the state, and returns a dict holding
+    its `outputs`. If `when` (called with the same arguments) returns
+    false the stage is skipped and its outputs are set to None. Exceptions are retried up to `retries` times,
+    unless `retry_if` (called with the exception) returns false.
+    """
+
+    def __init__(self, name: str, fn, inputs=(), outputs=(), retries: int = 0, when=None, retry_if=None):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.retries = retries
+        self.when = when
+        self.retry_if = retry_if
+
+
+class Pipeline:
+    def __init__(self, stages: list[Stage], max_workers: int = 4):
+        self.stages = stages
+        self.max_workers = max_workers
+        self.records: list[dict] = []   # {"stage", "status", "attempts", "ms"} in finish order
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Start no further stages; running ones finish and run() raises Cancelled"""
+        self._cancel.set()
+
+    def _check(self, state: dict):
+        names, produced = set(), set(state)
+        for stage in self.stages:
+            if stage.name in names:
+                raise ValueError(f"Duplicate stage {stage.name!r}")
+            names.add(stage.name)
+            for key in stage.outputs:
+                if key in produced:
+                    raise ValueError(f"{key!r} is produced twice (stage {stage.name!r})")
+                produced.add(key)
+        for stage in self.stages:
+            missing = [key for key in stage.inputs if key not in produced]
+            if missing:
+                raise ValueError(f"Stage {stage.name!r} needs {missing}, which nothing produces")
+
+    def _record(self, stage: Stage, status: str, attempts: int, elapsed: float):
+        record = {"stage": stage.name, "status": status, "attempts": attempts, "ms": round(elapsed * 1000, 1)}
+        with self._lock:
+            self.records.append(record)
+        for observer in observers:
+            observer(record)
+
+    def _call(self, stage: Stage, args: dict) -> dict:
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = stage.fn(**args) or {}
+            except Exception as e:
+                retry = attempt <= stage.retries and (stage.retry_if is None or stage.retry_if(e))
+                if not retry or self._cancel.is_set():
+                    self._record(stage, "failed", attempt, time.perf_counter() - start)
+                    raise
+                continue
+            missing = [key for key in stage.outputs if key not in result]
+            if missing:
+                self._record(stage, "failed", attempt, time.perf_counter() - start)
+                raise ValueError(f"Stage {stage.name!r} did not return {missing}")
+            self._record(stage, "ok", attempt, time.perf_counter() - start)
+            return {key: result[key] for key in stage.outputs}
+
+    def run(self, state: dict | None = None) -> dict:
+        """
+        Run every stage once, as soon as its inputs are available, and
+        return the final state. The first stage failure cancels the stages
+        not yet started and is re-raised once the running ones finish.
+        """
+        state = dict(state or {})
+        self._check(state)
+        pending = list(self.stages)
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                ready = [s for s in pending if all(key in state for key in s.inputs)]
+                while ready and not self._cancel.is_set():
+                    for stage in ready:
+                        pending.remove(stage)
+                        args = {key: state[key] for key in stage.inputs}
+                        if stage.when is not None and not stage.when(**args):
+                            self._record(stage, "skipped", 0, 0.0)
+                            state.update(dict.fromkeys(stage.outputs))
+                            continue
+                        running[pool.submit(self._call, stage, args)] = stage
+                    # Skipped stages may have unblocked others
+                    ready = [s for s in pending if all(key in state for key in s.inputs)]
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+                    try:
+                        state.update(future.result())
+                    except Exception as e:
+                        if error is None:
+                            error = e
+                        self._cancel.set()
+        if error is not None:
+            raise error
+        if pending and not self._cancel.is_set():
+            raise ValueError(f"Stages {[s.name for s in pending]} wait on each other")
+        if pending:
+            for stage in pending:
+                self._record(stage, "cancelled", 0, 0.0)
+            raise Cancelled(f"Cancelled before {', '.join(s.name for s in pending)}")
+        return state
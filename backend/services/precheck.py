@@ -0,0 +1,233 @@
+"""
+Pre-check Service - Local static checks (syntax, compile, workspace imports,
+undefined names) run before the Architect review and pytest
+"""
+import ast
+import builtins
+import os
+import sys
+from backend.services.test_selector import module_names, python_files
+
+MAX_ISSUES = 50
+
+# Names every module has without binding them
+MODULE_NAMES = {
+    '__file__', '__name__', '__doc__', '__spec__', '__loader__', '__package__',
+    '__builtins__', '__path__', '__annotations__', '__cached__', '__class__',
+}
+# Builtins that only exist on some platforms
+PLATFORM_NAMES = {'WindowsError'}
+KNOWN_NAMES = set(dir(builtins)) | MODULE_NAMES | PLATFORM_NAMES
+
+# Calls that can bind names dynamically; files using them skip the undefined-name check
+DYNAMIC_SCOPE = {'globals', 'locals', 'vars', 'exec', 'eval'}
+
+
+def _issue(path: str, line: int, kind: str, message: str) -> dict:
+    return {'path': path, 'line': line or 1, 'kind': kind, 'message': message}
+
+
+def _bound_names(tree: ast.AST) -> set[str]:
+    """Every name bound anywhere in a module (any scope)"""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.Import):
+            names.update(a.asname or a.name.split('.')[0] for a in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            names.update(a.asname or a.name for a in node.names)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+            names.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            names.add(node.rest)
+        elif type(node).__name__ in ('TypeVar', 'ParamSpec', 'TypeVarTuple'):
+            names.add(node.name)  # PEP 695 type parameters
+    return names
+
+
+def _module_level_names(tree: ast.Module) -> set[str] | None:
+    """
+    Names a module defines at top level (including inside if/try blocks),
+    or None if it can export anything (star import, module __getattr__)
+    """
+    names = set()
+    pending = list(tree.body)
+    while pending:
+        node = pending.pop()
+        if isinstance(node, ast.ImportFrom) and any(a.name == '*' for a in node.names):
+            return None
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == '__getattr__':
+            return None
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+            continue
+        if isinstance(node, ast.Import):
+            names.update(a.asname or a.name.split('.')[0] for a in node.names)
+            continue
+        if isinstance(node, ast.ImportFrom):
+            names.update(a.asname or a.name for a in node.names)
+            continue
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+                names.add(child.id)
+        for field in ('body', 'orelse', 'finalbody', 'handlers'):
+            pending.extend(getattr(node, field, []))
+    return names
+
+
+def _undefined_names(rel: str, tree: ast.Module) -> list[dict]:
+    if any(isinstance(n, ast.ImportFrom) and any(a.name == '*' for a in n.names) for n in ast.walk(tree)):
+        return []
+    bound = _bound_names(tree) | KNOWN_NAMES
+    loaded = [n for n in ast.walk(tree) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)]
+    if any(n.id in DYNAMIC_SCOPE for n in loaded):
+        return []
+    issues, seen = [], set()
+    for node in sorted(loaded, key=lambda n: (n.lineno, n.col_offset)):
+        if node.id not in bound and node.id not in seen:
+            seen.add(node.id)
+            issues.append(_issue(rel, node.lineno, 'undefined-name', f"name '{node.id}' is not defined"))
+    return issues
+
+
+def _guarded_imports(tree: ast.Module) -> set[int]:
+    """ids of import nodes inside `try` blocks (optional imports)"""
+    guarded = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Try):
+            for stmt in node.body:
+                guarded.update(id(n) for n in ast.walk(stmt) if isinstance(n, (ast.Import, ast.ImportFrom)))
+    return guarded
+
+
+class _Workspace:
+    """Importable modules of a workspace and their parsed sources"""
+
+    def __init__(self, files: list[str], trees: dict[str, ast.Module]):
+        self.trees = trees
+        self.modules: dict[str, str] = {}
+        for rel in files:
+            for name in module_names(rel):
+                self.modules[name] = rel
+        # Directories without __init__.py are still importable (namespace packages)
+        self.packages = {
+            '.'.join(parts[:i]) for name in self.modules
+            for parts in [name.split('.')] for i in range(1, len(parts))
+        }
+        # Workspace files named like stdlib modules may not shadow them (many
+        # are imported at interpreter startup), so those imports are not checked
+        self.top_level = {name.split('.')[0] for name in self.modules} - set(sys.stdlib_module_names)
+        self._exports: dict[str, set[str] | None] = {}
+
+    def exists(self, module: str) -> bool:
+        return module in self.modules or module in self.packages
+
+    def exports(self, module: str) -> set[str] | None:
+        rel = self.modules.get(module)
+        if rel is None:
+            return set()
+        if rel not in self.trees:
+            return None  # unparsable: reported on its own
+        if rel not in self._exports:
+            self._exports[rel] = _module_level_names(self.trees[rel])
+        return self._exports[rel]
+
+
+def _import_issues(rel: str, tree: ast.Module, ws: _Workspace) -> list[dict]:
+    """Imports of workspace modules that do not resolve; third-party imports are not checked"""
+    package = rel[:-3].replace(os.sep, '/').split('/')[:-1]
+    guarded = _guarded_imports(tree)
+    issues = []
+    for node in ast.walk(tree):
+        if id(node) in guarded:
+            continue
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name.split('.')[0] in ws.top_level and not ws.exists(alias.name):
+                    issues.append(_issue(rel, node.lineno, 'import', f"No module named '{alias.name}' in the workspace"))
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                if node.level > len(package) + 1:
+                    continue
+                base = package[:len(package) - node.level + 1]
+                module = '.'.join(base + ([node.module] if node.module else []))
+            else:
+                module = node.module or ''
+            if not module or module.split('.')[0] not in ws.top_level:
+                continue
+            if not ws.exists(module):
+                issues.append(_issue(rel, node.lineno, 'import', f"No module named '{module}' in the workspace"))
+                continue
+            exported = ws.exports(module)
+            if exported is None:
+                continue
+            for alias in node.names:
+                if alias.name != '*' and alias.name not in exported and not ws.exists(f"{module}.{alias.name}"):
+                    issues.append(_issue(
+                        rel, node.lineno, 'import',
+                        f"cannot import name '{alias.name}' from '{module}' ({ws.modules.get(module, module)})"
+                    ))
+    return issues
+
+
+def check(repo: str) -> list[dict]:
+    """
+    Static problems in the workspace's Python files, each
+    {"path", "line", "kind", "message"}; kind is "syntax", "import" or
+    "undefined-name". Files that fail to parse are only reported for that.
+    """
+    issues = []
+    trees = {}
+    files = sorted(python_files(repo))
+    for rel in files:
+        try:
+            with open(os.path.join(repo, rel), 'r', encoding='utf-8') as f:
+                source = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            issues.append(_issue(rel, 1, 'syntax', f"cannot read file: {e}"))
+            continue
+        try:
+            tree = ast.parse(source, rel)
+            # Compiling catches what parsing alone accepts ('return' outside function, ...)
+            compile(tree, rel, 'exec')
+        except SyntaxError as e:
+            issues.append(_issue(rel, e.lineno, 'syntax', f"{e.msg} (column {e.offset})" if e.offset else e.msg))
+            continue
+        except ValueError as e:
+            issues.append(_issue(rel, 1, 'syntax', str(e)))
+            continue
+        trees[rel] = tree
+
+    ws = _Workspace(files, trees)
+    for rel, tree in trees.items():
+        issues.extend(_import_issues(rel, tree, ws))
+        issues.extend(_undefined_names(rel, tree))
+    return issues[:MAX_ISSUES]
+
+
+def format_for_fixer(issues: list[dict], repo: str) -> str:
+    """Format pre-check issues with the offending source line for the Fixer"""
+    output = f"# STATIC CHECK ERRORS\n\n{len(issues)} problem(s) found before running tests. Fix all of them.\n\n"
+    lines_cache: dict[str, list[str]] = {}
+    for issue in issues:
+        path = issue['path']
+        if path not in lines_cache:
+            try:
+                with open(os.path.join(repo, path), 'r', encoding='utf-8') as f:
+                    lines_cache[path] = f.read().splitlines()
+            except (OSError, UnicodeDecodeError):
+                lines_cache[path] = []
+        output += f"- **{path}:{issue['line']}** [{issue['kind']}] {issue['message']}\n"
+        lines = lines_cache[path]
+        if 0 < issue['line'] <= len(lines):
+            output += f"  ```\n  {issue['line']:>4}> {lines[issue['line'] - 1]}\n  ```\n"
+    return output
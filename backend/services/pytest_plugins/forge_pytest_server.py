@@ -0,0 +1,115 @@
+"""
+Warm pytest runner used by the evaluator's worker pool.
+
+Imports pytest and its plugins once, then serves requests: one JSON object
+per line on stdin, one JSON reply per line on stdout. Each request runs in a
+child forked from this pre-imported process, so interpreter startup and
+plugin loading are paid once while every run still imports the workspace
+fresh and cannot leak state into the next one. POSIX only (needs fork).
+Each child runs under the request's resource limits (see forge_sandbox).
+Standalone on purpose: it runs inside the generated project's interpreter.
+"""
+import importlib
+import json
+import os
+import sys
+import tempfile
+import traceback
+
+import pytest
+import _pytest.config
+
+import forge_sandbox
+
+
+def _preimport():
+    for name in _pytest.config.default_plugins:
+        try:
+            importlib.import_module(f"_pytest.{name}")
+        except Exception:
+            pass
+    try:
+        from importlib.metadata import entry_points
+        for ep in entry_points(group="pytest11"):
+            try:
+                ep.load()
+            except Exception:
+                pass
+    except Exception:
+        pass
+    try:
+        import forge_results  # noqa: F401
+    except ImportError:
+        pass
+
+
+def _child(request: dict, out_path: str, err_path: str):
+    code = 3
+    try:
+        os.setsid()
+        forge_sandbox.apply(request.get("limits", {}))
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.close(devnull)
+        for fd, path in ((1, out_path), (2, err_path)):
+            target = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            os.dup2(target, fd)
+            os.close(target)
+        sys.stdout = sys.__stdout__
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        sys.path[:0] = [p for p in request["env"].get("PYTHONPATH", "").split(os.pathsep) if p]
+        code = int(pytest.main(request["args"]))
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def _read(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def handle(request: dict) -> dict:
+    with tempfile.TemporaryDirectory(prefix="forge-pool-") as tmp:
+        out_path, err_path = os.path.join(tmp, "stdout"), os.path.join(tmp, "stderr")
+        pid = os.fork()
+        if pid == 0:
+            _child(request, out_path, err_path)
+
+        status, usage, timed_out = forge_sandbox.wait(pid, request["timeout"])
+        return {
+            "exit_code": -1 if timed_out else os.waitstatus_to_exitcode(status),
+            "stdout": _read(out_path) if os.path.exists(out_path) else "",
+            "stderr": _read(err_path) if os.path.exists(err_path) else "",
+            "timed_out": timed_out,
+            "usage": usage,
+        }
+
+
+def main():
+    _preimport()
+    protocol = sys.stdout
+    # Keep stray prints from corrupting the protocol stream
+    sys.stdout = sys.stderr
+    protocol.write(json.dumps({"ready": True}) + "\n")
+    protocol.flush()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            reply = handle(json.loads(line))
+        except Exception:
+            reply = {"exit_code": 3, "stdout": "", "stderr": traceback.format_exc(), "timed_out": False}
+        protocol.write(json.dumps(reply) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+pytest plugin loaded into workspace test runs (-p forge_results).
+Writes per-test outcomes and durations, plus the failure message, exception
+type (and errno), a trimmed traceback and the traceback's file locations for
+failing tests, as JSON to the --forge-results path.
+Standalone on purpose: it runs inside the generated project's interpreter.
+"""
+import json
+import os
+
+TRACEBACK_LINES = 40
+TRACEBACK_CHARS = 4000
+
+_results = {}
+
+
+def pytest_addoption(parser):
+    parser.addoption("--forge-results", default=None, help="write per-test results as JSON to this path")
+
+
+def _entry(nodeid):
+    return _results.setdefault(nodeid, {"nodeid": nodeid, "outcome": "passed", "duration": 0.0})
+
+
+def _record_failure(entry, report):
+    longrepr = report.longrepr
+    crash = getattr(longrepr, "reprcrash", None)
+    text = report.longreprtext or ""
+    if crash is not None:
+        entry["message"] = crash.message
+    else:
+        lines = [line for line in text.strip().splitlines() if line.strip()]
+        entry["message"] = lines[-1] if lines else "unknown failure"
+
+    frames = []
+    reprtraceback = getattr(longrepr, "reprtraceback", None)
+    for reprentry in getattr(reprtraceback, "reprentries", None) or []:
+        loc = getattr(reprentry, "reprfileloc", None)
+        if loc is not None:
+            frames.append({"path": str(loc.path), "line": loc.lineno})
+    if crash is not None and not frames:
+        frames.append({"path": str(crash.path), "line": crash.lineno})
+    entry["frames"] = frames
+
+    tail = "\n".join(text.splitlines()[-TRACEBACK_LINES:])
+    entry["traceback"] = tail[-TRACEBACK_CHARS:]
+
+
+def pytest_runtest_logreport(report):
+    entry = _entry(report.nodeid)
+    entry["duration"] += report.duration
+    if report.failed:
+        entry["outcome"] = "failed" if report.when == "call" else "error"
+        if "message" not in entry:
+            _record_failure(entry, report)
+    elif report.skipped and entry["outcome"] == "passed":
+        entry["outcome"] = "skipped"
+
+
+def pytest_exception_interact(node, call, report):
+    # The exception itself, not its text: lets the evaluator tell a refused
+    # allocation or fork (resource limits) from a test that merely prints one
+    entry = _entry(report.nodeid or "<collection>")
+    entry.setdefault("exception", call.excinfo.typename)
+    errno = getattr(call.excinfo.value, "errno", None)
+    if isinstance(errno, int):
+        entry.setdefault("errno", errno)
+
+
+def pytest_collectreport(report):
+    if report.failed:
+        entry = _entry(report.nodeid or "<collection>")
+        entry["outcome"] = "error"
+        _record_failure(entry, report)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    path = session.config.getoption("--forge-results")
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"exitstatus": int(exitstatus), "tests": list(_results.values())}, f)
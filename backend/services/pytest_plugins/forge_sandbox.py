@@ -0,0 +1,103 @@
+"""
+Resource limits for workspace test processes (POSIX only).
+
+Shared by the evaluator's fresh-process path and the warm pytest server, so
+it is standalone like the other modules here. `apply` runs in the child
+before pytest starts; `wait` reaps it, kills its process group on a
+wall-clock timeout and reports the child's resource usage.
+
+Run as a script (`python forge_sandbox.py '<limits json>' <pytest args>`)
+it applies the limits and then runs pytest in the same process.
+"""
+import json
+import os
+import signal
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Grace between the soft CPU limit (SIGXCPU) and the hard one (SIGKILL)
+CPU_GRACE_SECONDS = 2
+
+
+def supported() -> bool:
+    return resource is not None
+
+
+def apply(limits: dict):
+    """
+    Set rlimits in the current process: "cpu_seconds" (per process),
+    "memory_mb" (address space) and "max_processes" (per user, so only
+    meaningful for a dedicated user). Missing or 0 values are unlimited.
+    """
+    if resource is None:
+        return
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    cpu = limits.get("cpu_seconds")
+    if cpu:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + CPU_GRACE_SECONDS))
+    memory = limits.get("memory_mb")
+    if memory:
+        size = memory * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (size, size))
+    nproc = limits.get("max_processes")
+    if nproc and hasattr(resource, "RLIMIT_NPROC"):
+        resource.setrlimit(resource.RLIMIT_NPROC, (nproc, nproc))
+
+
+def kill_group(pid: int):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _max_rss_mb(ru) -> float:
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(ru.ru_maxrss / scale, 1)
+
+
+def wait(pid: int, timeout: float):
+    """
+    Reap `pid` (a process group leader), killing its group after `timeout`
+    seconds. Leftover processes in the group (e.g. daemons started by a
+    test) are killed once the leader exits.
+    Returns (wait status, usage dict, timed out).
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    timed_out = False
+    delay = 0.001
+    while True:
+        done, status, ru = os.wait4(pid, os.WNOHANG)
+        if done:
+            break
+        if time.monotonic() > deadline:
+            timed_out = True
+            kill_group(pid)
+            _, status, ru = os.wait4(pid, 0)
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+    kill_group(pid)
+
+    usage = {
+        "cpu_seconds": round(ru.ru_utime + ru.ru_stime, 3),
+        "max_rss_mb": _max_rss_mb(ru),
+        "wall_seconds": round(time.monotonic() - start, 3),
+    }
+    if os.WIFSIGNALED(status):
+        usage["signal"] = signal.Signals(os.WTERMSIG(status)).name
+    return status, usage, timed_out
+
+
+if __name__ == "__main__":
+    apply(json.loads(sys.argv[1]))
+    sys.argv = ["pytest", *sys.argv[2:]]
+    import pytest
+    sys.exit(pytest.console_main())
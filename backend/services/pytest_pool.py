@@ -0,0 +1,184 @@
+"""
+Pytest Pool Service - Keeps pre-started pytest runner processes warm so test
+runs skip interpreter startup and plugin loading (POSIX only)
+"""
+import json
+import os
+import select
+import subprocess
+import sys
+import threading
+from backend.config import settings
+
+PLUGIN_DIR = os.path.join(os.path.dirname(__file__), "pytest_plugins")
+SERVER_PATH = os.path.join(PLUGIN_DIR, "forge_pytest_server.py")
+STARTUP_TIMEOUT = 60
+
+# Extra time the server gets to report a killed run before it is presumed dead
+REPLY_GRACE = 30
+
+# Interpreters kept warm at once (jobs with dependencies each get their own)
+MAX_INTERPRETERS = 4
+
+
+class WorkerDied(RuntimeError):
+    pass
+
+
+def supported() -> bool:
+    # Frozen builds have no plain interpreter to host the server script
+    return settings.TEST_POOL_SIZE > 0 and hasattr(os, "fork") and not getattr(sys, "frozen", False)
+
+
+class WarmWorker:
+    """One forking pytest server process"""
+
+    def __init__(self, python: str):
+        env = os.environ.copy()
+        env["PYTHONPATH"] = PLUGIN_DIR
+        self.python = python
+        self.runs = 0
+        self.proc = subprocess.Popen(
+            [python, SERVER_PATH],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            env=env
+        )
+        self._reply(STARTUP_TIMEOUT)
+
+    def _reply(self, timeout: float) -> dict:
+        ready, _, _ = select.select([self.proc.stdout], [], [], timeout)
+        line = self.proc.stdout.readline() if ready else ""
+        if not line:
+            self.close()
+            raise WorkerDied("pytest server did not reply")
+        return json.loads(line)
+
+    def run(self, cwd: str, args: list[str], env: dict, timeout: float, limits: dict | None = None) -> dict:
+        request = {"cwd": cwd, "args": args, "env": env, "timeout": timeout, "limits": limits or {}}
+        try:
+            self.proc.stdin.write(json.dumps(request) + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self.close()
+            raise WorkerDied(str(e))
+        self.runs += 1
+        return self._reply(timeout + REPLY_GRACE)
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+
+
+class PytestPool:
+    """
+    Up to `size` warm workers per interpreter. Workers are recycled after
+    `max_runs` runs; a replacement is started in the background so the
+    next run still finds a warm worker. Idle workers of the least recently
+    used interpreters are closed beyond MAX_INTERPRETERS.
+    """
+
+    def __init__(self, size: int, max_runs: int):
+        self.size = size
+        self.max_runs = max_runs
+        self._idle: dict[str, list[WarmWorker]] = {}
+        self._count: dict[str, int] = {}
+        self._recent: list[str] = []
+        self._cond = threading.Condition()
+
+    def _touch(self, python: str):
+        """Mark `python` most recently used; close idle workers of evicted interpreters"""
+        if python in self._recent:
+            self._recent.remove(python)
+        self._recent.append(python)
+        for old in self._recent[:-MAX_INTERPRETERS]:
+            for worker in self._idle.pop(old, []):
+                worker.close()
+                self._count[old] -= 1
+            if not self._count.get(old):
+                self._count.pop(old, None)
+                self._recent.remove(old)
+
+    def _acquire(self, python: str) -> WarmWorker:
+        with self._cond:
+            self._touch(python)
+            while True:
+                idle = self._idle.setdefault(python, [])
+                while idle:
+                    worker = idle.pop()
+                    if worker.alive():
+                        return worker
+                    self._count[python] -= 1
+                if self._count.get(python, 0) < self.size:
+                    self._count[python] = self._count.get(python, 0) + 1
+                    break
+                self._cond.wait()
+        try:
+            return WarmWorker(python)
+        except Exception:
+            self._discard(python)
+            raise
+
+    def _discard(self, python: str):
+        with self._cond:
+            self._count[python] -= 1
+            self._cond.notify()
+
+    def _release(self, worker: WarmWorker):
+        with self._cond:
+            self._idle.setdefault(worker.python, []).append(worker)
+            self._cond.notify()
+
+    def _replace(self, worker: WarmWorker):
+        worker.close()
+
+        def spawn():
+            try:
+                self._release(WarmWorker(worker.python))
+            except Exception:
+                self._discard(worker.python)
+
+        threading.Thread(target=spawn, daemon=True).start()
+
+    def run(self, cwd: str, args: list[str], env: dict, timeout: float,
+            python: str | None = None, limits: dict | None = None) -> dict:
+        python = python or sys.executable
+        worker = self._acquire(python)
+        try:
+            result = worker.run(cwd, args, env, timeout, limits)
+        except Exception:
+            worker.close()
+            self._discard(python)
+            raise
+        if worker.runs >= self.max_runs:
+            self._replace(worker)
+        else:
+            self._release(worker)
+        return result
+
+    def shutdown(self):
+        with self._cond:
+            for workers in self._idle.values():
+                for worker in workers:
+                    worker.close()
+            self._idle.clear()
+            self._count.clear()
+            self._recent.clear()
+
+
+_pool: PytestPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> PytestPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PytestPool(settings.TEST_POOL_SIZE, settings.TEST_POOL_MAX_RUNS)
+        return _pool
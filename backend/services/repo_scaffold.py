@@ -1,6 +1,8 @@
 import os
 import uuid
+from pathlib import Path
 from backend.config import settings
+from backend.storage.db import get_job, get_job_workspace, get_project, set_job_workspace
 
 def create_workspace(job):
     ws_root = settings.WORKSPACE_ROOT
@@ -8,4 +10,31 @@ def create_workspace(job):
     path = os.path.join(ws_root, f"{job['project_name'].replace(' ','_')}_{uuid.uuid4().hex[:8]}")
     os.makedirs(path, exist_ok=True)
     os.makedirs(os.path.join(path, "src"), exist_ok=True)
+    set_job_workspace(job['id'], path)
     return path
+
+def find_workspace(job_id: str) -> Path | None:
+    """
+    Workspace directory of a job: the path recorded when the job started,
+    or None. Jobs from before paths were recorded fall back to their
+    project's workspace, then to the newest `{project_name}_*` directory.
+    """
+    recorded = get_job_workspace(job_id)
+    if recorded:
+        path = Path(recorded)
+        return path if path.is_dir() else None
+
+    job = get_job(job_id)
+    if job is None:
+        return None
+    if job.get('project_id'):
+        project = get_project(job['project_id'])
+        if project and project['workspace_path'] and os.path.isdir(project['workspace_path']):
+            return Path(project['workspace_path'])
+    ws_root = Path(settings.WORKSPACE_ROOT)
+    if not ws_root.exists():
+        return None
+    matching_dirs = list(ws_root.glob(f"{job['project_name'].replace(' ', '_')}_*"))
+    if not matching_dirs:
+        return None
+    return max(matching_dirs, key=lambda p: p.stat().st_mtime)
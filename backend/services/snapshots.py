@@ -0,0 +1,333 @@
+"""
+Snapshots Service - Copy-on-write snapshots of a workspace's visible files,
+taken at each build iteration so iterations can be listed, diffed and
+restored. A snapshot is a path -> content hash map; the content lives once
+per hash in .forge/objects, as a reflink of the file where the filesystem
+supports it, else a hardlink (files from the write path are replaced, never
+edited in place) or a copy. The newest SNAPSHOT_KEEP snapshots are kept
+"""
+import difflib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from backend.config import settings
+from backend.services import file_tree, workspace_index, workspace_manifest
+
+try:
+    import fcntl
+except ImportError:  # Windows: hardlinks and copies only
+    fcntl = None
+
+SNAPSHOTS_DIR = os.path.join(".forge", "snapshots")
+OBJECTS_DIR = os.path.join(".forge", "objects")
+# Linux ioctl: make the destination share the source's extents (btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+# Workspaces whose in-memory state (lock, newest snapshot) is kept
+MAX_CACHED = 32
+
+
+class SnapshotError(Exception):
+    """A snapshot does not exist or its stored content is damaged"""
+
+
+class _State:
+    """What is kept in memory per workspace"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.no_reflink = False        # its filesystem refused a reflink
+        self.latest: dict | None = None   # its newest snapshot, saving a reload per create
+
+
+_states: OrderedDict[str, _State] = OrderedDict()
+_states_lock = threading.Lock()
+
+
+def _state(root: str) -> _State:
+    with _states_lock:
+        state = _states.get(root)
+        if state is None:
+            # Workspaces deleted since go first; a busy one is never dropped
+            for gone in [k for k, v in _states.items() if not os.path.isdir(k) and not v.lock.locked()]:
+                del _states[gone]
+            state = _states[root] = _State()
+        _states.move_to_end(root)
+        for key in list(_states)[:-MAX_CACHED]:
+            if not _states[key].lock.locked():
+                del _states[key]
+        return state
+
+
+def _object_path(root: str, digest: str) -> str:
+    return os.path.join(root, OBJECTS_DIR, digest[:2], digest[2:])
+
+
+def reflink(src: str, dst: str) -> bool:
+    """Create `dst` as a copy-on-write clone of `src`; False where the filesystem can't"""
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+def _same(a: os.stat_result, b: os.stat_result) -> bool:
+    return (a.st_ino, a.st_size, a.st_mtime_ns) == (b.st_ino, b.st_size, b.st_mtime_ns)
+
+
+def _store(root: str, full: str, st: os.stat_result, digest: str, tracked: bool) -> bool:
+    """
+    Keep the content of `full` (as of `st`, hashing to `digest`) as an
+    object. Returns False if the file changed meanwhile and nothing was kept.
+    """
+    obj = _object_path(root, digest)
+    if os.path.exists(obj):
+        return True
+    os.makedirs(os.path.dirname(obj), exist_ok=True)
+    tmp = f"{obj}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        if not _state(root).no_reflink and reflink(full, tmp):
+            ok = _same(os.stat(full), st)
+        elif tracked:
+            # Only the write path's files: it swaps in a new inode for every write
+            os.link(full, tmp)
+            ok = _same(os.stat(tmp), st)
+        else:
+            shutil.copyfile(full, tmp)
+            ok = _same(os.stat(full), st)
+        if ok:
+            os.replace(tmp, obj)
+        return ok
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _scan(root: str, previous: dict, store: bool = True) -> dict[str, dict]:
+    """
+    path -> {"hash", "size", "mtime"} for every visible file, keeping new
+    content as objects. Only files neither the manifest nor `previous`
+    (the last snapshot) knows at their current size and mtime are read.
+    """
+    manifest = workspace_manifest.get_manifest(root)
+    files, _ = file_tree.listing(root)
+    state = _state(root)
+    if not state.no_reflink and store and files:
+        # Probe once per workspace instead of failing an ioctl per file
+        probe = os.path.join(root, OBJECTS_DIR, ".probe")
+        os.makedirs(os.path.dirname(probe), exist_ok=True)
+        if not reflink(os.path.join(root, files[0]["path"]), probe):
+            state.no_reflink = True
+        elif os.path.exists(probe):
+            os.remove(probe)
+    entries = {}
+    for f in files:
+        path = f["path"]
+        full = root + os.sep + path
+        try:
+            st = os.stat(full)
+            digest = manifest.known_hash(path, st)
+            tracked = digest is not None
+            known = previous.get(path)
+            if digest is None and known and (known["size"], known["mtime"]) == (st.st_size, st.st_mtime_ns):
+                digest = known["hash"]
+            if known and known["hash"] == digest:
+                pass  # already stored by the last snapshot
+            elif digest is None or (store and not _store(root, full, st, digest, tracked)):
+                # Untracked, or replaced while being stored: take the bytes as they are now
+                with open(full, "rb") as fh:
+                    data = fh.read()
+                st = os.stat(full)
+                digest = workspace_manifest.content_hash(data)
+                obj = _object_path(root, digest)
+                if store and not os.path.exists(obj):
+                    os.makedirs(os.path.dirname(obj), exist_ok=True)
+                    workspace_manifest.write_atomic(obj, data)
+        except OSError:
+            continue  # deleted meanwhile
+        entries[path] = {"hash": digest, "size": st.st_size, "mtime": st.st_mtime_ns}
+    return entries
+
+
+def _ids(root: str) -> list[int]:
+    try:
+        names = os.listdir(os.path.join(root, SNAPSHOTS_DIR))
+    except OSError:
+        return []
+    return sorted(int(n[:-5]) for n in names if n.endswith(".json") and n[:-5].isdigit())
+
+
+def _load(root: str, snapshot_id: int) -> dict:
+    try:
+        with open(os.path.join(root, SNAPSHOTS_DIR, f"{snapshot_id}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        raise SnapshotError(f"Snapshot {snapshot_id} not found")
+
+
+def _summary(snapshot: dict) -> dict:
+    files = snapshot["files"]
+    return {
+        **{k: v for k, v in snapshot.items() if k != "files"},
+        "files": len(files),
+        "size": sum(e["size"] for e in files.values()),
+    }
+
+
+def _create(root: str, label: str, job_id: str | None) -> dict:
+    ids = _ids(root)
+    latest = _state(root).latest
+    if ids and not (latest and latest["id"] == ids[-1]):
+        latest = _load(root, ids[-1])
+    previous = latest["files"] if ids else {}
+    snapshot = {
+        "id": (ids[-1] if ids else 0) + 1,
+        "label": label,
+        "job_id": job_id,
+        "created": time.time(),
+        "revision": workspace_manifest.revision(root),
+        "files": _scan(root, previous),
+    }
+    os.makedirs(os.path.join(root, SNAPSHOTS_DIR), exist_ok=True)
+    workspace_manifest.write_atomic(
+        os.path.join(root, SNAPSHOTS_DIR, f"{snapshot['id']}.json"),
+        json.dumps(snapshot).encode("utf-8")
+    )
+    _state(root).latest = snapshot
+    return snapshot
+
+
+def _prune(root: str):
+    """Drop the oldest snapshots beyond SNAPSHOT_KEEP, then the objects none of the rest uses"""
+    ids = _ids(root)
+    if not settings.SNAPSHOT_KEEP or len(ids) <= settings.SNAPSHOT_KEEP:
+        return
+    for snapshot_id in ids[:-settings.SNAPSHOT_KEEP]:
+        os.remove(os.path.join(root, SNAPSHOTS_DIR, f"{snapshot_id}.json"))
+    used = set()
+    for snapshot_id in ids[-settings.SNAPSHOT_KEEP:]:
+        used.update(e["hash"] for e in _load(root, snapshot_id)["files"].values())
+    objects = os.path.join(root, OBJECTS_DIR)
+    for prefix in os.listdir(objects):
+        folder = os.path.join(objects, prefix)
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            if prefix + name not in used:
+                os.remove(os.path.join(folder, name))
+        if not os.listdir(folder):
+            os.rmdir(folder)
+
+
+def create(repo: str, label: str = "", job_id: str | None = None) -> dict:
+    """Snapshot the workspace's visible files; returns the snapshot's summary"""
+    root = os.path.abspath(repo)
+    with _state(root).lock:
+        snapshot = _create(root, label, job_id)
+        _prune(root)
+        return _summary(snapshot)
+
+
+def list_snapshots(repo: str) -> list[dict]:
+    """Summaries ({"id", "label", "job_id", "created", "revision", "files", "size"}), oldest first"""
+    root = os.path.abspath(repo)
+    return [_summary(_load(root, i)) for i in _ids(root)]
+
+
+def _read_object(root: str, path: str, digest: str) -> bytes:
+    try:
+        with open(_object_path(root, digest), "rb") as f:
+            data = f.read()
+    except OSError:
+        raise SnapshotError(f"Snapshot content of {path} is missing")
+    if workspace_manifest.content_hash(data) != digest:
+        # A hardlinked file was edited in place, bypassing the write path
+        raise SnapshotError(f"Snapshot content of {path} was modified")
+    return data
+
+
+def _patch(path: str, old: bytes | None, new: bytes | None) -> str | None:
+    if max(len(old or b""), len(new or b"")) > settings.FILE_VIEW_MAX_BYTES:
+        return None
+    try:
+        a = (old or b"").decode("utf-8").splitlines(keepends=True)
+        b = (new or b"").decode("utf-8").splitlines(keepends=True)
+    except UnicodeDecodeError:
+        return None  # binary
+    return "".join(difflib.unified_diff(
+        a, b,
+        fromfile=f"a/{path}" if old is not None else "/dev/null",
+        tofile=f"b/{path}" if new is not None else "/dev/null",
+    ))
+
+
+def diff(repo: str, snapshot_id: int | None, base_id: int | None = None) -> dict:
+    """
+    Compare snapshot `snapshot_id` (None: the workspace as it is now) with
+    `base_id` (None: the snapshot before it). Returns {"from", "to", "added",
+    "removed", "modified", "patches": {path: unified diff}}; binary and
+    oversized files have no patch.
+    """
+    root = os.path.abspath(repo)
+    ids = _ids(root)
+    if snapshot_id is None:
+        new = _scan(root, _load(root, ids[-1])["files"] if ids else {}, store=False)
+    else:
+        new = _load(root, snapshot_id)["files"]
+    if base_id is None:
+        earlier = [i for i in ids if snapshot_id is None or i < snapshot_id]
+        base_id = earlier[-1] if earlier else None
+    old = _load(root, base_id)["files"] if base_id is not None else {}
+
+    def content(files: dict, is_current: bool, path: str) -> bytes | None:
+        if path not in files:
+            return None
+        if is_current:
+            with open(os.path.join(root, path), "rb") as f:
+                return f.read()
+        return _read_object(root, path, files[path]["hash"])
+
+    added = sorted(p for p in new if p not in old)
+    removed = sorted(p for p in old if p not in new)
+    modified = sorted(p for p in new if p in old and new[p]["hash"] != old[p]["hash"])
+    patches = {}
+    for path in added + removed + modified:
+        try:
+            patch = _patch(path, content(old, False, path), content(new, snapshot_id is None, path))
+        except OSError:
+            continue
+        if patch is not None:
+            patches[path] = patch
+    return {"from": base_id, "to": snapshot_id, "added": added, "removed": removed, "modified": modified, "patches": patches}
+
+
+def restore(repo: str, snapshot_id: int, job_id: str | None = None) -> list[str]:
+    """
+    Put the workspace back to snapshot `snapshot_id` through the write path
+    (so the manifest journal and index follow) and return the changed
+    paths. The current state is snapshotted first, so a restore can be undone.
+    """
+    root = os.path.abspath(repo)
+    with _state(root).lock:
+        target = _load(root, snapshot_id)["files"]
+        current = _create(root, f"before restoring snapshot {snapshot_id}", job_id)["files"]
+        edits = {}
+        for path, entry in target.items():
+            if current.get(path, {}).get("hash") != entry["hash"]:
+                edits[path] = _read_object(root, path, entry["hash"])
+        for path in current:
+            if path not in target:
+                edits[path] = None
+        changed = workspace_manifest.apply(repo, edits, label=f"restore snapshot {snapshot_id}")
+        # Only now: the snapshot restored from may be the oldest one
+        _prune(root)
+    workspace_index.update_files(repo, changed)
+    return changed
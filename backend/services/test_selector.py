@@ -0,0 +1,112 @@
+"""
+Test Selector Service - Maps changed files to the test files that import them
+(directly or transitively) so intermediate fix iterations run fewer tests
+"""
+import ast
+import os
+
+SKIP_DIRS = {'__pycache__', 'node_modules', 'venv'}
+
+
+def is_test_file(rel_path: str) -> bool:
+    name = os.path.basename(rel_path)
+    return name.endswith('.py') and (name.startswith('test_') or name.endswith('_test.py'))
+
+
+def module_names(rel_path: str) -> list[str]:
+    """Importable names for a workspace file (repo root and src/ layouts)"""
+    parts = rel_path[:-3].replace(os.sep, '/').split('/')
+    if parts[-1] == '__init__':
+        parts = parts[:-1]
+    if not parts:
+        return []
+    names = ['.'.join(parts)]
+    if parts[0] == 'src' and len(parts) > 1:
+        names.append('.'.join(parts[1:]))
+    return names
+
+
+def python_files(repo: str) -> list[str]:
+    found = []
+    for root, dirs, files in os.walk(repo):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in SKIP_DIRS]
+        for name in files:
+            if name.endswith('.py'):
+                found.append(os.path.relpath(os.path.join(root, name), repo))
+    return found
+
+
+def _imported_names(rel_path: str, source: str) -> set[str]:
+    """Absolute dotted names imported by a file (relative imports resolved)"""
+    tree = ast.parse(source)
+    package = rel_path[:-3].replace(os.sep, '/').split('/')[:-1]
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package[:len(package) - node.level + 1]
+                prefix = '.'.join(base + ([node.module] if node.module else []))
+            else:
+                prefix = node.module or ''
+            if prefix:
+                names.add(prefix)
+            # `from pkg import mod` may name a submodule
+            names.update(f"{prefix}.{alias.name}" if prefix else alias.name for alias in node.names)
+    return names
+
+
+def build_import_graph(repo: str) -> dict[str, set[str]] | None:
+    """
+    Reverse import graph over workspace files: path -> paths importing it.
+    Returns None if any file cannot be parsed (dependencies are unknown).
+    """
+    files = python_files(repo)
+    modules = {}
+    for rel in files:
+        for name in module_names(rel):
+            modules[name] = rel
+
+    dependents: dict[str, set[str]] = {rel: set() for rel in files}
+    for rel in files:
+        try:
+            with open(os.path.join(repo, rel), 'r', encoding='utf-8') as f:
+                imported = _imported_names(rel, f.read())
+        except (OSError, SyntaxError, ValueError, UnicodeDecodeError):
+            return None
+        for name in imported:
+            # Importing a.b.c also executes a/__init__ and a/b/__init__
+            parts = name.split('.')
+            for i in range(1, len(parts) + 1):
+                target = modules.get('.'.join(parts[:i]))
+                if target and target != rel:
+                    dependents[target].add(rel)
+    return dependents
+
+
+def select_tests(repo: str, changed_files: list[str]) -> list[str] | None:
+    """
+    Test files affected by `changed_files`, sorted.
+    Returns None when the impact cannot be bounded and the full suite is
+    needed: conftest or non-Python changes, deleted files, unparsable code.
+    """
+    graph = build_import_graph(repo)
+    if graph is None:
+        return None
+
+    pending = []
+    for path in changed_files:
+        rel = os.path.normpath(path)
+        if not rel.endswith('.py') or os.path.basename(rel) == 'conftest.py' or rel not in graph:
+            return None
+        pending.append(rel)
+
+    affected = set(pending)
+    while pending:
+        for dependent in graph[pending.pop()]:
+            if dependent not in affected:
+                affected.add(dependent)
+                pending.append(dependent)
+
+    return sorted(p for p in affected if is_test_file(p))
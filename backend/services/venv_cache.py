@@ -0,0 +1,262 @@
+"""
+Venv Cache Service - Virtualenvs for workspaces that declare dependencies,
+built once per dependency manifest and hardlink-cloned into each job
+"""
+import hashlib
+import os
+import platform
+import shutil
+import site
+import subprocess
+import sys
+import sysconfig
+import threading
+import time
+import tomllib
+from contextlib import contextmanager
+from backend.config import get_data_dir, settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: frozen builds don't create environments anyway
+    fcntl = None
+
+JOB_VENV = os.path.join(".forge", "venv")
+MARKER = ".forge-manifest"
+
+# Dependency groups in pyproject.toml that tests may need
+PYPROJECT_EXTRAS = ("test", "tests", "dev", "testing")
+
+_locks: dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
+# Install failures by manifest key -> (pip output, when), so fix iterations
+# that leave the manifest unchanged do not retry a failing install. Expire
+# so a transient failure (network, index outage) is retried later.
+FAILURE_TTL_SECONDS = 300
+_failed: dict[str, tuple[str, float]] = {}
+
+
+class VenvError(RuntimeError):
+    """Dependencies could not be installed; the message holds pip's output"""
+
+
+def supported() -> bool:
+    # Frozen builds have no interpreter to create environments from
+    return settings.VENV_ENABLED and not getattr(sys, "frozen", False)
+
+
+def read_requirements(repo_path: str) -> list[str] | None:
+    """
+    Requirement lines declared by the workspace (requirements.txt, else
+    pyproject.toml dependencies plus test/dev extras), or None if it
+    declares none.
+    """
+    req_path = os.path.join(repo_path, "requirements.txt")
+    if os.path.isfile(req_path):
+        with open(req_path, "r", encoding="utf-8") as f:
+            lines = [line.split(" #")[0].strip() for line in f]
+        reqs = [line for line in lines if line and not line.startswith("#")]
+        return reqs or None
+
+    pyproject_path = os.path.join(repo_path, "pyproject.toml")
+    if os.path.isfile(pyproject_path):
+        try:
+            with open(pyproject_path, "rb") as f:
+                project = tomllib.load(f).get("project", {})
+        except (OSError, tomllib.TOMLDecodeError):
+            return None
+        reqs = list(project.get("dependencies", []))
+        optional = project.get("optional-dependencies", {})
+        for extra in PYPROJECT_EXTRAS:
+            reqs.extend(optional.get(extra, []))
+        return reqs or None
+    return None
+
+
+def manifest_hash(requirements: list[str]) -> str:
+    """Cache key: the normalized requirements plus the interpreter they install for"""
+    h = hashlib.sha256()
+    h.update(f"{sys.version}|{platform.machine()}|{sys.platform}\n".encode())
+    for req in sorted(set(r.replace(" ", "").lower() for r in requirements)):
+        h.update(req.encode() + b"\n")
+    return h.hexdigest()[:16]
+
+
+def venv_python(venv_dir: str) -> str:
+    if os.name == 'nt':
+        return os.path.join(venv_dir, "Scripts", "python.exe")
+    return os.path.join(venv_dir, "bin", "python")
+
+
+def _cache_root() -> str:
+    return str(get_data_dir() / "venvs")
+
+
+def _wheel_dir() -> str:
+    return settings.VENV_WHEEL_DIR or str(get_data_dir() / "wheels")
+
+
+def _pip(python: str, args: list[str], cwd: str):
+    env = os.environ.copy()
+    env["PIP_DISABLE_PIP_VERSION_CHECK"] = "1"
+    env["PIP_CACHE_DIR"] = str(get_data_dir() / "pip-cache")
+    proc = subprocess.run(
+        [python, "-m", "pip", *args],
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        env=env,
+        timeout=settings.VENV_INSTALL_TIMEOUT
+    )
+    return proc.returncode, proc.stdout
+
+
+def _install(python: str, req_file: str, cwd: str):
+    """
+    Install from the local wheel directory only; on a miss, fill the wheel
+    directory (download/build, unless VENV_OFFLINE) and install from it, so
+    the next environment needing the same packages installs offline.
+    """
+    wheels = _wheel_dir()
+    os.makedirs(wheels, exist_ok=True)
+    local = ["install", "--no-index", "--find-links", wheels, "-r", req_file]
+    code, output = _pip(python, local, cwd)
+    if code == 0:
+        return
+    if settings.VENV_OFFLINE:
+        raise VenvError(output)
+    code, output = _pip(python, ["wheel", "--wheel-dir", wheels, "--find-links", wheels, "-r", req_file], cwd)
+    if code != 0:
+        raise VenvError(output)
+    code, output = _pip(python, local, cwd)
+    if code != 0:
+        raise VenvError(output)
+
+
+def _base_site_packages() -> list[str]:
+    paths = [sysconfig.get_paths()["purelib"], sysconfig.get_paths()["platlib"]]
+    paths.extend(site.getsitepackages())
+    seen = []
+    for p in paths:
+        if p not in seen and os.path.isdir(p):
+            seen.append(p)
+    return seen
+
+
+@contextmanager
+def _build_lock(key: str):
+    """Exclusive right to build `key`: per thread, and per process where flock exists"""
+    with _locks_lock:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(_cache_root(), f".{key}.lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _build(key: str, requirements: list[str], repo_path: str) -> str:
+    """
+    Create the cached environment for `key` in place, under the build lock:
+    console scripts get the environment's final path in their shebang. The
+    marker is written last; a directory without it is a failed build.
+    """
+    target = os.path.join(_cache_root(), key)
+    shutil.rmtree(target, ignore_errors=True)
+    built = False
+    try:
+        subprocess.run(
+            [sys.executable, "-m", "venv", "--without-pip", target],
+            check=True, capture_output=True, text=True, timeout=settings.VENV_INSTALL_TIMEOUT
+        )
+        # The backend's own packages (pip, pytest and its plugins) come after
+        # the project's, so neither is installed into every environment
+        purelib = subprocess.run(
+            [venv_python(target), "-c", "import sysconfig; print(sysconfig.get_paths()['purelib'])"],
+            check=True, capture_output=True, text=True
+        ).stdout.strip()
+        with open(os.path.join(purelib, "zz_forge_base.pth"), "w", encoding="utf-8") as f:
+            f.write("\n".join(_base_site_packages()) + "\n")
+
+        req_file = os.path.join(target, "requirements.txt")
+        with open(req_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(requirements) + "\n")
+        _install(venv_python(target), req_file, repo_path)
+        with open(os.path.join(target, MARKER), "w", encoding="utf-8") as f:
+            f.write(key)
+        built = True
+    except subprocess.CalledProcessError as e:
+        raise VenvError(e.stderr or str(e))
+    except subprocess.TimeoutExpired:
+        raise VenvError(f"Dependency install exceeded {settings.VENV_INSTALL_TIMEOUT}s")
+    finally:
+        if not built:
+            shutil.rmtree(target, ignore_errors=True)
+    return target
+
+
+def _clone(src: str, dst: str):
+    """Hardlink every file (copy across filesystems); symlinks are recreated"""
+    def link(s, d):
+        try:
+            os.link(s, d)
+        except OSError:
+            shutil.copy2(s, d)
+
+    shutil.copytree(src, dst, symlinks=True, copy_function=link)
+
+
+def _cached(key: str, requirements: list[str], repo_path: str) -> str:
+    target = os.path.join(_cache_root(), key)
+    if os.path.isfile(os.path.join(target, MARKER)):
+        return target
+    os.makedirs(_cache_root(), exist_ok=True)
+    with _build_lock(key):
+        if os.path.isfile(os.path.join(target, MARKER)):
+            return target
+        failure = _failed.get(key)
+        if failure is not None:
+            if time.monotonic() - failure[1] < FAILURE_TTL_SECONDS:
+                raise VenvError(failure[0])
+            del _failed[key]
+        try:
+            return _build(key, requirements, repo_path)
+        except VenvError as e:
+            _failed[key] = (str(e), time.monotonic())
+            raise
+
+
+def prepare(repo_path: str) -> str | None:
+    """
+    Interpreter to run the workspace's tests with: a per-job clone of the
+    cached environment for its dependency manifest, or None when the
+    workspace declares no dependencies (use the backend's interpreter).
+    Raises VenvError if the dependencies cannot be installed.
+    """
+    if not supported():
+        return None
+    requirements = read_requirements(repo_path)
+    if not requirements:
+        return None
+    key = manifest_hash(requirements)
+
+    job_venv = os.path.join(repo_path, JOB_VENV)
+    try:
+        with open(os.path.join(job_venv, MARKER), "r", encoding="utf-8") as f:
+            if f.read().strip() == key:
+                return venv_python(job_venv)
+    except OSError:
+        pass
+
+    cached = _cached(key, requirements, repo_path)
+    shutil.rmtree(job_venv, ignore_errors=True)
+    os.makedirs(os.path.dirname(job_venv), exist_ok=True)
+    _clone(cached, job_venv)
+    return venv_python(job_venv)
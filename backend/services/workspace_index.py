@@ -0,0 +1,301 @@
+"""
+Workspace Index Service - Per-workspace lexical index (BM25 over file chunks
+plus symbol names) used to pick the code relevant to a modify request
+"""
+import ast
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from backend.config import settings
+
+CHUNK_LINES = 40
+MAX_FILE_BYTES = 512_000
+SKIP_DIRS = {'__pycache__', 'node_modules', 'venv'}
+# Workspaces whose index is kept in memory (least recently used go first)
+MAX_CACHED = 32
+# Most of the context budget the file listing may take
+LISTING_SHARE = 0.25
+
+# BM25 parameters, plus extra weight for query terms that name a symbol
+# defined in the chunk or appear in its file path
+K1 = 1.2
+B = 0.75
+SYMBOL_BOOST = 2.0
+PATH_BOOST = 1.0
+
+_WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_PART_RE = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+_SYMBOL_RE = re.compile(r"\b(?:def|class|function|func|fn|const|let|var|interface|type|struct)\s+([A-Za-z_]\w*)")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased identifiers, plus their snake_case/camelCase parts"""
+    tokens = []
+    for word in _WORD_RE.findall(text):
+        tokens.append(word.lower())
+        parts = _PART_RE.findall(word)
+        if len(parts) > 1:
+            tokens.extend(p.lower() for p in parts)
+    return tokens
+
+
+def extract_symbols(path: str, text: str) -> list[tuple[str, int]]:
+    """(name, line) pairs for functions/classes defined in a file"""
+    if path.endswith('.py'):
+        try:
+            tree = ast.parse(text)
+        except (SyntaxError, ValueError):
+            pass
+        else:
+            return [
+                (node.name, node.lineno) for node in ast.walk(tree)
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+            ]
+    symbols = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        symbols.extend((m.group(1), lineno) for m in _SYMBOL_RE.finditer(line))
+    return symbols
+
+
+def _discard(index: dict, term: str, item):
+    bucket = index.get(term)
+    if bucket is not None:
+        if isinstance(bucket, dict):
+            bucket.pop(item, None)
+        else:
+            bucket.discard(item)
+        if not bucket:
+            del index[term]
+
+
+class WorkspaceIndex:
+    """Inverted index over fixed-size line chunks of every text file in a workspace"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self.files: dict[str, dict] = {}        # path -> {"sig", "text", "lines", "chunks": [chunk keys]}
+        self.chunks: dict[tuple, dict] = {}     # (path, n) -> chunk
+        self.postings: dict[str, dict[tuple, int]] = {}  # term -> {chunk key: tf}
+        self.symbol_index: dict[str, set] = {}            # symbol term -> chunk keys
+        self.path_index: dict[str, set] = {}              # path term -> paths
+        self.total_length = 0
+
+    # ----- maintenance -----
+
+    def _signature(self, full: str):
+        st = os.stat(full)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _drop(self, path: str):
+        entry = self.files.pop(path, None)
+        if not entry:
+            return
+        for key in entry["chunks"]:
+            chunk = self.chunks.pop(key)
+            self.total_length -= chunk["length"]
+            for term in chunk["tf"]:
+                _discard(self.postings, term, key)
+            for term in chunk["symbols"]:
+                _discard(self.symbol_index, term, key)
+        for term in set(tokenize(path)):
+            _discard(self.path_index, term, path)
+
+    def _add(self, path: str, text: str, sig):
+        lines = text.splitlines()
+        symbols = extract_symbols(path, text)
+        keys = []
+        for n, start in enumerate(range(0, max(len(lines), 1), CHUNK_LINES)):
+            end = min(start + CHUNK_LINES, len(lines))
+            body = "\n".join(lines[start:end])
+            tf = Counter(tokenize(body))
+            chunk_symbols = set()
+            for name, lineno in symbols:
+                if start < lineno <= end:
+                    chunk_symbols.update(tokenize(name))
+            key = (path, n)
+            self.chunks[key] = {
+                "path": path,
+                "start": start + 1,
+                "end": end,
+                "tf": tf,
+                "length": sum(tf.values()),
+                "symbols": chunk_symbols,
+            }
+            self.total_length += self.chunks[key]["length"]
+            for term, count in tf.items():
+                self.postings.setdefault(term, {})[key] = count
+            for term in chunk_symbols:
+                self.symbol_index.setdefault(term, set()).add(key)
+            keys.append(key)
+        for term in set(tokenize(path)):
+            self.path_index.setdefault(term, set()).add(path)
+        self.files[path] = {"sig": sig, "text": text, "lines": len(lines), "chunks": keys}
+
+    def update_file(self, path: str):
+        """(Re)index one workspace-relative path, or drop it if it is gone"""
+        full = os.path.join(self.root, path)
+        with self._lock:
+            self._drop(path)
+            try:
+                sig = self._signature(full)
+            except OSError:
+                return
+            try:
+                if sig[1] > MAX_FILE_BYTES:
+                    raise ValueError("too large to index")
+                with open(full, "r", encoding="utf-8") as f:
+                    text = f.read()
+            except (OSError, ValueError):
+                # Binary or oversized: listed, but not searchable
+                self.files[path] = {"sig": sig, "text": None, "lines": 0, "chunks": []}
+                return
+            self._add(path, text, sig)
+
+    def walk(self):
+        """Yield (relative path, full path) for every indexable file"""
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in SKIP_DIRS]
+            for name in files:
+                if not name.startswith('.'):
+                    full = os.path.join(root, name)
+                    yield os.path.relpath(full, self.root), full
+
+    def refresh(self):
+        """Stat the tree and reindex only files whose mtime/size changed"""
+        seen = set()
+        for rel, full in self.walk():
+            seen.add(rel)
+            try:
+                sig = self._signature(full)
+            except OSError:
+                continue
+            entry = self.files.get(rel)
+            if entry is None or entry["sig"] != sig:
+                self.update_file(rel)
+        for rel in set(self.files) - seen:
+            with self._lock:
+                self._drop(rel)
+
+    # ----- querying -----
+
+    def search(self, query: str, top_k: int) -> list[tuple[float, dict]]:
+        """Top-k chunks for a free-text query, best first"""
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self.chunks)
+            if not n or not terms:
+                return []
+            avg_len = max(self.total_length / n, 1)
+            scores: dict[tuple, float] = {}
+            for term in terms:
+                posting = self.postings.get(term, {})
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for key, tf in posting.items():
+                    norm = K1 * (1 - B + B * self.chunks[key]["length"] / avg_len)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+                for key in self.symbol_index.get(term, ()):
+                    scores[key] = scores.get(key, 0.0) + idf * SYMBOL_BOOST
+                for path in self.path_index.get(term, ()):
+                    for key in self.files[path]["chunks"]:
+                        scores[key] = scores.get(key, 0.0) + idf * PATH_BOOST
+            ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:top_k]
+            return [(score, self.chunks[key]) for key, score in ranked]
+
+    def excerpt(self, chunk: dict) -> str:
+        lines = self.files[chunk["path"]]["text"].splitlines()
+        return "\n".join(lines[chunk["start"] - 1:chunk["end"]])
+
+
+_indexes: OrderedDict[str, WorkspaceIndex] = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(repo: str) -> WorkspaceIndex:
+    """Index for a workspace, built on first use and refreshed incrementally"""
+    key = os.path.abspath(repo)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            # Workspaces deleted since they were indexed go first
+            for gone in [k for k in _indexes if not os.path.isdir(k)]:
+                del _indexes[gone]
+            index = _indexes[key] = WorkspaceIndex(key)
+        _indexes.move_to_end(key)
+        while len(_indexes) > MAX_CACHED:
+            _indexes.popitem(last=False)
+    index.refresh()
+    return index
+
+
+def update_files(repo: str, paths: list[str]):
+    """Write-path hook: reindex files just written, if the workspace is indexed"""
+    with _indexes_lock:
+        index = _indexes.get(os.path.abspath(repo))
+    if index is None:
+        return
+    for path in paths:
+        index.update_file(os.path.normpath(path))
+
+
+def build_context(repo: str, query: str, budget_tokens: int | None = None, top_k: int | None = None) -> str:
+    """
+    Assemble modify-mode context: the file list, then the files holding the
+    top-k chunks for `query`, all within the token budget. The list names
+    the matching files first and is cut to LISTING_SHARE of the budget;
+    whole files are included while they fit the rest, and files too large
+    for what is left are cut to their matching chunks.
+    """
+    index = get_index(repo)
+    budget = (budget_tokens or settings.MODIFY_CONTEXT_TOKENS) * 4  # ~4 chars per token
+    hits = index.search(query, top_k or settings.MODIFY_CONTEXT_TOP_K)
+    with index._lock:
+        # Entries are replaced, not edited, by update_file: these stay consistent
+        files = dict(index.files)
+
+    by_file: dict[str, list[dict]] = {}
+    for _, chunk in hits:
+        entry = files.get(chunk["path"])
+        if entry is not None and entry["text"] is not None:
+            by_file.setdefault(chunk["path"], []).append(chunk)
+
+    # Files with hits, then the rest in order, until the listing's share is used
+    listing, listing_budget = [], int(budget * LISTING_SHARE)
+    ordered = list(by_file) + sorted(p for p in files if p not in by_file)
+    for n, path in enumerate(ordered):
+        line = f"  {path} ({files[path]['sig'][1]} bytes)"
+        if len(line) + 1 > listing_budget and n >= len(by_file):
+            listing.append(f"  ... and {len(ordered) - n} more files")
+            break
+        listing.append(line)
+        listing_budget -= len(line) + 1
+    budget -= sum(len(line) + 1 for line in listing)
+
+    sections = []
+    for path, chunks in by_file.items():
+        entry = files[path]
+        text = entry["text"]
+        if len(text) <= budget:
+            sections.append(f"--- FILE: {path} ---\n{text}\n--- END FILE ---\n")
+            budget -= len(text)
+            continue
+        file_lines = text.splitlines()
+        for chunk in sorted(chunks, key=lambda c: c["start"]):
+            body = "\n".join(file_lines[chunk["start"] - 1:chunk["end"]])
+            if len(body) > budget:
+                break
+            sections.append(
+                f"--- FILE: {path} (EXCERPT: lines {chunk['start']}-{chunk['end']} of {entry['lines']}) ---\n{body}\n--- END EXCERPT ---\n"
+            )
+            budget -= len(body)
+        if budget <= 0:
+            break
+
+    lines = ["CURRENT WORKSPACE FILES:", ""] + listing + [""]
+    if sections:
+        lines.append("RELEVANT CODE:")
+        lines.append("")
+        lines.extend(sections)
+    return "\n".join(lines)
@@ -0,0 +1,206 @@
+"""
+Workspace Manifest Service - Per-workspace record of generated files
+(path -> hash, size, mtime) plus a revision journal, kept up to date by the
+single write path for LLM output so consumers can ask what changed
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from backend.services import file_tree
+
+MANIFEST_PATH = os.path.join(".forge", "manifest.json")
+JOURNAL_PATH = os.path.join(".forge", "journal.jsonl")
+# Workspaces whose manifest (and journal) is kept in memory; others reload from .forge
+MAX_CACHED = 32
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def safe_path(path: str) -> str | None:
+    """
+    `path` normalized to a workspace-relative path, or None if it is
+    absolute, climbs out with "..", or points into .forge
+    """
+    if not path or "\0" in path:
+        return None
+    normalized = os.path.normpath(path.replace("\\", "/"))
+    if os.path.isabs(normalized) or os.path.splitdrive(normalized)[0]:
+        return None
+    parts = normalized.split(os.sep)
+    if ".." in parts or parts[0] in (".", ".forge"):
+        return None
+    return normalized
+
+
+def rejected_path(path: str) -> dict:
+    """Conflict entry (see patcher.format_conflicts) for an edit whose path is unsafe"""
+    return {"path": path, "hunk": "", "reason": "path is outside the workspace (or in .forge); it was not applied", "expected": ""}
+
+
+def write_atomic(full: str, data: bytes):
+    """Write via a temp file and rename, so readers never see a partial file"""
+    tmp = f"{full}.forge-tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, full)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class Manifest:
+    """
+    Files written through `apply`, and one journal entry per `apply` call
+    that changed something. Revision n is the state after the n-th entry;
+    revision 0 is the empty workspace.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.lock = threading.Lock()
+        self.files: dict[str, dict] = {}   # path -> {"hash", "size", "mtime"}
+        self.journal: list[dict] = []      # entry i -> {"rev": i + 1, "label", "changes": [...]}
+        self._load()
+
+    @property
+    def revision(self) -> int:
+        return len(self.journal)
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.root, MANIFEST_PATH), "r", encoding="utf-8") as f:
+                self.files = json.load(f)["files"]
+            with open(os.path.join(self.root, JOURNAL_PATH), "r", encoding="utf-8") as f:
+                self.journal = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError, KeyError):
+            self.files, self.journal = {}, []
+
+    def _save(self, entry: dict):
+        os.makedirs(os.path.join(self.root, ".forge"), exist_ok=True)
+        with open(os.path.join(self.root, JOURNAL_PATH), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        path = os.path.join(self.root, MANIFEST_PATH)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"revision": self.revision, "files": self.files}, f)
+        os.replace(tmp, path)
+
+    def known_hash(self, path: str, st: os.stat_result) -> str | None:
+        """Recorded hash of `path` if the file (per its stat) is as written, else None"""
+        entry = self.files.get(path)
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime_ns:
+            return entry["hash"]
+        return None
+
+    def _resolve(self, path: str) -> str | None:
+        """Safe relative form of `path`, or None if it (or a symlink on the way) leaves the root"""
+        rel = safe_path(path)
+        if rel is None:
+            return None
+        root = os.path.realpath(self.root)
+        full = os.path.realpath(os.path.join(root, rel))
+        return rel if full.startswith(root + os.sep) else None
+
+    def _unchanged(self, path: str, digest: str) -> bool:
+        """Whether `path` already holds content with this hash"""
+        full = os.path.join(self.root, path)
+        try:
+            st = os.stat(full)
+        except OSError:
+            return False
+        known = self.known_hash(path, st)
+        if known is not None:
+            return known == digest
+        # Untracked or touched outside the write path: compare the bytes
+        try:
+            with open(full, "rb") as f:
+                return content_hash(f.read()) == digest
+        except OSError:
+            return False
+
+    def apply(self, edits: dict[str, str | bytes | None], label: str = "",
+              conflicts: list | None = None) -> list[str]:
+        """
+        Write (str or bytes, atomically) or delete (None) files, skipping writes whose
+        content is already on disk. Records one journal entry if anything
+        changed and returns the changed paths. Paths that would land outside
+        the workspace or in .forge are not touched and go to `conflicts`.
+        """
+        changes = []
+        with self.lock:
+            for raw, content in edits.items():
+                path = self._resolve(raw)
+                if path is None:
+                    if conflicts is not None:
+                        conflicts.append(rejected_path(raw))
+                    continue
+                full = os.path.join(self.root, path)
+                if content is None:
+                    if os.path.exists(full):
+                        os.remove(full)
+                        self.files.pop(path, None)
+                        changes.append({"path": path, "op": "delete"})
+                    continue
+                data = content.encode("utf-8") if isinstance(content, str) else content
+                digest = content_hash(data)
+                if self._unchanged(path, digest):
+                    continue
+                os.makedirs(os.path.dirname(full), exist_ok=True)
+                write_atomic(full, data)
+                st = os.stat(full)
+                self.files[path] = {"hash": digest, "size": st.st_size, "mtime": st.st_mtime_ns}
+                changes.append({"path": path, "op": "write", "hash": digest})
+            if changes:
+                entry = {"rev": self.revision + 1, "label": label, "changes": changes}
+                self.journal.append(entry)
+                self._save(entry)
+                file_tree.invalidate(self.root)
+        return [c["path"] for c in changes]
+
+    def changes_since(self, revision: int) -> list[str]:
+        """Paths written or deleted after `revision`, in first-change order"""
+        seen = {}
+        for entry in self.journal[max(revision, 0):]:
+            for change in entry["changes"]:
+                seen.setdefault(change["path"], None)
+        return list(seen)
+
+
+_manifests: OrderedDict[str, Manifest] = OrderedDict()
+_manifests_lock = threading.Lock()
+
+
+def get_manifest(repo: str) -> Manifest:
+    """Manifest for a workspace, loaded from .forge on first use"""
+    key = os.path.abspath(repo)
+    with _manifests_lock:
+        manifest = _manifests.get(key)
+        if manifest is None:
+            # Workspaces deleted since go first; one being written to is never dropped
+            for gone in [k for k, m in _manifests.items() if not os.path.isdir(k) and not m.lock.locked()]:
+                del _manifests[gone]
+            manifest = _manifests[key] = Manifest(key)
+        _manifests.move_to_end(key)
+        for old in list(_manifests)[:-MAX_CACHED]:
+            if not _manifests[old].lock.locked():
+                del _manifests[old]
+        return manifest
+
+
+def apply(repo: str, edits: dict[str, str | bytes | None], label: str = "",
+          conflicts: list | None = None) -> list[str]:
+    return get_manifest(repo).apply(edits, label, conflicts)
+
+
+def revision(repo: str) -> int:
+    return get_manifest(repo).revision
+
+
+def changes_since(repo: str, rev: int) -> list[str]:
+    return get_manifest(repo).changes_since(rev)
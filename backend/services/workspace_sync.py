@@ -0,0 +1,103 @@
+"""
+Workspace Sync Service - Mirrors a workspace into another directory
+incrementally: files whose size and mtime match are skipped, equal content
+is recognised by hash, only changed files are written (reflinked, or
+hardlinked on request, where the filesystem allows) and files no longer
+in the workspace are removed
+"""
+import os
+import shutil
+import threading
+from backend.services import archive, workspace_manifest
+from backend.services.snapshots import reflink
+
+
+def _hash_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return workspace_manifest.content_hash(f.read())
+
+
+def _dest_files(dest: str) -> dict[str, os.stat_result]:
+    """Relative path -> lstat of every file (and symlink) under `dest`"""
+    found = {}
+    for root, dirs, files in os.walk(dest):
+        for name in files + [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+            full = os.path.join(root, name)
+            found[os.path.relpath(full, dest)] = os.lstat(full)
+    return found
+
+
+def _prune_dirs(dest: str):
+    """Remove directories left empty under `dest` (not `dest` itself)"""
+    for root, dirs, files in os.walk(dest, topdown=False):
+        if root != dest and not os.listdir(root):
+            os.rmdir(root)
+
+
+def _write(src: str, target: str, hardlink: bool) -> str:
+    """Replace `target` with `src`'s content; returns how: "reflink", "hardlink" or "copy" """
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if os.path.isdir(target) and not os.path.islink(target):
+        shutil.rmtree(target)
+    tmp = f"{target}.forge-tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        if hardlink:
+            try:
+                os.link(src, tmp)
+                os.replace(tmp, target)
+                return "hardlink"
+            except OSError:
+                pass
+        how = "reflink" if reflink(src, tmp) else "copy"
+        if how == "copy":
+            shutil.copyfile(src, tmp)
+        shutil.copystat(src, tmp)   # keeps mtime, so the next sync compares by stat
+        os.replace(tmp, target)
+        return how
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def sync(repo: str, dest: str, hardlink: bool = False) -> dict:
+    """
+    Make `dest` hold exactly the workspace's exported files (all but .forge).
+    Hardlinks share inodes with the workspace: editing a synced file in
+    place would edit the workspace too, so they are opt-in. Returns counts
+    and bytes: {"copied", "linked", "unchanged", "deleted",
+    "bytes_transferred", "bytes_linked"}.
+    """
+    manifest = workspace_manifest.get_manifest(repo)
+    os.makedirs(dest, exist_ok=True)
+    existing = _dest_files(dest)
+    wanted = {name.replace("/", os.sep): (full, st) for name, full, st in archive.members(repo)}
+    stats = {"copied": 0, "linked": 0, "unchanged": 0, "deleted": 0, "bytes_transferred": 0, "bytes_linked": 0}
+
+    # Removals first: a deleted file may sit where a new directory goes, and back
+    for path in existing:
+        if path not in wanted:
+            os.remove(os.path.join(dest, path))
+            stats["deleted"] += 1
+    _prune_dirs(dest)
+
+    for path, (full, st) in wanted.items():
+        target = os.path.join(dest, path)
+        old = existing.get(path)
+        if old is not None and not os.path.islink(target) and old.st_size == st.st_size:
+            if old.st_mtime_ns == st.st_mtime_ns:
+                stats["unchanged"] += 1
+                continue
+            # Same size, other mtime (e.g. rewritten with equal content): compare hashes
+            digest = manifest.known_hash(path, st) or _hash_file(full)
+            if _hash_file(target) == digest:
+                os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+                stats["unchanged"] += 1
+                continue
+        how = _write(full, target, hardlink)
+        if how == "copy":
+            stats["copied"] += 1
+            stats["bytes_transferred"] += st.st_size
+        else:
+            stats["linked"] += 1
+            stats["bytes_linked"] += st.st_size
+    return stats
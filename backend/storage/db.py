@@ -8,16 +8,52 @@ from backend.config import settings
 
 os.makedirs(os.path.dirname(settings.DB_PATH) or ".", exist_ok=True)
 
+def _migrate_job_logs(cur):
+    """Move logs still held in job blobs (databases from before job_logs) to job_logs"""
+    for job_id, data in cur.execute("SELECT id, data FROM jobs WHERE json_extract(data, '$.logs') IS NOT NULL").fetchall():
+        j = json.loads(data)
+        cur.executemany(
+            "INSERT OR IGNORE INTO job_logs (job_id, seq, data) VALUES (?, ?, ?)",
+            [(job_id, seq, json.dumps({**entry, "seq": seq})) for seq, entry in enumerate(j.pop("logs") or [], 1)]
+        )
+        cur.execute("UPDATE jobs SET data=? WHERE id=?", (json.dumps(j), job_id))
+
 # Thread-safe database connection with lock
 _db_lock = threading.Lock()
 _conn = sqlite3.connect(settings.DB_PATH, check_same_thread=False)
 
+# Called with a job's id after each change to it (e.g. to wake its event streams)
+job_observers: list = []
+
 # Initialize tables
 with _db_lock:
     cur = _conn.cursor()
     cur.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, data TEXT)")
     cur.execute("CREATE TABLE IF NOT EXISTS kv (k TEXT PRIMARY KEY, v TEXT)")
     
+    # Job versions: bumped (from one counter across all jobs) by every change to a job, for ETags
+    if "version" not in [c[1] for c in cur.execute("PRAGMA table_info(jobs)")]:
+        cur.execute("ALTER TABLE jobs ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    
+    # Job logs: one row per entry, numbered per job, so appends and deltas don't touch the job
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS job_logs (
+            job_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (job_id, seq)
+        )
+    """)
+    _migrate_job_logs(cur)
+    
+    # Workspace directory of each job, recorded when the job starts
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS job_workspaces (
+            job_id TEXT PRIMARY KEY,
+            path TEXT NOT NULL
+        )
+    """)
+    
     # Projects: persistent workspaces for conversational iteration
     cur.execute("""
         CREATE TABLE IF NOT EXISTS projects (
@@ -43,9 +79,27 @@ with _db_lock:
         )
     """)
     
+    # Rolling summary of older conversation turns, folded incrementally
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS project_summaries (
+            project_id TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            covered_count INTEGER NOT NULL,
+            updated REAL NOT NULL,
+            FOREIGN KEY (project_id) REFERENCES projects(id)
+        )
+    """)
+    
     _conn.commit()
+    _version = cur.execute("SELECT COALESCE(MAX(version), 0) FROM jobs").fetchone()[0]
     cur.close()
 
+def _bump(cur, job_id: str) -> bool:
+    """Give a job the next version (call holding _db_lock); False if there is no such job"""
+    global _version
+    _version += 1
+    return cur.execute("UPDATE jobs SET version=? WHERE id=?", (_version, job_id)).rowcount > 0
+
 def create_job(payload: dict):
     j = {
         "id": uuid.uuid4().hex,
@@ -56,43 +110,90 @@ def create_job(payload: dict):
         "status": "queued",
         "created": time.time(),
         "report": None,
-        "logs": [],  # Real-time build process logs
         "project_id": payload.get("project_id"),  # Optional: for conversational builds
         "mode": payload.get("mode", "create"),  # 'create' or 'modify'
     }
     with _db_lock:
         cur = _conn.cursor()
         cur.execute("INSERT INTO jobs (id, data) VALUES (?, ?)", (j["id"], json.dumps(j)))
+        _bump(cur, j["id"])
         _conn.commit()
         cur.close()
-    return j
+        version = _version
+    return {**j, "version": version, "logs": []}
+
+def _update_job(job_id: str, update):
+    """Read-modify-write a job under one lock hold, so concurrent stages don't lose each other's writes"""
+    with _db_lock:
+        cur = _conn.cursor()
+        try:
+            row = cur.execute("SELECT data FROM jobs WHERE id=?", (job_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"Job {job_id} not found")
+            j = json.loads(row[0])
+            update(j)
+            cur.execute("UPDATE jobs SET data=? WHERE id=?", (json.dumps(j), job_id))
+            _bump(cur, job_id)
+            _conn.commit()
+        finally:
+            cur.close()
+    for observer in job_observers:
+        observer(job_id)
 
 def update_job_status(job_id: str, status: str, report: dict | None = None):
-    j = get_job(job_id)
-    if j is None:
-        raise ValueError(f"Job {job_id} not found")
-    j["status"] = status
-    if report is not None:
-        j["report"] = report
+    def update(j):
+        j["status"] = status
+        if report is not None:
+            j["report"] = report
+    _update_job(job_id, update)
+
+def get_job(job_id: str, since_seq: int = 0):
+    """
+    A job with its `version` and the log entries after `since_seq` (all by
+    default); only those entries are read and parsed
+    """
     with _db_lock:
         cur = _conn.cursor()
-        cur.execute("UPDATE jobs SET data=? WHERE id=?", (json.dumps(j), job_id))
-        _conn.commit()
+        row = cur.execute("SELECT data, version FROM jobs WHERE id=?", (job_id,)).fetchone()
+        logs = cur.execute(
+            "SELECT data FROM job_logs WHERE job_id=? AND seq>? ORDER BY seq", (job_id, since_seq)
+        ).fetchall() if row else []
         cur.close()
+    if not row:
+        return None
+    # One parse for all entries
+    return {**json.loads(row[0]), "version": row[1], "logs": json.loads("[" + ",".join(r[0] for r in logs) + "]")}
 
-def get_job(job_id: str):
+def get_job_version(job_id: str):
+    """A job's version (a primary-key lookup), or None if there is no such job"""
     with _db_lock:
         cur = _conn.cursor()
-        row = cur.execute("SELECT data FROM jobs WHERE id=?", (job_id,)).fetchone()
+        row = cur.execute("SELECT version FROM jobs WHERE id=?", (job_id,)).fetchone()
         cur.close()
-    return json.loads(row[0]) if row else None
+    return row[0] if row else None
 
-def list_jobs():
+def jobs_version() -> str:
+    """Changes whenever any job is created or changed"""
     with _db_lock:
         cur = _conn.cursor()
-        rows = cur.execute("SELECT data FROM jobs ORDER BY json_extract(data,'$.created') DESC").fetchall()
+        count, version = cur.execute("SELECT COUNT(*), COALESCE(MAX(version), 0) FROM jobs").fetchone()
         cur.close()
-    return [json.loads(r[0]) for r in rows]
+    return f"{count}-{version}"
+
+def list_jobs(include_logs: bool = True):
+    with _db_lock:
+        cur = _conn.cursor()
+        rows = cur.execute("SELECT id, data, version FROM jobs ORDER BY json_extract(data,'$.created') DESC").fetchall()
+        logs = {}
+        if include_logs:
+            for job_id, data in cur.execute("SELECT job_id, data FROM job_logs ORDER BY job_id, seq"):
+                logs.setdefault(job_id, []).append(json.loads(data))
+        cur.close()
+    jobs = [{**json.loads(data), "version": version} for _, data, version in rows]
+    if include_logs:
+        for job in jobs:
+            job["logs"] = logs.get(job["id"], [])
+    return jobs
 
 def set_runtime_provider(provider: str):
     with _db_lock:
@@ -110,25 +211,32 @@ def get_runtime_provider():
 
 def append_job_log(job_id: str, log_type: str, content: str | dict):
     """Append a log entry to the job's logs array for real-time visibility"""
-    j = get_job(job_id)
-    if j is None:
-        raise ValueError(f"Job {job_id} not found")
-    
-    if "logs" not in j:
-        j["logs"] = []
-    
     log_entry = {
         "timestamp": time.time(),
         "type": log_type,  # 'plan', 'file', 'test', 'output', 'error'
         "content": content
     }
-    j["logs"].append(log_entry)
-    
     with _db_lock:
         cur = _conn.cursor()
-        cur.execute("UPDATE jobs SET data=? WHERE id=?", (json.dumps(j), job_id))
-        _conn.commit()
-        cur.close()
+        try:
+            if not _bump(cur, job_id):
+                raise ValueError(f"Job {job_id} not found")
+            # Per-job sequence, the entry's SSE event id and since_seq cursor
+            log_entry["seq"] = cur.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM job_logs WHERE job_id=?", (job_id,)
+            ).fetchone()[0]
+            cur.execute(
+                "INSERT INTO job_logs (job_id, seq, data) VALUES (?, ?, ?)",
+                (job_id, log_entry["seq"], json.dumps(log_entry))
+            )
+            _conn.commit()
+        except BaseException:
+            _conn.rollback()
+            raise
+        finally:
+            cur.close()
+    for observer in job_observers:
+        observer(job_id)
 
 # Thread-safe execute helpers for external modules
 def execute_query(query: str, params: tuple = ()):
@@ -155,6 +263,40 @@ def execute_update(query: str, params: tuple = ()):
         _conn.commit()
         cur.close()
 
+# ============== Job Workspaces ==============
+
+def set_job_workspace(job_id: str, workspace_path: str):
+    """Record the workspace a job builds in (also shown on the job)"""
+    with _db_lock:
+        cur = _conn.cursor()
+        cur.execute("""
+            INSERT INTO job_workspaces (job_id, path) VALUES (?, ?)
+            ON CONFLICT(job_id) DO UPDATE SET path = excluded.path
+        """, (job_id, workspace_path))
+        _conn.commit()
+        cur.close()
+    _update_job(job_id, lambda j: j.update(workspace_path=workspace_path))
+
+def get_job_workspace(job_id: str):
+    """Recorded workspace path of a job (primary-key lookup), or None"""
+    with _db_lock:
+        cur = _conn.cursor()
+        row = cur.execute("SELECT path FROM job_workspaces WHERE job_id = ?", (job_id,)).fetchone()
+        cur.close()
+    return row[0] if row else None
+
+def running_jobs_in_workspace(workspace_path: str) -> list[str]:
+    """Ids of running jobs recorded as building in `workspace_path` (a project's jobs share one)"""
+    paths = sorted({workspace_path, os.path.abspath(workspace_path), os.path.realpath(workspace_path)})
+    with _db_lock:
+        cur = _conn.cursor()
+        rows = cur.execute(f"""
+            SELECT w.job_id FROM job_workspaces w JOIN jobs j ON j.id = w.job_id
+            WHERE w.path IN ({",".join("?" * len(paths))}) AND json_extract(j.data, '$.status') = 'running'
+        """, paths).fetchall()
+        cur.close()
+    return [r[0] for r in rows]
+
 # ============== Project Management ==============
 
 def create_project(name: str, description: str = ""):
@@ -238,6 +380,7 @@ def delete_project(project_id: str):
     with _db_lock:
         cur = _conn.cursor()
         cur.execute("DELETE FROM messages WHERE project_id = ?", (project_id,))
+        cur.execute("DELETE FROM project_summaries WHERE project_id = ?", (project_id,))
         cur.execute("DELETE FROM projects WHERE id = ?", (project_id,))
         _conn.commit()
         cur.close()
@@ -290,3 +433,41 @@ def get_messages(project_id: str):
         "timestamp": row[4],
         "job_id": row[5]
     } for row in rows]
+
+# ============== Conversation Summaries ==============
+
+def get_project_summary(project_id: str):
+    """Get the rolling conversation summary for a project, if any"""
+    with _db_lock:
+        cur = _conn.cursor()
+        row = cur.execute("""
+            SELECT summary, covered_count, updated
+            FROM project_summaries WHERE project_id = ?
+        """, (project_id,)).fetchone()
+        cur.close()
+    
+    if not row:
+        return None
+    
+    return {
+        "project_id": project_id,
+        "summary": row[0],
+        "covered_count": row[1],
+        "updated": row[2]
+    }
+
+def save_project_summary(project_id: str, summary: str, covered_count: int):
+    """Store the rolling summary covering the first `covered_count` messages"""
+    now = time.time()
+    with _db_lock:
+        cur = _conn.cursor()
+        cur.execute("""
+            INSERT INTO project_summaries (project_id, summary, covered_count, updated)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(project_id) DO UPDATE SET
+                summary = excluded.summary,
+                covered_count = excluded.covered_count,
+                updated = excluded.updated
+        """, (project_id, summary, covered_count, now))
+        _conn.commit()
+        cur.close()
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Keep the test database, encryption key and workspaces out of the real data dir
+os.environ.setdefault("FORGE_DATA_DIR", tempfile.mkdtemp(prefix="forge-tests-"))
@@ -0,0 +1,47 @@
+import json
+from backend.config import settings
+from backend.storage.db import add_message, create_project, get_project_summary
+from backend.services.conversation_summary import build_conversation_context
+
+
+def _configure(monkeypatch, tmp_path, calls):
+    script = tmp_path / "summarizer.jsonl"
+    script.write_text(json.dumps({"stage": "summarizer", "response": "ROLLING SUMMARY"}))
+    monkeypatch.setattr(settings, "LLM_ROUTES", {"summarizer": {"provider": "REPLAY"}})
+    monkeypatch.setattr(settings, "REPLAY_TRANSCRIPT", str(script))
+    monkeypatch.setattr(settings, "CONVERSATION_RECENT_MESSAGES", 2)
+    monkeypatch.setattr(settings, "CONVERSATION_SUMMARY_BATCH", 3)
+
+    import backend.services.conversation_summary as cs
+    fold = cs.fold_messages
+
+    def counting_fold(summary, messages):
+        calls.append(len(messages))
+        return fold(summary, messages)
+
+    monkeypatch.setattr(cs, "fold_messages", counting_fold)
+
+
+def test_history_is_folded_in_batches(monkeypatch, tmp_path):
+    calls = []
+    _configure(monkeypatch, tmp_path, calls)
+    project = create_project("summary test")
+    for i in range(4):
+        add_message(project["id"], "user", f"request {i}")
+
+    # 2 older messages pending: below the batch size, everything stays verbatim
+    context = build_conversation_context(project["id"])
+    assert calls == [] and "request 0" in context
+
+    add_message(project["id"], "user", "request 4")
+    context = build_conversation_context(project["id"])
+    assert calls == [3]
+    assert "ROLLING SUMMARY" in context
+    assert "request 0" not in context and "request 4" in context
+    assert get_project_summary(project["id"])["covered_count"] == 3
+
+    # Only messages newer than the summary are folded next time
+    for i in range(5, 8):
+        add_message(project["id"], "user", f"request {i}")
+    build_conversation_context(project["id"])
+    assert calls == [3, 3]
@@ -0,0 +1,102 @@
+import pytest
+from backend.config import settings
+from backend.services import evaluator
+from backend.services.pytest_plugins import forge_sandbox
+
+
+def _write(root, rel, text):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_balance_shards_uses_history():
+    history = {"t::a": 4.0, "t::b": 3.0, "t::c": 2.0, "t::d": 1.0}
+    shards = evaluator.balance_shards(list(history), history, 2)
+    totals = sorted(sum(history[t] for t in shard) for shard in shards)
+    assert totals == [5.0, 5.0]
+
+
+def test_hung_shard_is_killed_alone(tmp_path, monkeypatch):
+    _write(tmp_path, "tests/test_fast.py", "def test_one():\n    pass\n\ndef test_two():\n    pass\n")
+    _write(tmp_path, "tests/test_hang.py", "import time\n\ndef test_hang():\n    time.sleep(60)\n")
+    # Record durations that make the suite worth sharding
+    _write(tmp_path, evaluator.DURATIONS_PATH,
+           '{"tests/test_hang.py::test_hang": 60, "tests/test_fast.py::test_one": 0.1, "tests/test_fast.py::test_two": 0.1}')
+    monkeypatch.setattr(settings, "TEST_SHARD_WORKERS", 2)
+    monkeypatch.setattr(settings, "TEST_SHARD_MIN_SECONDS", 1)
+    monkeypatch.setattr(settings, "TEST_TIMEOUT", 5)
+
+    ok, report = evaluator.run(str(tmp_path))
+    assert not ok
+    assert sorted(s["timed_out"] for s in report["shards"]) == [False, True]
+    assert "2 passed" in report["stdout"]
+    assert evaluator.load_durations(str(tmp_path))["tests/test_fast.py::test_one"] < 1
+
+
+def test_fixer_gets_failures_with_source(tmp_path):
+    _write(tmp_path, "calc.py", "def add(a, b):\n    return a - b\n")
+    _write(tmp_path, "tests/test_calc.py",
+           "from calc import add\n\ndef test_add():\n    assert add(2, 2) == 4\n\ndef test_ok():\n    pass\n")
+
+    ok, report = evaluator.run(str(tmp_path))
+    assert not ok
+    assert report["summary"] == {"failed": 1, "passed": 1}
+    [failure] = report["tests"]
+    assert failure["nodeid"] == "tests/test_calc.py::test_add"
+    assert any(f["path"] == "tests/test_calc.py" for f in failure["frames"])
+
+    text = evaluator.format_failures_for_fixer(report, str(tmp_path))
+    assert "tests/test_calc.py::test_add" in text
+    assert "assert 0 == 4" in text
+    assert "test_calc.py::test_ok" not in text
+    assert ">     assert add(2, 2) == 4" in text
+
+
+def test_fixer_falls_back_to_raw_output():
+    report = {"stdout": "x" * 10000 + "TAIL", "stderr": "", "timed_out": True}
+    text = evaluator.format_failures_for_fixer(report, "/nonexistent")
+    assert "TAIL" in text and len(text) < 5000
+    assert "killed after" in text
+
+
+@pytest.mark.skipif(not forge_sandbox.supported(), reason="rlimits are POSIX only")
+@pytest.mark.parametrize("pool_size", [1, 0])
+def test_cpu_limit_kills_run_and_reports_usage(tmp_path, monkeypatch, pool_size):
+    _write(tmp_path, "tests/test_spin.py", "def test_spin():\n    while True:\n        pass\n")
+    monkeypatch.setattr(settings, "TEST_POOL_SIZE", pool_size)
+    monkeypatch.setattr(settings, "TEST_CPU_SECONDS", 1)
+    monkeypatch.setattr(settings, "TEST_TIMEOUT", 30)
+
+    ok, report = evaluator.run(str(tmp_path))
+    assert not ok
+    assert report["usage"]["limit_hit"] == "cpu"
+    assert report["usage"]["cpu_seconds"] >= 0.9
+    assert report["usage"]["wall_seconds"] < 15
+    assert "CPU limit" in evaluator.format_failures_for_fixer(report, str(tmp_path))
+
+
+@pytest.mark.skipif(not forge_sandbox.supported(), reason="rlimits are POSIX only")
+def test_memory_limit_fails_the_test(tmp_path, monkeypatch):
+    _write(tmp_path, "tests/test_big.py", "def test_big():\n    data = bytearray(2 * 1024 ** 3)\n")
+    monkeypatch.setattr(settings, "TEST_MEMORY_MB", 1024)
+
+    ok, report = evaluator.run(str(tmp_path))
+    assert not ok
+    assert report["usage"]["limit_hit"] == "memory"
+    assert report["summary"] == {"failed": 1}
+
+
+@pytest.mark.skipif(not forge_sandbox.supported(), reason="rlimits are POSIX only")
+def test_limit_words_in_test_output_are_not_limits(tmp_path, monkeypatch):
+    _write(tmp_path, "tests/test_noisy.py", (
+        "def test_noisy():\n"
+        "    print('MemoryError: Resource temporarily unavailable (killed)')\n"
+        "    assert False\n"
+    ))
+    monkeypatch.setattr(settings, "TEST_MEMORY_MB", 1024)
+    monkeypatch.setattr(settings, "TEST_MAX_PROCESSES", 10_000)
+
+    ok, report = evaluator.run(str(tmp_path))
+    assert not ok and report["summary"] == {"failed": 1}
+    assert "limit_hit" not in report["usage"]
@@ -0,0 +1,71 @@
+import io
+import os
+import tarfile
+import zipfile
+
+from fastapi.testclient import TestClient
+
+from backend.app import app
+from backend.config import settings
+from backend.services import archive, repo_scaffold, workspace_manifest
+from backend.storage.db import create_job
+
+
+def test_archives_stream_and_are_cached_by_content(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "WORKSPACE_ROOT", str(tmp_path))
+    monkeypatch.setattr(archive, "CHUNK", 1024)
+    job = create_job({"project_name": "export", "spec": "x"})
+    repo = repo_scaffold.create_workspace(job)
+    big = os.urandom(50_000)
+    workspace_manifest.apply(repo, {"main.py": "print(1)\n", "pkg/big.bin": big})
+    client = TestClient(app)
+
+    first = client.get(f"/export/{job['id']}/zip")
+    assert first.status_code == 200 and 'filename="export.zip"' in first.headers["content-disposition"]
+    assert "content-length" not in first.headers  # streamed
+    with zipfile.ZipFile(io.BytesIO(first.content)) as zf:
+        assert "main.py" in zf.namelist() and ".forge/manifest.json" not in zf.namelist()
+        assert zf.read("pkg/big.bin") == big
+    assert len(os.listdir(os.path.join(repo, archive.EXPORTS_DIR))) == 1
+
+    again = client.get(f"/export/{job['id']}/zip")
+    assert again.content == first.content and again.headers["content-length"] == str(len(first.content))
+
+    for fmt, mode in (("tar.gz", "r:gz"), ("tar", "r:")):
+        response = client.get(f"/export/{job['id']}/archive", params={"format": fmt})
+        with tarfile.open(fileobj=io.BytesIO(response.content), mode=mode) as tar:
+            assert sorted(tar.getnames()) == sorted(n for n in zipfile.ZipFile(io.BytesIO(first.content)).namelist())
+            assert tar.extractfile("pkg/big.bin").read() == big
+
+    # A change makes a new archive, which replaces the old one in the cache
+    workspace_manifest.apply(repo, {"main.py": "print(2)\n"})
+    changed = client.get(f"/export/{job['id']}/zip")
+    assert zipfile.ZipFile(io.BytesIO(changed.content)).read("main.py") == b"print(2)\n"
+    assert len([n for n in os.listdir(os.path.join(repo, archive.EXPORTS_DIR)) if n.endswith(".zip")]) == 1
+
+    assert client.get(f"/export/{job['id']}/archive", params={"format": "rar"}).status_code == 400
+
+
+def test_copy_syncs_only_changed_files(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "WORKSPACE_ROOT", str(tmp_path / "workspaces"))
+    job = create_job({"project_name": "sync", "spec": "x"})
+    repo = repo_scaffold.create_workspace(job)
+    workspace_manifest.apply(repo, {"main.py": "print(1)\n", "pkg/util.py": "x = 1\n", "pkg/data.txt": "a" * 1000})
+    dest = tmp_path / "out"
+    client = TestClient(app)
+    url = f"/export/{job['id']}/copy"
+
+    first = client.post(url, params={"destination": str(dest)}).json()
+    assert first["stats"]["copied"] + first["stats"]["linked"] == 3
+    assert (dest / "pkg" / "data.txt").read_text() == "a" * 1000 and not (dest / ".forge").exists()
+
+    (dest / "stale.txt").write_text("left over\n")
+    workspace_manifest.apply(repo, {"main.py": "print(2)\n", "pkg/util.py": None})
+    second = client.post(url, params={"destination": str(dest)}).json()
+    assert second["stats"]["unchanged"] == 1 and second["stats"]["deleted"] == 2
+    assert second["stats"]["bytes_transferred"] + second["stats"]["bytes_linked"] == len("print(2)\n")
+    assert sorted(p.relative_to(dest).as_posix() for p in dest.rglob("*") if p.is_file()) == ["main.py", "pkg/data.txt"]
+    assert (dest / "main.py").read_text() == "print(2)\n"
+
+    assert client.post(url, params={"destination": str(dest)}).json()["bytes_transferred"] == 0
+    assert client.post(url, params={"destination": os.path.join(repo, "sub")}).status_code == 400
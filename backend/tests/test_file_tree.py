@@ -0,0 +1,98 @@
+from fastapi.testclient import TestClient
+
+from backend.app import app
+from backend.config import settings
+from backend.services import file_tree, repo_scaffold, workspace_manifest
+from backend.storage.db import create_job
+
+
+def test_listing_is_cached_until_the_write_path_changes_it(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "FILE_TREE_TTL", 3600)
+    walks = []
+    walk = file_tree.walk
+    monkeypatch.setattr(file_tree, "walk", lambda root: walks.append(root) or walk(root))
+    workspace_manifest.apply(str(tmp_path), {"app.py": "x = 1\n"})
+
+    files, etag = file_tree.listing(str(tmp_path))
+    assert [f["path"] for f in files] == ["app.py"]
+    assert file_tree.listing(str(tmp_path)) == (files, etag)
+    assert len(walks) == 1
+
+    workspace_manifest.apply(str(tmp_path), {"tests/test_app.py": "def test(): pass\n"})
+    files, new_etag = file_tree.listing(str(tmp_path))
+    assert [f["path"] for f in files] == ["app.py", "tests/test_app.py"]
+    assert new_etag != etag and len(walks) == 2
+
+
+def test_files_endpoint_answers_304_for_a_matching_etag(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "WORKSPACE_ROOT", str(tmp_path))
+    job = create_job({"project_name": "etag", "spec": "x"})
+    repo = repo_scaffold.create_workspace(job)
+    workspace_manifest.apply(repo, {"main.py": "print(1)\n", ".forge/state": "hidden\n"})
+
+    client = TestClient(app)
+    first = client.get(f"/workspace/{job['id']}/files")
+    assert first.status_code == 200
+    assert [f["path"] for f in first.json()["files"]] == ["main.py"]
+    etag = first.headers["etag"]
+
+    cached = client.get(f"/workspace/{job['id']}/files", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.headers["etag"] == etag
+
+    workspace_manifest.apply(repo, {"main.py": "print(2)\nprint(3)\n"})
+    changed = client.get(f"/workspace/{job['id']}/files", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+
+def test_raw_endpoint_streams_ranges_and_binary(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "WORKSPACE_ROOT", str(tmp_path))
+    monkeypatch.setattr(settings, "FILE_VIEW_MAX_BYTES", 100)
+    job = create_job({"project_name": "raw", "spec": "x"})
+    repo = repo_scaffold.create_workspace(job)
+    data = bytes(range(256)) * 4
+    with open(f"{repo}/data.bin", "wb") as f:
+        f.write(data)
+    client = TestClient(app)
+    url = f"/workspace/{job['id']}/raw/data.bin"
+
+    full = client.get(url)
+    assert full.status_code == 200 and full.content == data
+    assert full.headers["last-modified"] and full.headers["content-security-policy"] == "sandbox"
+
+    part = client.get(url, headers={"Range": "bytes=10-19"})
+    assert part.status_code == 206
+    assert part.content == data[10:20]
+    assert part.headers["content-range"] == f"bytes 10-19/{len(data)}"
+
+    assert client.get(url, headers={"If-None-Match": full.headers["etag"]}).status_code == 304
+    # The JSON endpoint is only for small text files
+    assert client.get(f"/workspace/{job['id']}/files/data.bin").status_code == 413
+    assert client.get(f"/workspace/{job['id']}/raw/..%2F..%2Fetc%2Fpasswd").status_code in (403, 404)
+
+
+def test_batch_endpoint_streams_ndjson_and_skips_known_files(monkeypatch, tmp_path):
+    import json
+
+    monkeypatch.setattr(settings, "WORKSPACE_ROOT", str(tmp_path))
+    job = create_job({"project_name": "batch", "spec": "x"})
+    repo = repo_scaffold.create_workspace(job)
+    workspace_manifest.apply(repo, {"src/a.py": "a = 1\n", "src/b.py": "b = 2\n", "README.md": "hi\n"})
+    with open(f"{repo}/logo.bin", "wb") as f:
+        f.write(b"\x89PNG\x00\xff")
+    client = TestClient(app)
+    url = f"/workspace/{job['id']}/batch"
+
+    response = client.post(url, json={"paths": ["README.md", "logo.bin", "../outside", "missing.py"], "glob": "src/*.py"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = {line["path"]: line for line in map(json.loads, response.text.splitlines())}
+    assert list(lines) == ["README.md", "logo.bin", "../outside", "missing.py", "src/a.py", "src/b.py"]
+    assert lines["src/a.py"]["content"] == "a = 1\n"
+    assert lines["logo.bin"]["encoding"] == "base64"
+    assert lines["../outside"]["error"] == "Access denied"
+    assert lines["missing.py"]["error"] == "File not found"
+
+    known = {"src/a.py": lines["src/a.py"]["hash"], "logo.bin": lines["logo.bin"]["hash"]}
+    again = [json.loads(line) for line in client.post(url, json={"glob": "*", "known": known}).text.splitlines()]
+    unchanged = {line["path"] for line in again if line.get("unchanged")}
+    assert unchanged == {"src/a.py", "logo.bin"}
+    assert all("content" in line for line in again if line["path"] not in unchanged)
@@ -0,0 +1,54 @@
+import json
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from backend.app import app
+from backend.storage.db import append_job_log, create_job, update_job_status
+
+
+def _events(text: str) -> list[tuple[str | None, str, dict]]:
+    """(id, event, data) of each SSE message"""
+    events = []
+    for message in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.splitlines() if not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields.get("id"), fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_events_stream_logs_and_resume_from_last_event_id():
+    job = create_job({"project_name": "sse", "spec": "x"})
+    for i in range(3):
+        append_job_log(job["id"], "status", f"step {i}")
+    update_job_status(job["id"], "succeeded", {"ok": True})
+    client = TestClient(app)
+
+    events = _events(client.get(f"/jobs/{job['id']}/events").text)
+    assert [e[1] for e in events] == ["job", "log", "log", "log", "end"]
+    assert events[0][2]["status"] == "succeeded" and "logs" not in events[0][2]
+    assert [(e[0], e[2]["content"]) for e in events[1:4]] == [("1", "step 0"), ("2", "step 1"), ("3", "step 2")]
+
+    resumed = _events(client.get(f"/jobs/{job['id']}/events", headers={"Last-Event-ID": "2"}).text)
+    assert [(e[1], e[0]) for e in resumed] == [("job", "2"), ("log", "3"), ("end", "3")]
+    assert client.get("/jobs/missing/events").status_code == 404
+
+
+def test_events_are_pushed_as_they_happen():
+    job = create_job({"project_name": "sse-live", "spec": "x"})
+    update_job_status(job["id"], "running")
+
+    def work():
+        time.sleep(0.2)
+        append_job_log(job["id"], "status", "working")
+        update_job_status(job["id"], "failed", {"error": "boom"})
+
+    threading.Thread(target=work).start()
+    start = time.monotonic()
+    with TestClient(app).stream("GET", f"/jobs/{job['id']}/events") as response:
+        events = _events("".join(response.iter_text()))
+    # Woken by the writes, well before the 2 s recheck
+    assert time.monotonic() - start < 1.5
+    assert [e[1] for e in events] == ["job", "log", "job", "end"]
+    assert events[2][2]["status"] == "failed" and events[1][2]["content"] == "working"
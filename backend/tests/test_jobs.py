@@ -0,0 +1,49 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from backend.app import app
+from backend.storage import db
+from backend.storage.db import append_job_log, create_job, get_job, update_job_status
+
+
+def test_job_endpoints_return_log_deltas_and_304_while_unchanged():
+    job = create_job({"project_name": "delta", "spec": "x"})
+    for i in range(3):
+        append_job_log(job["id"], "status", f"step {i}")
+    client = TestClient(app)
+    url = f"/jobs/{job['id']}"
+
+    full = client.get(url)
+    assert [e["seq"] for e in full.json()["logs"]] == [1, 2, 3]
+    etag = full.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert [e["content"] for e in client.get(url, params={"since_seq": 2}).json()["logs"]] == ["step 2"]
+
+    listing = client.get("/jobs", params={"logs": "false"})
+    assert "logs" not in listing.json()[0]
+    assert client.get("/jobs", params={"logs": "false"}, headers={"If-None-Match": listing.headers["etag"]}).status_code == 304
+
+    append_job_log(job["id"], "status", "step 3")
+    changed = client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert client.get("/jobs", params={"logs": "false"}, headers={"If-None-Match": listing.headers["etag"]}).status_code == 200
+
+    update_job_status(job["id"], "succeeded")
+    assert client.get(url, headers={"If-None-Match": changed.headers["etag"]}).status_code == 200
+
+
+def test_logs_held_in_old_job_blobs_move_to_job_logs():
+    legacy = {"id": "legacy-job", "project_name": "old", "spec": "x", "status": "succeeded", "created": 0,
+              "logs": [{"timestamp": 1, "type": "status", "content": "a"}, {"timestamp": 2, "type": "plan", "content": "b"}]}
+    with db._db_lock:
+        cur = db._conn.cursor()
+        cur.execute("INSERT INTO jobs (id, data) VALUES (?, ?)", (legacy["id"], json.dumps(legacy)))
+        db._migrate_job_logs(cur)
+        db._conn.commit()
+        cur.close()
+
+    job = get_job("legacy-job")
+    assert [(e["seq"], e["content"]) for e in job["logs"]] == [(1, "a"), (2, "b")]
+    append_job_log("legacy-job", "status", "c")
+    assert [e["seq"] for e in get_job("legacy-job", since_seq=2)["logs"]] == [3]
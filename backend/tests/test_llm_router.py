@@ -0,0 +1,63 @@
+import json
+from backend.config import settings
+from backend.providers import replay
+from backend.services.llm_router import get_llm, get_route
+
+ROUTES = {
+    "planner": {"provider": "REPLAY", "model": "small", "max_tokens": 512, "temperature": 0.0},
+    "fixer": {
+        "provider": "REPLAY",
+        "model": "small",
+        "escalate_after": 2,
+        "escalate": {"model": "large", "max_tokens": 4096},
+    },
+}
+
+
+def test_stage_rule_configures_provider(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_ROUTES", ROUTES)
+    llm = get_llm("planner")
+    assert (llm.stage, llm.model, llm.temperature) == ("planner", "small", 0.0)
+    assert llm.reply_tokens(2048) == 512
+
+
+def test_escalation_after_repeated_failures(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_ROUTES", ROUTES)
+    assert get_route("fixer", attempt=1)["model"] == "small"
+    escalated = get_route("fixer", attempt=2)
+    assert escalated["model"] == "large"
+    assert escalated["max_tokens"] == 4096
+    assert get_route("coder") == {}
+
+
+def test_replay_queues_advance_across_get_llm_calls(monkeypatch, tmp_path):
+    script = tmp_path / "script.jsonl"
+    script.write_text(json.dumps({"match": "plan", "responses": ["first", "second", "third"]}) + "\n")
+    monkeypatch.setattr(settings, "LLM_ROUTES", {"architect": {"provider": "REPLAY"}})
+    monkeypatch.setattr(settings, "REPLAY_TRANSCRIPT", str(script))
+
+    calls = [get_llm("architect").complete(system="plan", user="x", max_tokens=1) for _ in range(4)]
+    assert calls == ["first", "second", "third", "third"]
+
+    replay.reset(str(script))
+    assert get_llm("architect").complete(system="plan", user="x", max_tokens=1) == "first"
+
+
+def test_fixer_iterations_escalate_and_advance_under_replay(monkeypatch, tmp_path):
+    script = tmp_path / "script.jsonl"
+    script.write_text("\n".join(json.dumps(e) for e in [
+        {"stage": "fixer", "match": "maintainer", "responses": ["fix 1", "fix 2", "fix 3"]},
+        {"stage": "planner", "response": "plan"},
+    ]))
+    monkeypatch.setattr(settings, "LLM_ROUTES", ROUTES)
+    monkeypatch.setattr(settings, "REPLAY_TRANSCRIPT", str(script))
+
+    # As build_stages does: one get_llm per fix iteration, attempt = iteration
+    seen = []
+    for iteration in range(3):
+        llm = get_llm("fixer", attempt=iteration)
+        seen.append((llm.model, llm.reply_tokens(8192), "".join(llm.stream(system="senior maintainer", user="x", max_tokens=1))))
+    assert [s[0] for s in seen] == ["small", "small", "large"]
+    assert seen[2][1] == 4096
+    assert [s[2] for s in seen] == ["fix 1", "fix 2", "fix 3"]
+    assert get_llm("planner").complete(system="senior maintainer", user="x", max_tokens=1) == "plan"
@@ -0,0 +1,114 @@
+from backend.services import patcher
+from backend.services.fenced import apply_fenced, apply_stream
+
+SOURCE = "import os\n\n\ndef add(a, b):\n    return a + b\n\n\ndef mul(a, b):\n    return a + b\n\n\ndef sub(a, b):\n    return a - b\n"
+
+
+def _write(root, rel, text):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_diff_fence_with_wrong_line_numbers_and_drifted_whitespace(tmp_path):
+    _write(tmp_path, "calc.py", SOURCE)
+    reply = (
+        "Fixed mul:\n```diff\n--- a/calc.py\n+++ b/calc.py\n"
+        "@@ -40,4 +40,4 @@\n"
+        " def mul(a,  b):\n-    return a + b\n+    return a * b\n\n\n"
+        "```\n"
+    )
+    conflicts = []
+    assert apply_fenced(str(tmp_path), reply, conflicts) == ["calc.py"]
+    assert conflicts == []
+    assert (tmp_path / "calc.py").read_text() == SOURCE.replace("return a + b\n\n\ndef sub", "return a * b\n\n\ndef sub")
+
+
+def test_hunks_without_ranges_fuzz_and_new_files(tmp_path):
+    _write(tmp_path, "calc.py", SOURCE)
+    diff = (
+        "--- a/calc.py\n+++ b/calc.py\n@@\n"
+        " this context line was hallucinated\n def sub(a, b):\n     return a - b\n+\n+\n+def neg(a):\n+    return -a\n"
+        "--- /dev/null\n+++ b/tests/test_neg.py\n@@ -0,0 +1,2 @@\n+def test_neg():\n+    pass\n"
+    )
+    conflicts = []
+    edits = patcher.apply_patch(str(tmp_path), diff, conflicts)
+    assert sorted(edits) == ["calc.py", "tests/test_neg.py"]
+    assert apply_fenced(str(tmp_path), f"```diff\n{diff}```\n") == ["calc.py", "tests/test_neg.py"]
+    assert conflicts == []
+    assert (tmp_path / "calc.py").read_text().endswith("return a - b\n\n\ndef neg(a):\n    return -a\n")
+    assert (tmp_path / "tests/test_neg.py").read_text() == "def test_neg():\n    pass\n"
+
+
+def test_unplaceable_hunk_is_reported_and_others_apply(tmp_path):
+    _write(tmp_path, "calc.py", SOURCE)
+    diff = (
+        "--- a/calc.py\n+++ b/calc.py\n"
+        "@@ -1,1 +1,2 @@\n import os\n+import sys\n"
+        "@@ -20,3 +21,3 @@\n def div(a, b):\n-    return a // b\n+    return a / b\n"
+    )
+    conflicts = []
+    assert apply_fenced(str(tmp_path), f"```diff\n{diff}```\n", conflicts) == ["calc.py"]
+    assert (tmp_path / "calc.py").read_text().startswith("import os\nimport sys\n")
+    assert [(c["path"], c["reason"]) for c in conflicts] == [("calc.py", "context not found")]
+    assert "def div(a, b):" in patcher.format_conflicts(conflicts)
+
+
+def test_whole_file_fences_still_work(tmp_path):
+    assert apply_fenced(str(tmp_path), "```app.py\nprint('hi')\n```\n```\nno filename\n```") == ["app.py"]
+    assert (tmp_path / "app.py").read_text() == "print('hi')\n"
+
+
+def test_stream_writes_each_block_as_it_closes(tmp_path):
+    _write(tmp_path, "calc.py", SOURCE)
+    reply = (
+        "```app.py\nprint('hi')\n```\n"
+        "```diff\n--- a/calc.py\n+++ b/calc.py\n@@\n def mul(a, b):\n-    return a + b\n+    return a * b\n```\n"
+        "```cut.py\nx = 1\n"
+    )
+    landed = []
+
+    def fragments():
+        for ch in reply:
+            yield ch
+            if ch == "`" and (tmp_path / "app.py").exists() and not landed:
+                landed.append("before end")
+
+    conflicts = []
+    seen = []
+    changed = apply_stream(str(tmp_path), fragments(), conflicts, on_files=seen.append)
+    assert landed == ["before end"]
+    assert seen == [["app.py"], ["calc.py"]]
+    assert changed == ["app.py", "calc.py"]
+    assert "return a * b" in (tmp_path / "calc.py").read_text()
+    # The cut-off block is reported, not written
+    assert not (tmp_path / "cut.py").exists()
+    assert [c["path"] for c in conflicts] == ["cut.py"]
+    assert "not closed" in conflicts[0]["reason"]
+
+
+def test_unsafe_diff_paths_are_rejected_when_parsed(tmp_path):
+    repo = tmp_path / "repo"
+    _write(repo, "calc.py", SOURCE)
+    _write(tmp_path, "victim.txt", "keep me\n")
+    diff = (
+        "--- a/../victim.txt\n+++ /dev/null\n"
+        f"--- {tmp_path / 'victim.txt'}\n+++ /dev/null\n"
+        "--- /dev/null\n+++ b/.forge/manifest.json\n@@ -0,0 +1 @@\n+{}\n"
+    )
+    assert [p["rejected"] for p in patcher.parse(diff)] == ["../victim.txt", str(tmp_path / "victim.txt"), ".forge/manifest.json"]
+    conflicts = []
+    assert patcher.apply_patch(str(repo), diff, conflicts) == {}
+    assert len(conflicts) == 3 and (tmp_path / "victim.txt").read_text() == "keep me\n"
+
+
+def test_line_endings_and_missing_final_newline_are_kept(tmp_path):
+    (tmp_path / "crlf.txt").write_bytes(b"one\r\ntwo\r\nthree")
+    (tmp_path / "lf.txt").write_bytes(b"a\nb\fc\nd\n")
+    diff = (
+        "--- a/crlf.txt\n+++ b/crlf.txt\n@@ -1,3 +1,3 @@\n one\n-two\n+TWO\n three\n"
+        "--- a/lf.txt\n+++ b/lf.txt\n@@ -1,3 +1,3 @@\n a\n b\fc\n-d\n+D\n"
+    )
+    assert apply_fenced(str(tmp_path), f"```diff\n{diff}```") == ["crlf.txt", "lf.txt"]
+    assert (tmp_path / "crlf.txt").read_bytes() == b"one\r\nTWO\r\nthree"
+    assert (tmp_path / "lf.txt").read_bytes() == b"a\nb\fc\nD\n"
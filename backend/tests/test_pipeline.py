@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+
+from backend.config import settings
+from backend.services import workspace_manifest
+from backend.services.build_stages import BuildRun
+from backend.services.pipeline import Cancelled, Pipeline, Stage
+
+
+def test_independent_stages_run_concurrently_and_outputs_flow():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def branch(name):
+        def fn(seed):
+            barrier.wait()  # deadlocks (times out) unless both branches run at once
+            return {name: seed + 1}
+        return fn
+
+    pipeline = Pipeline([
+        Stage("join", lambda a, b: {"total": a + b}, inputs=("a", "b"), outputs=("total",)),
+        Stage("a", branch("a"), inputs=("seed",), outputs=("a",)),
+        Stage("b", branch("b"), inputs=("seed",), outputs=("b",)),
+    ])
+    assert pipeline.run({"seed": 1})["total"] == 4
+    assert [r["stage"] for r in pipeline.records][-1] == "join"
+    assert all(r["status"] == "ok" and r["attempts"] == 1 for r in pipeline.records)
+
+
+def test_skipped_stage_yields_none_and_retries_are_recorded():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 2:
+            raise RuntimeError("transient")
+        return {"x": 1}
+
+    pipeline = Pipeline([
+        Stage("flaky", flaky, outputs=("x",), retries=1),
+        Stage("skip", lambda x: {"y": 2}, inputs=("x",), outputs=("y",), when=lambda x: x > 1),
+        Stage("after", lambda y: {"z": y is None}, inputs=("y",), outputs=("z",)),
+    ])
+    state = pipeline.run()
+    assert state["y"] is None and state["z"] is True
+    statuses = {r["stage"]: (r["status"], r["attempts"]) for r in pipeline.records}
+    assert statuses == {"flaky": ("ok", 2), "skip": ("skipped", 0), "after": ("ok", 1)}
+
+
+def test_failure_cancels_stages_not_yet_started():
+    ran = []
+    pipeline = Pipeline([
+        Stage("boom", lambda: 1 / 0, outputs=("x",)),
+        Stage("later", lambda x: ran.append(x), inputs=("x",), outputs=()),
+    ])
+    with pytest.raises(ZeroDivisionError):
+        pipeline.run()
+    assert ran == []
+    assert pipeline.records[0]["status"] == "failed"
+
+
+def test_cancel_and_graph_errors():
+    pipeline = Pipeline([
+        Stage("first", lambda: pipeline.cancel() or {"x": 1}, outputs=("x",)),
+        Stage("second", lambda x: {}, inputs=("x",)),
+    ])
+    with pytest.raises(Cancelled):
+        pipeline.run()
+    assert pipeline.records[-1] == {"stage": "second", "status": "cancelled", "attempts": 0, "ms": 0.0}
+
+    with pytest.raises(ValueError, match="nothing produces"):
+        Pipeline([Stage("a", lambda missing: {}, inputs=("missing",))]).run()
+    with pytest.raises(ValueError, match="wait on each other"):
+        Pipeline([
+            Stage("a", lambda y: {"x": 1}, inputs=("y",), outputs=("x",)),
+            Stage("b", lambda x: {"y": 1}, inputs=("x",), outputs=("y",)),
+        ]).run()
+
+
+def test_edit_stage_is_not_retried_once_it_wrote_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PIPELINE_RETRIES", 2)
+    build = BuildRun("job", str(tmp_path), fixer_system="")
+    calls = []
+
+    def cut_off():
+        calls.append("cut")
+        if len(calls) == 1:
+            raise ConnectionError("no reply yet")   # failed before writing: retried
+        workspace_manifest.apply(str(tmp_path), {f"part_{len(calls)}.py": "x = 1\n"})
+        raise ConnectionError("stream dropped")      # failed after writing: not retried
+
+    with pytest.raises(ConnectionError, match="stream dropped"):
+        build.run([build.edit_stage("modify", cut_off, outputs=("modified",))])
+    assert calls == ["cut", "cut"]
+    assert build.records[-1] == {**build.records[-1], "status": "failed", "attempts": 2}
+    assert sorted(p.name for p in tmp_path.iterdir() if p.suffix == ".py") == ["part_2.py"]
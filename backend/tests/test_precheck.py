@@ -0,0 +1,43 @@
+from backend.services import precheck
+
+
+def _write(root, rel, text):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def _kinds(issues):
+    return sorted((i["path"], i["line"], i["kind"]) for i in issues)
+
+
+def test_clean_workspace_has_no_issues(tmp_path):
+    _write(tmp_path, "app/__init__.py", "")
+    _write(tmp_path, "app/core.py", "import os\n\nVALUE = 1\n\ndef add(a, b):\n    return a + b\n")
+    _write(tmp_path, "app/util.py", "from . import core\nfrom .core import add, VALUE\n\n"
+                                    "def total(xs):\n    return sum(add(x, VALUE) for x in xs)\n")
+    _write(tmp_path, "tests/test_core.py", "import pytest\nfrom app.core import add\n\n"
+                                           "def test_add():\n    assert add(1, 2) == 3\n")
+    assert precheck.check(str(tmp_path)) == []
+
+
+def test_reports_syntax_compile_import_and_name_errors(tmp_path):
+    _write(tmp_path, "calc.py", "def add(a, b):\n    return a + b\n")
+    _write(tmp_path, "broken.py", "def f(:\n    pass\n")
+    _write(tmp_path, "outside.py", "return 1\n")
+    _write(tmp_path, "main.py", "from calc import add, mul\nimport calc.extra\n\n"
+                                "def run():\n    return add(1, 2) + totl\n")
+    _write(tmp_path, "optional.py", "try:\n    from calc import fast_add\nexcept ImportError:\n    fast_add = None\n")
+
+    issues = precheck.check(str(tmp_path))
+    assert _kinds(issues) == [
+        ("broken.py", 1, "syntax"),
+        ("main.py", 1, "import"),
+        ("main.py", 2, "import"),
+        ("main.py", 5, "undefined-name"),
+        ("outside.py", 1, "syntax"),
+    ]
+    text = precheck.format_for_fixer(issues, str(tmp_path))
+    assert "cannot import name 'mul' from 'calc'" in text
+    assert "name 'totl' is not defined" in text
+    assert "5>     return add(1, 2) + totl" in text
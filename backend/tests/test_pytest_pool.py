@@ -0,0 +1,40 @@
+import os
+import pytest
+from backend.services import pytest_pool
+from backend.services.evaluator import _env
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="warm pool needs fork")
+
+
+def _write(root, rel, text):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_runs_see_fresh_workspace_code_and_workers_recycle(tmp_path):
+    pool = pytest_pool.PytestPool(size=1, max_runs=2)
+    _write(tmp_path, "calc.py", "def value():\n    return 1\n")
+    _write(tmp_path, "tests/test_calc.py", "from calc import value\n\ndef test_value():\n    assert value() == 2\n")
+    try:
+        first = pool.run(str(tmp_path), ["-q"], _env(str(tmp_path)), timeout=60)
+        assert first["exit_code"] == 1 and "1 failed" in first["stdout"]
+        worker = pool._idle[next(iter(pool._idle))][0]
+
+        _write(tmp_path, "calc.py", "def value():\n    return 2\n")
+        second = pool.run(str(tmp_path), ["-q"], _env(str(tmp_path)), timeout=60)
+        assert second["exit_code"] == 0 and "1 passed" in second["stdout"]
+        assert not worker.alive()  # recycled after max_runs
+    finally:
+        pool.shutdown()
+
+
+def test_timeout_kills_only_the_run(tmp_path):
+    pool = pytest_pool.PytestPool(size=1, max_runs=10)
+    _write(tmp_path, "tests/test_hang.py", "import time\n\ndef test_hang():\n    time.sleep(60)\n")
+    try:
+        result = pool.run(str(tmp_path), ["-q"], _env(str(tmp_path)), timeout=1)
+        assert result["timed_out"] and result["exit_code"] == -1
+        assert pool.run(str(tmp_path), ["--collect-only", "-q"], _env(str(tmp_path)), timeout=30)["exit_code"] == 0
+    finally:
+        pool.shutdown()
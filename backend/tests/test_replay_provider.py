@@ -0,0 +1,48 @@
+import json
+import pytest
+from backend.providers.base import LLM
+from backend.providers.replay import ReplayProvider, read_transcript, request_key
+
+
+class EchoLLM(LLM):
+    def complete(self, *, system: str, user: str, max_tokens: int) -> str:
+        return f"{system}:{user}"
+
+
+def test_record_then_replay(tmp_path):
+    path = str(tmp_path / "t.jsonl")
+    recorder = ReplayProvider(mode="record", transcript=path, inner=EchoLLM())
+    assert recorder.complete(system="s", user="u", max_tokens=10) == "s:u"
+
+    entries = read_transcript(path)
+    assert entries[0]["key"] == request_key("s", "u", 10)
+
+    player = ReplayProvider(mode="replay", transcript=path)
+    assert player.complete(system="s", user="u", max_tokens=10) == "s:u"
+    with pytest.raises(LookupError):
+        player.complete(system="s", user="other", max_tokens=10)
+
+
+def test_scripted_rules_are_ordered_and_sticky(tmp_path):
+    path = tmp_path / "script.jsonl"
+    path.write_text("\n".join(json.dumps(e) for e in [
+        {"match": "architect", "responses": ["first", "second"]},
+        {"response": "fallback"},
+    ]))
+    llm = ReplayProvider(mode="replay", transcript=str(path))
+
+    calls = [llm.complete(system="architect", user="x", max_tokens=1) for _ in range(3)]
+    assert calls == ["first", "second", "second"]
+    assert llm.complete(system="coder", user="x", max_tokens=1) == "fallback"
+
+
+def test_empty_responses_list_is_rejected_when_loaded(tmp_path):
+    path = tmp_path / "script.jsonl"
+    path.write_text("\n".join(json.dumps(e) for e in [
+        {"match": "architect", "response": "plan"},
+        {"match": "coder", "responses": []},
+    ]))
+    with pytest.raises(ValueError, match=r"entry 2 \(coder\) in .*script.jsonl has an empty"):
+        ReplayProvider(mode="replay", transcript=str(path))
+    with pytest.raises(ValueError, match="entry 1"):
+        ReplayProvider(mode="replay", entries=[{"responses": []}])
@@ -0,0 +1,35 @@
+import os
+
+from fastapi.testclient import TestClient
+
+from backend.app import app
+from backend.config import settings
+from backend.services import repo_scaffold
+from backend.storage.db import create_job, get_job
+
+
+def test_jobs_with_the_same_project_name_resolve_to_their_own_workspace(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "WORKSPACE_ROOT", str(tmp_path))
+    first = create_job({"project_name": "same name", "spec": "x"})
+    second = create_job({"project_name": "same name", "spec": "y"})
+    first_path = repo_scaffold.create_workspace(first)
+    second_path = repo_scaffold.create_workspace(second)
+    # Touch the first so an mtime-based guess would pick it for both
+    os.utime(first_path)
+
+    assert repo_scaffold.find_workspace(first["id"]) == tmp_path / os.path.basename(first_path)
+    assert repo_scaffold.find_workspace(second["id"]) == tmp_path / os.path.basename(second_path)
+    assert get_job(second["id"])["workspace_path"] == second_path
+
+    client = TestClient(app)
+    response = client.get(f"/export/{second['id']}/path")
+    assert response.status_code == 200
+    assert response.json()["workspace_path"] == os.path.abspath(second_path)
+
+
+def test_jobs_without_a_recorded_path_use_the_legacy_lookup(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "WORKSPACE_ROOT", str(tmp_path))
+    job = create_job({"project_name": "old job", "spec": "x"})
+    (tmp_path / "old_job_1234abcd").mkdir()
+    assert repo_scaffold.find_workspace(job["id"]) == tmp_path / "old_job_1234abcd"
+    assert repo_scaffold.find_workspace("no-such-job") is None
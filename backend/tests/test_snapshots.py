@@ -0,0 +1,110 @@
+import os
+
+from fastapi.testclient import TestClient
+
+from backend.app import app
+from backend.config import settings
+from backend.services import repo_scaffold, snapshots, workspace_manifest
+from backend.storage.db import create_job, set_job_workspace, update_job_status
+
+
+def test_snapshots_share_unchanged_content_and_diff_and_restore(tmp_path):
+    repo = str(tmp_path)
+    workspace_manifest.apply(repo, {"app.py": "x = 1\n", "util.py": "y = 1\n"}, label="code 1")
+    with open(tmp_path / "logo.bin", "wb") as f:
+        f.write(b"\x89PNG\x00\xff")   # written outside the manifest
+
+    first = snapshots.create(repo, "iteration 1")
+    assert (first["id"], first["files"]) == (1, 3)
+    stored = os.stat(snapshots._object_path(repo, workspace_manifest.get_manifest(repo).files["app.py"]["hash"]))
+    # Stored without copying the bytes: a hardlink or a reflink
+    assert stored.st_ino == os.stat(tmp_path / "app.py").st_ino or stored.st_nlink == 1
+
+    workspace_manifest.apply(repo, {"app.py": "x = 2\n", "util.py": None, "new.py": "z = 1\n"}, label="fix 1")
+    second = snapshots.create(repo, "iteration 2")
+    objects = sum(len(names) for _, _, names in os.walk(tmp_path / snapshots.OBJECTS_DIR))
+    assert objects == 5  # only the new content was added
+    # The first snapshot still holds the old content
+    assert snapshots._read_object(repo, "app.py", workspace_manifest.content_hash(b"x = 1\n")) == b"x = 1\n"
+
+    diff = snapshots.diff(repo, second["id"])
+    assert (diff["from"], diff["added"], diff["removed"], diff["modified"]) == (1, ["new.py"], ["util.py"], ["app.py"])
+    assert "-x = 1\n+x = 2\n" in diff["patches"]["app.py"]
+    assert snapshots.diff(repo, None)["modified"] == []
+
+    assert sorted(snapshots.restore(repo, 1)) == ["app.py", "new.py", "util.py"]
+    assert (tmp_path / "app.py").read_text() == "x = 1\n" and not (tmp_path / "new.py").exists()
+    assert (tmp_path / "logo.bin").read_bytes() == b"\x89PNG\x00\xff"
+    assert [s["label"] for s in snapshots.list_snapshots(repo)] == ["iteration 1", "iteration 2", "before restoring snapshot 1"]
+    assert workspace_manifest.changes_since(repo, second["revision"]) == ["app.py", "util.py", "new.py"]
+
+
+def test_snapshot_endpoints(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "WORKSPACE_ROOT", str(tmp_path))
+    job = create_job({"project_name": "snap", "spec": "x"})
+    repo = repo_scaffold.create_workspace(job)
+    client = TestClient(app)
+    url = f"/workspace/{job['id']}/snapshots"
+
+    workspace_manifest.apply(repo, {"main.py": "print(1)\n"})
+    assert client.post(url).json()["id"] == 1
+    workspace_manifest.apply(repo, {"main.py": "print(2)\n"})
+    assert client.post(url, params={"label": "edited"}).json()["label"] == "edited"
+    assert [s["id"] for s in client.get(url).json()["snapshots"]] == [1, 2]
+
+    assert client.get(f"{url}/2/diff").json()["modified"] == ["main.py"]
+    assert client.get(f"{url}/current/diff", params={"base": 1}).json()["modified"] == ["main.py"]
+    assert client.get(f"{url}/9/diff").status_code == 404
+
+    restored = client.post(f"{url}/1/restore")
+    assert restored.json() == {"restored": 1, "changed": ["main.py"]}
+    assert open(os.path.join(repo, "main.py")).read() == "print(1)\n"
+
+
+def test_restore_refuses_while_another_job_runs_in_the_workspace(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "WORKSPACE_ROOT", str(tmp_path))
+    older = create_job({"project_name": "shared", "spec": "x"})
+    repo = repo_scaffold.create_workspace(older)
+    update_job_status(older["id"], "succeeded")
+    workspace_manifest.apply(repo, {"main.py": "print(1)\n"})
+    snapshots.create(repo, "first", older["id"])
+
+    # A newer modify job of the same project, building in the same workspace
+    newer = create_job({"project_name": "shared", "spec": "y"})
+    set_job_workspace(newer["id"], repo)
+    update_job_status(newer["id"], "running")
+    client = TestClient(app)
+    response = client.post(f"/workspace/{older['id']}/snapshots/1/restore")
+    assert response.status_code == 409 and newer["id"] in response.json()["detail"]
+
+    update_job_status(newer["id"], "succeeded")
+    assert client.post(f"/workspace/{older['id']}/snapshots/1/restore").status_code == 200
+
+
+def test_old_snapshots_and_their_content_are_pruned(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "SNAPSHOT_KEEP", 2)
+    repo = str(tmp_path)
+    for i in range(3):
+        workspace_manifest.apply(repo, {"app.py": f"x = {i}\n", "same.py": "y = 1\n"})
+        snapshots.create(repo, f"iteration {i + 1}")
+
+    assert [s["id"] for s in snapshots.list_snapshots(repo)] == [2, 3]
+    stored = {p + n for p in os.listdir(tmp_path / snapshots.OBJECTS_DIR)
+              if os.path.isdir(tmp_path / snapshots.OBJECTS_DIR / p)
+              for n in os.listdir(tmp_path / snapshots.OBJECTS_DIR / p)}
+    assert stored == {workspace_manifest.content_hash(t.encode()) for t in ("x = 1\n", "x = 2\n", "y = 1\n")}
+    # Restoring the oldest kept snapshot still works: pruning waits until it is applied
+    assert snapshots.restore(repo, 2) == ["app.py"]
+    assert (tmp_path / "app.py").read_text() == "x = 1\n"
+    assert [s["id"] for s in snapshots.list_snapshots(repo)] == [3, 4]
+
+
+def test_in_memory_state_is_bounded(monkeypatch, tmp_path):
+    monkeypatch.setattr(snapshots, "MAX_CACHED", 2)
+    repos = []
+    for name in ("a", "b", "c"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "f.txt").write_text(name)
+        repos.append(str(tmp_path / name))
+        snapshots.create(repos[-1])
+    assert list(snapshots._states) == repos[1:]
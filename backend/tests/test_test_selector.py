@@ -0,0 +1,30 @@
+from backend.services import test_selector
+
+
+def _write(root, rel, text=""):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_selects_transitive_dependents(tmp_path):
+    _write(tmp_path, "pkg/__init__.py")
+    _write(tmp_path, "pkg/core.py", "def f():\n    return 1\n")
+    _write(tmp_path, "pkg/api.py", "from .core import f\n")
+    _write(tmp_path, "pkg/other.py", "X = 1\n")
+    _write(tmp_path, "tests/test_api.py", "from pkg.api import f\n")
+    _write(tmp_path, "tests/test_other.py", "from pkg import other\n")
+
+    assert test_selector.select_tests(str(tmp_path), ["pkg/core.py"]) == ["tests/test_api.py"]
+    assert test_selector.select_tests(str(tmp_path), ["pkg/other.py"]) == ["tests/test_other.py"]
+    assert test_selector.select_tests(str(tmp_path), ["tests/test_api.py"]) == ["tests/test_api.py"]
+
+
+def test_unbounded_changes_need_full_suite(tmp_path):
+    _write(tmp_path, "calc.py", "X = 1\n")
+    _write(tmp_path, "tests/conftest.py")
+    assert test_selector.select_tests(str(tmp_path), ["tests/conftest.py"]) is None
+    assert test_selector.select_tests(str(tmp_path), ["data.json"]) is None
+
+    _write(tmp_path, "broken.py", "def (:\n")
+    assert test_selector.select_tests(str(tmp_path), ["calc.py"]) is None
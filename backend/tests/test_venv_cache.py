@@ -0,0 +1,101 @@
+import os
+import subprocess
+import zipfile
+import pytest
+from backend.config import settings
+from backend.services import evaluator, venv_cache
+
+
+def _write(root, rel, text):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def _wheel(wheel_dir, name, version, source, entry_points=""):
+    """Minimal pure-Python wheel, so installs need no network or build backend"""
+    wheel_dir.mkdir(exist_ok=True)
+    info = f"{name}-{version}.dist-info"
+    with zipfile.ZipFile(wheel_dir / f"{name}-{version}-py3-none-any.whl", "w") as z:
+        z.writestr(f"{name}/__init__.py", source)
+        z.writestr(f"{info}/METADATA", f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+        z.writestr(f"{info}/WHEEL", "Wheel-Version: 1.0\nGenerator: test\nRoot-Is-Purelib: true\nTag: py3-none-any\n")
+        if entry_points:
+            z.writestr(f"{info}/entry_points.txt", entry_points)
+        z.writestr(f"{info}/RECORD", "")
+
+
+def test_read_requirements(tmp_path):
+    assert venv_cache.read_requirements(str(tmp_path)) is None
+    _write(tmp_path, "pyproject.toml",
+           '[project]\nname = "x"\ndependencies = ["a>=1"]\n[project.optional-dependencies]\ntest = ["b"]\n')
+    assert venv_cache.read_requirements(str(tmp_path)) == ["a>=1", "b"]
+    _write(tmp_path, "requirements.txt", "# deps\nc==2  # pinned\n\n")
+    assert venv_cache.read_requirements(str(tmp_path)) == ["c==2"]
+    assert venv_cache.manifest_hash(["A == 1", "b"]) == venv_cache.manifest_hash(["b", "a==1"])
+
+
+def test_workspaces_share_cached_env_from_local_wheels(tmp_path, monkeypatch):
+    _wheel(tmp_path / "wheels", "forgedemo", "1.0", "ANSWER = 42\n")
+    monkeypatch.setattr(settings, "VENV_WHEEL_DIR", str(tmp_path / "wheels"))
+    monkeypatch.setattr(settings, "VENV_OFFLINE", True)
+
+    repos = []
+    for name in ("one", "two"):
+        repo = tmp_path / name
+        _write(repo, "requirements.txt", "forgedemo==1.0\n")
+        _write(repo, "tests/test_dep.py", "import forgedemo\n\ndef test_dep():\n    assert forgedemo.ANSWER == 42\n")
+        ok, report = evaluator.run(str(repo))
+        assert ok, report
+        assert "install_error" not in report
+        repos.append(repo)
+
+    # One cached environment, hardlinked into both jobs
+    cached = [d for d in os.listdir(venv_cache._cache_root()) if not d.startswith(".")]
+    assert len(cached) == 1
+    rel = os.path.join(venv_cache.MARKER)
+    inodes = {os.stat(os.path.join(r, venv_cache.JOB_VENV, rel)).st_ino for r in repos}
+    assert inodes == {os.stat(os.path.join(venv_cache._cache_root(), cached[0], rel)).st_ino}
+
+
+def test_install_failure_is_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VENV_WHEEL_DIR", str(tmp_path / "wheels"))
+    monkeypatch.setattr(settings, "VENV_OFFLINE", True)
+    _write(tmp_path, "requirements.txt", "forge-no-such-package==9.9\n")
+    _write(tmp_path, "tests/test_fail.py", "def test_fail():\n    assert False\n")
+
+    ok, report = evaluator.run(str(tmp_path))
+    assert not ok
+    assert "forge-no-such-package" in report["install_error"]
+    assert "Dependency install failed" in evaluator.format_failures_for_fixer(report, str(tmp_path))
+
+
+def test_console_scripts_point_at_the_cached_env(tmp_path, monkeypatch):
+    _wheel(tmp_path / "wheels", "forgecli", "1.0", "def main():\n    print('forgecli ok')\n",
+           entry_points="[console_scripts]\nforgecli = forgecli:main\n")
+    monkeypatch.setattr(settings, "VENV_WHEEL_DIR", str(tmp_path / "wheels"))
+    monkeypatch.setattr(settings, "VENV_OFFLINE", True)
+    _write(tmp_path / "repo", "requirements.txt", "forgecli==1.0\n")
+
+    python = venv_cache.prepare(str(tmp_path / "repo"))
+    script = os.path.join(os.path.dirname(python), "forgecli.exe" if os.name == "nt" else "forgecli")
+    assert subprocess.run([script], capture_output=True, text=True).stdout.strip() == "forgecli ok"
+
+
+def test_install_failures_are_retried_after_a_while(monkeypatch):
+    builds = []
+
+    def failing_build(key, requirements, repo_path):
+        builds.append(key)
+        raise venv_cache.VenvError("network unreachable")
+
+    monkeypatch.setattr(venv_cache, "_build", failing_build)
+    for _ in range(2):
+        with pytest.raises(venv_cache.VenvError, match="network unreachable"):
+            venv_cache._cached("flaky-key", ["x"], ".")
+    assert builds == ["flaky-key"]
+
+    monkeypatch.setattr(venv_cache, "FAILURE_TTL_SECONDS", 0)
+    with pytest.raises(venv_cache.VenvError):
+        venv_cache._cached("flaky-key", ["x"], ".")
+    assert builds == ["flaky-key", "flaky-key"]
@@ -0,0 +1,82 @@
+import shutil
+from backend.services import workspace_index
+from backend.services.fenced import apply_fenced
+
+
+def _write(root, rel, text):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_search_ranks_symbol_in_large_file(tmp_path):
+    filler = "\n".join(f"def helper_{i}(x):\n    return x + {i}\n" for i in range(200))
+    _write(tmp_path, "src/billing.py", filler + "\n\ndef compute_invoice_total(items):\n    return sum(items)\n")
+    _write(tmp_path, "src/util.py", "def noop():\n    pass\n")
+
+    index = workspace_index.get_index(str(tmp_path))
+    hits = index.search("fix the invoice total computation", top_k=3)
+    best = hits[0][1]
+    assert best["path"] == "src/billing.py"
+    assert "compute_invoice_total" in index.excerpt(best)
+
+
+def test_apply_fenced_updates_index_incrementally(tmp_path):
+    _write(tmp_path, "app.py", "def greet():\n    return 'hi'\n")
+    index = workspace_index.get_index(str(tmp_path))
+    assert not index.search("shipping rates", top_k=3)
+
+    apply_fenced(str(tmp_path), "```shipping.py\ndef shipping_rates():\n    return {}\n```\n")
+    assert index.search("shipping rates", top_k=3)[0][1]["path"] == "shipping.py"
+
+
+def test_build_context_respects_budget(tmp_path):
+    _write(tmp_path, "big.py", "\n".join(f"value_{i} = {i}  # parser" for i in range(2000)))
+    context = workspace_index.build_context(str(tmp_path), "parser", budget_tokens=500, top_k=5)
+    assert "EXCERPT" in context
+    assert len(context) < 500 * 4 + 1000
+
+
+def test_index_cache_is_bounded_and_forgets_deleted_workspaces(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspace_index, "MAX_CACHED", 2)
+    repos = []
+    for name in ("a", "b", "c"):
+        _write(tmp_path / name, "app.py", f"def {name}():\n    pass\n")
+        repos.append(str(tmp_path / name))
+        workspace_index.get_index(repos[-1])
+    assert list(workspace_index._indexes)[-2:] == repos[1:]
+    assert repos[0] not in workspace_index._indexes
+
+    shutil.rmtree(repos[1])
+    _write(tmp_path / "d", "app.py", "x = 1\n")
+    workspace_index.get_index(str(tmp_path / "d"))
+    assert repos[1] not in workspace_index._indexes and repos[2] in workspace_index._indexes
+
+
+def test_file_listing_counts_against_the_budget(tmp_path):
+    for i in range(400):
+        _write(tmp_path, f"pkg/module_{i:03}.py", f"x_{i} = {i}\n")
+    _write(tmp_path, "zz_billing.py", "def compute_invoice_total(items):\n    return sum(items)\n")
+    context = workspace_index.build_context(str(tmp_path), "invoice total", budget_tokens=500, top_k=3)
+
+    assert len(context) < 500 * 4 + 200
+    listing = context.split("RELEVANT CODE:")[0]
+    assert listing.splitlines()[2].startswith("  zz_billing.py") and "more files" in listing
+    assert "def compute_invoice_total" in context
+
+
+def test_build_context_skips_entries_changed_meanwhile(tmp_path, monkeypatch):
+    _write(tmp_path, "billing.py", "def compute_invoice_total(items):\n    return sum(items)\n")
+    index = workspace_index.get_index(str(tmp_path))
+    search = index.search
+
+    def search_then_turn_binary(query, top_k):
+        hits = search(query, top_k)
+        # As a concurrent update_file would leave an unreadable file
+        index.files["billing.py"] = {**index.files["billing.py"], "text": None}
+        return hits
+
+    monkeypatch.setattr(index, "search", search_then_turn_binary)
+    monkeypatch.setattr(index, "refresh", lambda: None)
+    context = workspace_index.build_context(str(tmp_path), "invoice total")
+    assert "billing.py" in context and "RELEVANT CODE" not in context
@@ -0,0 +1,72 @@
+import os
+import shutil
+from backend.services import workspace_manifest
+from backend.services.fenced import apply_fenced
+
+
+def test_unchanged_writes_are_skipped_and_journaled_changes_queryable(tmp_path):
+    repo = str(tmp_path)
+    (tmp_path / "README.md").write_text("# demo\n")  # written outside the manifest
+
+    assert apply_fenced(repo, "```calc.py\nx = 1\n```\n```README.md\n# demo\n```", label="code 1") == ["calc.py"]
+    assert workspace_manifest.revision(repo) == 1
+    mtime = os.stat(tmp_path / "calc.py").st_mtime_ns
+
+    # Same content again: nothing written, no new revision
+    assert apply_fenced(repo, "```calc.py\nx = 1\n```", label="fix 1") == []
+    assert os.stat(tmp_path / "calc.py").st_mtime_ns == mtime
+    assert workspace_manifest.revision(repo) == 1
+
+    apply_fenced(repo, "```calc.py\nx = 2\n```\n```util.py\ny = 1\n```", label="fix 2")
+    apply_fenced(repo, "```diff\n--- a/util.py\n+++ /dev/null\n```", label="fix 3")
+    assert workspace_manifest.changes_since(repo, 1) == ["calc.py", "util.py"]
+    assert workspace_manifest.changes_since(repo, 2) == ["util.py"]
+    assert workspace_manifest.changes_since(repo, 3) == []
+
+    # Reloaded from .forge, e.g. after a restart
+    manifest = workspace_manifest.Manifest(os.path.abspath(repo))
+    assert manifest.revision == 3
+    assert sorted(manifest.files) == ["calc.py"]
+    assert [e["label"] for e in manifest.journal] == ["code 1", "fix 2", "fix 3"]
+
+
+def test_paths_outside_the_workspace_are_rejected_as_conflicts(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    victim = tmp_path / "victim.txt"
+    victim.write_text("keep me\n")
+    conflicts = []
+
+    reply = (
+        "```diff\n--- a/../victim.txt\n+++ /dev/null\n```\n"
+        f"```{tmp_path / 'abs.txt'}\nx = 1\n```\n"
+        "```.forge/manifest.json\n{}\n```\n"
+        "```ok.py\nx = 1\n```"
+    )
+    assert apply_fenced(str(repo), reply, conflicts) == ["ok.py"]
+    assert victim.read_text() == "keep me\n"
+    assert not (tmp_path / "abs.txt").exists()
+    assert len(conflicts) == 3 and all("outside the workspace" in c["reason"] for c in conflicts)
+
+    # Direct manifest writes are checked too, including through symlinks
+    os.symlink(tmp_path, repo / "link")
+    assert workspace_manifest.apply(str(repo), {"../victim.txt": None, "link/victim.txt": "x", "/etc/x": "x"}) == []
+    assert victim.read_text() == "keep me\n"
+
+
+def test_manifest_cache_is_bounded_and_reloads_from_forge(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspace_manifest, "MAX_CACHED", 2)
+    repos = [str(tmp_path / name) for name in ("a", "b", "c")]
+    for repo in repos:
+        os.makedirs(repo)
+        workspace_manifest.apply(repo, {"main.py": "x = 1\n"}, label="code 1")
+    assert list(workspace_manifest._manifests) == repos[1:]
+
+    # Evicted, then loaded again with its journal
+    assert workspace_manifest.revision(repos[0]) == 1
+    assert workspace_manifest.changes_since(repos[0], 0) == ["main.py"]
+    assert list(workspace_manifest._manifests) == [repos[2], repos[0]]
+
+    shutil.rmtree(repos[2])
+    workspace_manifest.get_manifest(repos[1])
+    assert list(workspace_manifest._manifests) == [repos[0], repos[1]]
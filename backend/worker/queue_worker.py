@@ -10,7 +10,7 @@ def enqueue(job_id: str):
 def main_loop():
     while True:
         try:
-            for j in list_jobs():
+            for j in list_jobs(include_logs=False):
                 if j["status"] == "queued":
                     update_job_status(j["id"], "running")
                     try:
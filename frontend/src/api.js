@@ -18,8 +18,10 @@ export async function submitJob(payload) {
   return r.json();
 }
 
+// Without log entries (the selected job streams its own). The response's
+// ETag lets the browser revalidate it, so an unchanged list comes back 304
 export async function listJobs() {
-  const r = await fetch(API('/jobs'));
+  const r = await fetch(API('/jobs?logs=false'));
   if (!r.ok) {
     const error = await r.json().catch(() => ({ detail: 'Failed to list jobs' }));
     throw new Error(error.detail || 'Failed to list jobs');
@@ -27,8 +29,9 @@ export async function listJobs() {
   return r.json();
 }
 
-export async function getJob(id) {
-  const r = await fetch(API(`/jobs/${id}`));
+// sinceSeq: only the log entries after this sequence number
+export async function getJob(id, sinceSeq = 0) {
+  const r = await fetch(API(`/jobs/${id}${sinceSeq ? `?since_seq=${sinceSeq}` : ''}`));
   if (!r.ok) {
     const error = await r.json().catch(() => ({ detail: 'Failed to get job' }));
     throw new Error(error.detail || 'Failed to get job');
@@ -36,6 +39,22 @@ export async function getJob(id) {
   return r.json();
 }
 
+// Follow a job over server-sent events. onJob gets its fields (without
+// logs) on connect and on every change, onLog each log entry after
+// `since` (a log sequence number); the browser reconnects by itself and
+// resumes from the last entry. Returns a function that closes the stream.
+export function subscribeJob(jobId, { since = 0, onJob, onLog }) {
+  const source = new EventSource(API(`/jobs/${jobId}/events?last_event_id=${since}`));
+  source.addEventListener('job', (e) => onJob(JSON.parse(e.data)));
+  source.addEventListener('log', (e) => onLog(JSON.parse(e.data)));
+  // The job finished: stop the browser from reconnecting
+  source.addEventListener('end', () => source.close());
+  source.addEventListener('error', (e) => {
+    if (e.data) source.close();  // sent by the server (e.g. job not found)
+  });
+  return () => source.close();
+}
+
 export async function setProvider(provider) {
   const r = await fetch(API('/jobs/provider'), {
     method: 'POST',
@@ -102,6 +121,76 @@ export async function readWorkspaceFile(jobId, filePath) {
   return r.json();
 }
 
+export function workspaceFileURL(jobId, filePath) {
+  return API(`/workspace/${jobId}/raw/${filePath}`);
+}
+
+export async function readWorkspaceFileHead(jobId, filePath, bytes) {
+  const r = await fetch(workspaceFileURL(jobId, filePath), {
+    headers: { Range: `bytes=0-${bytes - 1}` }
+  });
+  if (!r.ok) {
+    throw new Error('Failed to read file');
+  }
+  return r.text();
+}
+
+// Read many files in one request; onFile is called for each NDJSON line as
+// it arrives: {path, hash, size, content[, encoding]}, {path, hash, unchanged}
+// for files whose hash is in `known`, or {path, error}
+export async function readWorkspaceFiles(jobId, { paths = [], glob = null, known = {} }, onFile) {
+  const r = await fetch(API(`/workspace/${jobId}/batch`), {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ paths, glob, known })
+  });
+  if (!r.ok) {
+    const error = await r.json().catch(() => ({ detail: 'Failed to read files' }));
+    throw new Error(error.detail || 'Failed to read files');
+  }
+  const reader = r.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    for (const line of lines) {
+      if (line) onFile(JSON.parse(line));
+    }
+  }
+  if (buffer.trim()) onFile(JSON.parse(buffer));
+}
+
+export async function listSnapshots(jobId) {
+  const r = await fetch(API(`/workspace/${jobId}/snapshots`));
+  if (!r.ok) {
+    throw new Error('Failed to list snapshots');
+  }
+  return r.json();
+}
+
+// Diff a snapshot ('current': the workspace now) against the one before it
+export async function diffSnapshot(jobId, snapshotId) {
+  const r = await fetch(API(`/workspace/${jobId}/snapshots/${snapshotId}/diff`));
+  if (!r.ok) {
+    const error = await r.json().catch(() => ({ detail: 'Failed to diff snapshot' }));
+    throw new Error(error.detail || 'Failed to diff snapshot');
+  }
+  return r.json();
+}
+
+export async function restoreSnapshot(jobId, snapshotId) {
+  const r = await fetch(API(`/workspace/${jobId}/snapshots/${snapshotId}/restore`), { method: 'POST' });
+  if (!r.ok) {
+    const error = await r.json().catch(() => ({ detail: 'Failed to restore snapshot' }));
+    throw new Error(error.detail || 'Failed to restore snapshot');
+  }
+  return r.json();
+}
+
 // Project management
 export async function createProject(name, description = '') {
   const r = await fetch(API('/projects/'), {
@@ -184,23 +273,14 @@ export async function uploadSpecFile(file) {
 }
 
 // Export workspace
-export async function downloadWorkspace(jobId) {
-  const r = await fetch(API(`/export/${jobId}/zip`));
-  
-  if (!r.ok) {
-    const error = await r.json().catch(() => ({ detail: 'Failed to download workspace' }));
-    throw new Error(error.detail || 'Failed to download workspace');
-  }
-  
-  // Trigger download
-  const blob = await r.blob();
-  const url = window.URL.createObjectURL(blob);
+// The archive streams from the server, so let the browser save it as it
+// arrives instead of buffering it here. format: 'zip', 'tar.gz' or 'tar'
+export async function downloadWorkspace(jobId, format = 'zip') {
   const a = document.createElement('a');
-  a.href = url;
-  a.download = `workspace-${jobId}.zip`;
+  a.href = API(`/export/${jobId}/archive?format=${encodeURIComponent(format)}`);
+  a.download = `workspace-${jobId}.${format}`;
   document.body.appendChild(a);
   a.click();
-  window.URL.revokeObjectURL(url);
   document.body.removeChild(a);
 }
 
@@ -1,5 +1,10 @@
-import React, { useState, useEffect } from 'react'
-import { listWorkspaceFiles, readWorkspaceFile, downloadWorkspace, getWorkspacePath } from '../api'
+import React, { useState, useEffect, useRef } from 'react'
+import { listWorkspaceFiles, readWorkspaceFile, readWorkspaceFiles, readWorkspaceFileHead, workspaceFileURL, downloadWorkspace, getWorkspacePath, listSnapshots, diffSnapshot, restoreSnapshot } from '../api'
+
+// Larger files are previewed from their first bytes (the backend's FILE_VIEW_MAX_BYTES)
+const PREVIEW_BYTES = 1024 * 1024
+// Small files are fetched together when the workspace opens, up to this total
+const PREFETCH_BYTES = 4 * 1024 * 1024
 
 export default function ArtifactsTab({ selectedJob }) {
   const [files, setFiles] = useState([])
@@ -8,37 +13,77 @@ export default function ArtifactsTab({ selectedJob }) {
   const [loading, setLoading] = useState(false)
   const [workspacePath, setWorkspacePath] = useState(null)
   const [downloading, setDownloading] = useState(false)
+  const [snapshots, setSnapshots] = useState([])
+  const [selectedSnapshot, setSelectedSnapshot] = useState(null)
+  // path -> {hash, content} of prefetched files, for the selected job
+  const contentCache = useRef({ jobId: null, files: {} })
 
   useEffect(() => {
+    if (contentCache.current.jobId !== selectedJob?.id) {
+      contentCache.current = { jobId: selectedJob?.id, files: {} }
+    }
     if (!selectedJob || selectedJob.status !== 'succeeded') {
       setFiles([])
       setSelectedFile(null)
+      setSelectedSnapshot(null)
       setFileContent(null)
       setWorkspacePath(null)
+      setSnapshots([])
       return
     }
 
-    const fetchFiles = async () => {
-      try {
-        const result = await listWorkspaceFiles(selectedJob.id)
-        setFiles(result.files || [])
-        
-        // Also fetch workspace path
-        const pathInfo = await getWorkspacePath(selectedJob.id)
-        setWorkspacePath(pathInfo)
-      } catch (err) {
-        console.error('Failed to list files:', err)
-        setFiles([])
-      }
-    }
-
     fetchFiles()
   }, [selectedJob?.id, selectedJob?.status])
 
-  const handleDownload = async () => {
+  const fetchFiles = async () => {
+    try {
+      const result = await listWorkspaceFiles(selectedJob.id)
+      setFiles(result.files || [])
+      prefetch(result.files || [])
+      listSnapshots(selectedJob.id)
+        .then((r) => setSnapshots(r.snapshots || []))
+        .catch(() => setSnapshots([]))
+      
+      // Also fetch workspace path
+      const pathInfo = await getWorkspacePath(selectedJob.id)
+      setWorkspacePath(pathInfo)
+    } catch (err) {
+      console.error('Failed to list files:', err)
+      setFiles([])
+    }
+  }
+
+  const prefetch = async (listed) => {
+    const cache = contentCache.current
+    const paths = []
+    let total = 0
+    for (const file of listed) {
+      if (file.size > PREVIEW_BYTES || total + file.size > PREFETCH_BYTES) continue
+      paths.push(file.path)
+      total += file.size
+    }
+    if (paths.length === 0) return
+    const known = {}
+    for (const path of paths) {
+      if (cache.files[path]) known[path] = cache.files[path].hash
+    }
+    try {
+      await readWorkspaceFiles(selectedJob.id, { paths, known }, (line) => {
+        if (line.content === undefined) return
+        cache.files[line.path] = {
+          hash: line.hash,
+          content: line.encoding === 'base64' ? '(binary file; open Raw to view it)' : line.content
+        }
+      })
+    } catch (err) {
+      console.error('Failed to prefetch files:', err)
+    }
+  }
+
+  const handleDownload = async (format = 'zip') => {
     setDownloading(true)
     try {
-      await downloadWorkspace(selectedJob.id)
+      await downloadWorkspace(selectedJob.id, format)
     } catch (err) {
       alert(`Failed to download workspace: ${err.message}`)
     } finally {
@@ -55,10 +100,21 @@ export default function ArtifactsTab({ selectedJob }) {
 
   const handleFileClick = async (file) => {
     setSelectedFile(file)
+    setSelectedSnapshot(null)
+    const cached = contentCache.current.files[file.path]
+    if (cached) {
+      setFileContent(cached.content)
+      return
+    }
     setLoading(true)
     try {
-      const result = await readWorkspaceFile(selectedJob.id, file.path)
-      setFileContent(result.content)
+      if (file.size > PREVIEW_BYTES) {
+        const head = await readWorkspaceFileHead(selectedJob.id, file.path, PREVIEW_BYTES)
+        setFileContent(`${head}\n\n… (showing the first ${formatBytes(PREVIEW_BYTES)}; open Raw for the whole file)`)
+      } else {
+        const result = await readWorkspaceFile(selectedJob.id, file.path)
+        setFileContent(result.content)
+      }
     } catch (err) {
       console.error('Failed to read file:', err)
       setFileContent(`Error reading file: ${err.message}`)
@@ -67,6 +123,41 @@ export default function ArtifactsTab({ selectedJob }) {
     }
   }
 
+  // Show what changed in a snapshot since the one before it
+  const handleSnapshotClick = async (snapshot) => {
+    setSelectedFile(null)
+    setSelectedSnapshot(snapshot)
+    setLoading(true)
+    try {
+      const diff = await diffSnapshot(selectedJob.id, snapshot.id)
+      const changed = diff.added.length + diff.removed.length + diff.modified.length
+      const header = diff.from
+        ? `Changes since snapshot ${diff.from}: ${changed} file(s)`
+        : `First snapshot: ${changed} file(s)`
+      const patches = [...diff.added, ...diff.removed, ...diff.modified]
+        .map((path) => diff.patches[path] || `Binary or large file changed: ${path}\n`)
+      setFileContent([header, '', ...patches].join('\n'))
+    } catch (err) {
+      setFileContent(`Error diffing snapshot: ${err.message}`)
+    } finally {
+      setLoading(false)
+    }
+  }
+
+  const handleRestore = async () => {
+    if (!confirm(`Restore the workspace to snapshot ${selectedSnapshot.id} (${selectedSnapshot.label})? The current state is snapshotted first.`)) return
+    try {
+      const result = await restoreSnapshot(selectedJob.id, selectedSnapshot.id)
+      contentCache.current = { jobId: selectedJob.id, files: {} }
+      setSelectedSnapshot(null)
+      setFileContent(null)
+      alert(`Restored snapshot ${result.restored}: ${result.changed.length} file(s) changed`)
+      fetchFiles()
+    } catch (err) {
+      alert(`Failed to restore snapshot: ${err.message}`)
+    }
+  }
+
   if (!selectedJob) {
     return (
       <div className="tab-placeholder">
@@ -109,7 +200,7 @@ export default function ArtifactsTab({ selectedJob }) {
         {/* Export Actions */}
         <div style={{ padding: '15px', borderBottom: '1px solid #2B2B2B', background: '#1a1a1a' }}>
           <button
-            onClick={handleDownload}
+            onClick={() => handleDownload('zip')}
             disabled={downloading}
             style={{
               width: '100%',
@@ -126,6 +217,12 @@ export default function ArtifactsTab({ selectedJob }) {
           >
             {downloading ? '⏳ Downloading...' : '📥 Download as ZIP'}
           </button>
+          <div className="download-formats">
+            Large workspace? Faster:{' '}
+            <a onClick={() => handleDownload('tar.gz')}>tar.gz</a>
+            {' · '}
+            <a onClick={() => handleDownload('tar')}>tar (uncompressed)</a>
+          </div>
           
           {workspacePath && (
             <button
@@ -183,10 +280,42 @@ export default function ArtifactsTab({ selectedJob }) {
             </li>
           ))}
         </ul>
+
+        {snapshots.length > 0 && (
+          <>
+            <div className="artifacts-header">
+              <h4>Snapshots</h4>
+              <span className="file-count">{snapshots.length}</span>
+            </div>
+            <ul className="file-tree">
+              {[...snapshots].reverse().map((snapshot) => (
+                <li
+                  key={snapshot.id}
+                  className={`file-item ${selectedSnapshot?.id === snapshot.id ? 'selected' : ''}`}
+                  onClick={() => handleSnapshotClick(snapshot)}
+                  title={new Date(snapshot.created * 1000).toLocaleString()}
+                >
+                  <span className="file-icon">📸</span>
+                  <span className="file-name">{snapshot.id}. {snapshot.label || 'snapshot'}</span>
+                  <span className="file-size">{snapshot.files} files</span>
+                </li>
+              ))}
+            </ul>
+          </>
+        )}
       </div>
 
       <div className="artifacts-viewer">
-        {!selectedFile ? (
+        {selectedSnapshot && !loading ? (
+          <div className="file-viewer">
+            <div className="viewer-header">
+              <span className="viewer-title">Snapshot {selectedSnapshot.id}: {selectedSnapshot.label}</span>
+              <span className="viewer-size">{formatBytes(selectedSnapshot.size)}</span>
+              <button className="viewer-restore" onClick={handleRestore}>Restore</button>
+            </div>
+            <pre className="code-content">{fileContent}</pre>
+          </div>
+        ) : !selectedFile && !selectedSnapshot ? (
           <div className="viewer-placeholder">
             <div className="preview-icon">👈</div>
             <p>Select a file to view its contents</p>
@@ -201,6 +330,14 @@ export default function ArtifactsTab({ selectedJob }) {
             <div className="viewer-header">
               <span className="viewer-title">{selectedFile.path}</span>
               <span className="viewer-size">{formatBytes(selectedFile.size)}</span>
+              <a
+                className="viewer-raw"
+                href={workspaceFileURL(selectedJob.id, selectedFile.path)}
+                target="_blank"
+                rel="noreferrer"
+              >
+                Raw
+              </a>
             </div>
             <pre className="code-content">{fileContent}</pre>
           </div>
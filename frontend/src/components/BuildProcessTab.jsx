@@ -63,6 +63,23 @@ export default function BuildProcessTab({ selectedJob }) {
             </div>
           )}
           
+          {log.type === 'precheck' && (
+            <div className="log-precheck">
+              <div className="log-header">
+                🧹 Static Pre-check (Iteration {log.content.iteration}): {log.content.issues.length} problem(s)
+              </div>
+              {log.content.issues.map((issue, idx) => (
+                <div key={idx} className="issue-item">
+                  <div className="issue-header">
+                    <span className={`issue-type ${issue.kind}`}>{issue.kind}</span>
+                    <span className="issue-file">{issue.path}:{issue.line}</span>
+                  </div>
+                  <div className="issue-desc">{issue.message}</div>
+                </div>
+              ))}
+            </div>
+          )}
+          
           {log.type === 'architect' && (
             <div className="log-architect">
               <div className="log-header">
@@ -95,6 +112,20 @@ export default function BuildProcessTab({ selectedJob }) {
               )}
             </div>
           )}
+          
+          {log.type === 'stages' && (
+            <div className="log-stages">
+              <div className="log-header">⏱️ Stage Timings</div>
+              {log.content.filter(r => r.status !== 'skipped').map((r, idx) => (
+                <div key={idx} className={`stage-row ${r.status}`}>
+                  <span className="stage-name">{r.stage}</span>
+                  <span className="stage-ms">{(r.ms / 1000).toFixed(2)}s</span>
+                  {r.attempts > 1 && <span className="stage-retries">{r.attempts} attempts</span>}
+                  {r.status !== 'ok' && <span className="stage-status">{r.status}</span>}
+                </div>
+              ))}
+            </div>
+          )}
         </div>
       ))}
       
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react'
-import { listJobs, getJob } from '../api'
+import { listJobs, subscribeJob } from '../api'
 import BuildProcessTab from '../components/BuildProcessTab'
 import JobsTab from '../components/JobsTab'
 import ConsoleTab from '../components/ConsoleTab'
@@ -15,13 +15,40 @@ export default function TabbedPane({ selectedJob, onSelectJob }) {
     const interval = setInterval(async () => {
       const js = await listJobs()
       setJobs(js)
-      if (selectedJob) {
-        const updated = await getJob(selectedJob.id)
-        onSelectJob(updated)
-      }
     }, 1000)
     return () => clearInterval(interval)
-  }, [selectedJob])
+  }, [])
+
+  // The selected job is pushed by the server as it changes
+  useEffect(() => {
+    if (!selectedJob) return
+    let job = { ...selectedJob, logs: [...(selectedJob.logs || [])] }
+    let frame = null
+    // Apply a burst of events (e.g. the backlog on connect) in one render
+    const publish = () => {
+      if (frame === null) {
+        frame = requestAnimationFrame(() => {
+          frame = null
+          onSelectJob({ ...job, logs: [...job.logs] })
+        })
+      }
+    }
+    const close = subscribeJob(selectedJob.id, {
+      since: job.logs.length,
+      onJob: (fields) => {
+        job = { ...job, ...fields }
+        publish()
+      },
+      onLog: (entry) => {
+        job.logs.push(entry)
+        publish()
+      }
+    })
+    return () => {
+      close()
+      if (frame !== null) cancelAnimationFrame(frame)
+    }
+  }, [selectedJob?.id])
 
   return (
     <div className="tabbed-pane">